@@ -0,0 +1,106 @@
+"""
+Benchmark the geometric field detector against the county form corpus.
+
+Ground truth is the set of form widgets in each ``form.pdf`` (the same
+fields the hand-made ``overlay.json`` files were mapped from). The detector
+runs with widgets disabled so only drawings and text are used, and every
+detection is matched to a widget by IoU or by containing its centre.
+
+    cd python && python -m bench.bench_field_detector [--out results.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import fitz
+import numpy as np
+
+from overlay.field_detector import detect_fields, _iou
+
+APPS = Path(__file__).resolve().parents[2] / "data" / "applications"
+
+
+def _match(detected: np.ndarray, truth: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Boolean [D, T] matrix of detections that cover a ground-truth widget."""
+    if len(detected) == 0 or len(truth) == 0:
+        return np.zeros((len(detected), len(truth)), dtype=bool)
+    cx = (truth[:, 0] + truth[:, 2]) / 2
+    cy = (truth[:, 1] + truth[:, 3]) / 2
+    contains = (
+        (detected[:, None, 0] <= cx) & (cx <= detected[:, None, 2])
+        & (detected[:, None, 1] - 4 <= cy) & (cy <= detected[:, None, 3] + 4)
+    )
+    return contains | (_iou(detected, truth) >= iou_threshold)
+
+
+def bench_form(pdf_path: Path, repeat: int, iou_threshold: float):
+    pdf_bytes = pdf_path.read_bytes()
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    truth = {}
+    for page in doc:
+        rects = [tuple(w.rect) for w in page.widgets() or []]
+        truth[page.number] = np.array(rects, dtype=np.float64).reshape(-1, 4)
+    doc.close()
+
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fields = detect_fields(pdf_bytes, use_widgets=False)
+        timings.append(time.perf_counter() - t0)
+
+    true_pos = found = 0
+    n_truth = sum(len(t) for t in truth.values())
+    for page_no, t in truth.items():
+        d = np.array([f["rect"] for f in fields if f["page"] == page_no], dtype=np.float64).reshape(-1, 4)
+        m = _match(d, t, iou_threshold)
+        true_pos += int(m.any(axis=1).sum())
+        found += int(m.any(axis=0).sum())
+
+    overlay_path = pdf_path.parent / "overlay.json"
+    overlay_fields = len(json.loads(overlay_path.read_text()).get("fields", [])) if overlay_path.exists() else 0
+    return {
+        "form": f"{pdf_path.parents[2].name}/{pdf_path.parent.name}",
+        "pages": len(truth),
+        "widgets": n_truth,
+        "overlay_fields": overlay_fields,
+        "detected": len(fields),
+        "recall": round(found / n_truth, 3) if n_truth else None,
+        "precision": round(true_pos / len(fields), 3) if n_truth and fields else None,
+        "ms_median": round(float(np.median(timings)) * 1000, 1),
+        "ms_per_page": round(float(np.median(timings)) * 1000 / max(len(truth), 1), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--iou", type=float, default=0.3)
+    parser.add_argument("--out", type=Path, help="write the full result as JSON")
+    args = parser.parse_args(argv)
+
+    rows = [bench_form(p, args.repeat, args.iou) for p in sorted(APPS.glob("*/forms/*/form.pdf"))]
+    scored = [r for r in rows if r["widgets"]]
+    summary = {
+        "forms": len(rows),
+        "forms_with_widgets": len(scored),
+        "mean_recall": round(float(np.mean([r["recall"] for r in scored])), 3) if scored else None,
+        "mean_precision": round(float(np.mean([r["precision"] or 0 for r in scored])), 3) if scored else None,
+        "max_ms": max(r["ms_median"] for r in rows) if rows else None,
+        "median_ms_per_page": float(np.median([r["ms_per_page"] for r in rows])) if rows else None,
+    }
+
+    print(f"{'form':70} {'pg':>3} {'wdg':>4} {'det':>4} {'recall':>7} {'prec':>6} {'ms':>7}")
+    for r in rows:
+        print(f"{r['form'][:70]:70} {r['pages']:>3} {r['widgets']:>4} {r['detected']:>4} "
+              f"{str(r['recall']):>7} {str(r['precision']):>6} {r['ms_median']:>7}")
+    print(json.dumps(summary, indent=2))
+    if args.out:
+        args.out.write_text(json.dumps({"summary": summary, "forms": rows}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
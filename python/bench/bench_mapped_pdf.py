@@ -0,0 +1,168 @@
+"""
+Measure per-request RSS growth of stored-form PDF work, copied vs mapped.
+
+Each operation runs on the largest stored form the way the routes ran it
+before (``read_bytes()`` per request, then PyPDF2 or PyMuPDF on the copy) and
+the way they run it now: from the blob's read-only mapping
+(``BlobStore.view`` / ``BlobStore.open``, ``server.fill_plans``).
+
+Every run is a fresh process that warms the operation up once, then
+starts ``--concurrency`` requests together on threads, as a worker serves
+concurrent fills. It reports, divided by the number of requests, the peak
+above the starting value of RSS and of its anonymous part (``RssAnon``: heap,
+not file pages such as the shared mapping), and the wall time of the batch.
+
+- ``fill_acroform``: ``POST /fill`` (PyPDF2);
+- ``fill_overlay``: its overlay fallback and ``/fill-overlay`` by hash (PyMuPDF);
+- ``acroform_fields``: ``GET /acroform-fields`` on a cache miss;
+- ``create_acroform``: ``POST /create-acroform``;
+- ``render``: ``GET /preview-page`` on a cache miss.
+
+    cd python && python -m bench.bench_mapped_pdf --out bench/results/mapped_pdf.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+OPS = ("fill_acroform", "fill_overlay", "acroform_fields", "create_acroform", "render")
+MODES = ("copied", "mapped")
+
+
+def _operation(op: str, mode: str, job: Dict[str, Any]) -> Callable[[], Any]:
+    import fitz
+
+    from overlay.acroform_handler import AcroFormHandler, create_acroform_from_overlay, fill_acroform_pdf_bytes
+    from overlay.fill_overlay import fill_pdf_overlay_bytes
+    from server.blob_store import blob_store
+    from server.fill_plans import acroform_from_blob, fill_acroform_blob, fill_blob
+
+    sha, path, overlay, answers = job["sha"], Path(job["path"]), job["overlay"], job["answers"]
+
+    def render(doc):
+        with doc:
+            return doc[0].get_pixmap(dpi=144, alpha=False).tobytes("png")
+
+    def fields_mapped():
+        with blob_store.open(sha) as pdf:
+            return AcroFormHandler(pdf).get_existing_fields()
+
+    copied = {
+        "fill_acroform": lambda: fill_acroform_pdf_bytes(path.read_bytes(), answers),
+        "fill_overlay": lambda: fill_pdf_overlay_bytes(path.read_bytes(), overlay, answers),
+        "acroform_fields": lambda: AcroFormHandler(path.read_bytes()).get_existing_fields(),
+        "create_acroform": lambda: create_acroform_from_overlay(path.read_bytes(), job["overlay_json"]),
+        "render": lambda: render(fitz.open(path)),
+    }
+    mapped = {
+        "fill_acroform": lambda: fill_acroform_blob(sha, answers),
+        "fill_overlay": lambda: fill_blob(sha, str(path), overlay, answers),
+        "acroform_fields": fields_mapped,
+        "create_acroform": lambda: acroform_from_blob(sha, job["overlay_json"]),
+        "render": lambda: render(fitz.open(stream=blob_store.view(sha), filetype="pdf")),
+    }
+    return (copied if mode == "copied" else mapped)[op]
+
+
+class _AnonPeak(threading.Thread):
+    """Peak ``RssAnon`` (bytes) of this process, sampled every millisecond."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.base = self.peak = self.sample()
+        self.stop = threading.Event()
+
+    @staticmethod
+    def sample() -> int:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def run(self):
+        while not self.stop.is_set():
+            self.peak = max(self.peak, self.sample())
+            time.sleep(0.001)
+
+
+def _run(op: str, mode: str, job: Dict[str, Any], concurrency: int) -> Dict[str, float]:
+    import contextlib
+    import io
+
+    from bench.bench_pdf_pipeline import _RssPeak
+
+    fn = _operation(op, mode, job)
+    with contextlib.redirect_stdout(io.StringIO()):  # the AcroForm fill prints every field
+        fn()
+        start = threading.Barrier(concurrency)
+
+        def request():
+            start.wait()
+            fn()
+
+        threads = [threading.Thread(target=request) for _ in range(concurrency)]
+        anon = _AnonPeak()
+        anon.start()
+        with _RssPeak() as rss:
+            t0 = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            wall = time.perf_counter() - t0
+        anon.stop.set()
+        anon.join()
+    return {"rss_per_request_kb": round((rss.peak - rss.base) / concurrency / 1024, 1),
+            "anon_per_request_kb": round((anon.peak - anon.base) / concurrency / 1024, 1),
+            "batch_ms": round(wall * 1000, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    from bench.bench_pdf_pipeline import synthetic_answers, synthetic_overlay
+    from bench.bench_signatures import largest_forms
+    from overlay.models import Overlay
+    from server.blob_store import blob_store
+    from server.fill_plans import prepared_pdf
+
+    form = largest_forms(1)[0]
+    pdf_bytes = (form / "form.pdf").read_bytes()
+    sha = blob_store.put_bytes(pdf_bytes)
+    overlay = synthetic_overlay(json.loads((form / "overlay.json").read_text()), pdf_bytes)
+    job = {"sha": sha, "path": str(blob_store.path(sha)), "overlay": Overlay.from_dict(overlay), "overlay_json": overlay,
+           "answers": synthetic_answers(overlay["fields"], b"")}
+    prepared_pdf(sha, job["path"])  # a stored form's fill plan exists after its first fill
+
+    ctx = mp.get_context("spawn")
+    results: Dict[str, Dict[str, Any]] = {}
+    for op in OPS:
+        results[op] = {}
+        for mode in MODES:
+            with ctx.Pool(1) as pool:  # a fresh heap per run
+                results[op][mode] = pool.apply(_run, (op, mode, job, args.concurrency))
+
+    print(f"{form.parts[-3]}/{form.name}: {len(pdf_bytes) / 1024:.0f} KB, {args.concurrency} concurrent requests")
+    print(f"{'KB per request':<16} {'RSS copied':>11} {'RSS mapped':>11} {'anon copied':>12} {'anon mapped':>12}"
+          f" {'ms copied':>10} {'ms mapped':>10}")
+    for op, r in results.items():
+        c, m = r["copied"], r["mapped"]
+        print(f"{op:<16} {c['rss_per_request_kb']:>11} {m['rss_per_request_kb']:>11} {c['anon_per_request_kb']:>12}"
+              f" {m['anon_per_request_kb']:>12} {c['batch_ms']:>10} {m['batch_ms']:>10}")
+    if args.out:
+        Path(args.out).write_text(json.dumps({"form": f"{form.parts[-3]}/{form.name}", "pdf_kb": round(len(pdf_bytes) / 1024, 1),
+                                              "concurrency": args.concurrency, "operations": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
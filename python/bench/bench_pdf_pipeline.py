@@ -0,0 +1,289 @@
+"""
+Benchmark the PDF pipeline against every form in ``data/applications``.
+
+Operations per form:
+
+- ``fill_overlay``: ``fill_pdf_overlay_bytes`` with synthetic answers for
+  every ``overlay.json`` field (rects taken from the form's widgets when the
+  overlay has none);
+- ``fill_acroform``: ``fill_acroform_pdf_bytes`` with an answer per field;
+- ``is_acroform`` / ``existing_fields``: ``AcroFormHandler`` metadata;
+- ``render@72`` / ``render@144`` / ``render@300``: first page to PNG;
+- ``extract_text`` / ``key_info``: page text, then ``clean_extracted_text``
+  and ``extract_key_information``.
+
+Each operation runs once to warm up, then reports median/min wall time over
+``--repeat`` runs and, from one extra run, the Python heap peak (tracemalloc)
+and the RSS peak above the starting RSS (sampled every millisecond, so
+MuPDF's C allocations count).
+The JSON output carries the commit and library versions; ``--compare``
+prints per-operation ratios against an earlier run and exits non-zero on
+regressions.
+
+    cd python && python -m bench.bench_pdf_pipeline --out bench/results/pdf_pipeline.json
+    cd python && python -m bench.bench_pdf_pipeline --compare bench/results/pdf_pipeline.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import fitz
+import psutil
+import PyPDF2
+
+from overlay.acroform_handler import AcroFormHandler, fill_acroform_pdf_bytes
+from overlay.fill_overlay import fill_pdf_overlay_bytes
+from server.pdf_routes import clean_extracted_text, extract_key_information
+
+APPS = Path(__file__).resolve().parents[2] / "data" / "applications"
+OPS = ("fill_overlay", "fill_acroform", "is_acroform", "existing_fields",
+       "render@72", "render@144", "render@300", "extract_text", "key_info")
+
+
+def _signature_png() -> bytes:
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 240, 80), 0)
+    pix.clear_with(255)
+    return pix.tobytes("png")
+
+
+def synthetic_overlay(overlay: Dict[str, Any], pdf_bytes: bytes) -> Dict[str, Any]:
+    """``overlay`` with a rect and page on every field: hand-mapped fields keep
+    theirs, AcroForm-derived ones take them from the widget of the same name."""
+    widgets = {}
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            for w in page.widgets() or []:
+                if not w.rect.is_empty:  # zero-size (hidden) widgets cannot hold drawn text
+                    widgets.setdefault(w.field_name, (page.number, list(w.rect)))
+    fields = []
+    for f in overlay.get("fields", []):
+        if "rect" not in f and f.get("id") in widgets:
+            page, rect = widgets[f["id"]]
+            f = {**f, "page": page, "rect": rect}
+        if "rect" in f:
+            fields.append(f)
+    return {**overlay, "fields": fields}
+
+
+def synthetic_answers(fields: List[Dict[str, Any]], signature: bytes) -> Dict[str, Any]:
+    answers = {}
+    for i, f in enumerate(fields):
+        ftype = (f.get("type") or "text").lower()
+        if ftype == "checkbox":
+            answers[f["id"]] = i % 2 == 0
+        elif ftype == "signature":
+            answers[f["id"]] = signature
+        else:
+            answers[f["id"]] = f"Sample {i} {f.get('label', f['id'])}"[:60]
+    return answers
+
+
+class _RssPeak:
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.proc = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.base = self.proc.memory_info().rss
+        self.peak = self.base
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.proc.memory_info().rss)
+            time.sleep(self.interval)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.proc.memory_info().rss)
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    fn()  # warm-up: first-call font/cmap loading is not what a regression check wants
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    with _RssPeak() as rss:
+        fn()
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "ms_median": round(statistics.median(timings) * 1000, 2),
+        "ms_min": round(min(timings) * 1000, 2),
+        "py_peak_kb": round(py_peak / 1024, 1),
+        "rss_peak_kb": round((rss.peak - rss.base) / 1024, 1),
+    }
+
+
+def _extract_text(pdf_bytes: bytes) -> str:
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return "\n".join(page.get_text() for page in doc)
+
+
+def _render(pdf_bytes: bytes, dpi: int) -> bytes:
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return doc[0].get_pixmap(dpi=dpi, alpha=False).tobytes("png")
+
+
+def bench_form(pdf_path: Path, ops: List[str], repeat: int, signature: bytes) -> Dict[str, Any]:
+    pdf_bytes = pdf_path.read_bytes()
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        pages = len(doc)
+    overlay_path = pdf_path.parent / "overlay.json"
+    overlay = synthetic_overlay(json.loads(overlay_path.read_text()), pdf_bytes) if overlay_path.exists() else {"fields": []}
+    overlay_answers = synthetic_answers(overlay["fields"], signature)
+    acro_fields = AcroFormHandler(pdf_bytes).get_existing_fields()
+    acro_answers = synthetic_answers([{**f, "id": str(f["id"])} for f in acro_fields], signature)
+    text = clean_extracted_text(_extract_text(pdf_bytes))
+
+    runners: Dict[str, Callable[[], Any]] = {
+        "fill_overlay": lambda: fill_pdf_overlay_bytes(pdf_bytes, overlay, overlay_answers),
+        "fill_acroform": lambda: fill_acroform_pdf_bytes(pdf_bytes, acro_answers),
+        "is_acroform": lambda: AcroFormHandler().is_acroform_pdf(pdf_bytes),
+        "existing_fields": lambda: AcroFormHandler(pdf_bytes).get_existing_fields(),
+        "render@72": lambda: _render(pdf_bytes, 72),
+        "render@144": lambda: _render(pdf_bytes, 144),
+        "render@300": lambda: _render(pdf_bytes, 300),
+        "extract_text": lambda: clean_extracted_text(_extract_text(pdf_bytes)),
+        "key_info": lambda: extract_key_information(text),
+    }
+    results = {}
+    for op in ops:
+        if op == "fill_overlay" and not overlay["fields"]:
+            continue
+        if op == "fill_acroform" and not acro_fields:
+            continue
+        try:
+            results[op] = measure(runners[op], repeat)
+        except Exception as e:
+            results[op] = {"error": f"{type(e).__name__}: {e}"}
+    return {
+        "form": f"{pdf_path.parents[2].name}/{pdf_path.parent.name}",
+        "bytes": len(pdf_bytes),
+        "pages": pages,
+        "overlay_fields": len(overlay["fields"]),
+        "acroform_fields": len(acro_fields),
+        "ops": results,
+    }
+
+
+def summarize(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for op in OPS:
+        ok = [r["ops"][op] for r in rows if "ms_median" in r["ops"].get(op, {})]
+        if not ok:
+            continue
+        summary[op] = {
+            "forms": len(ok),
+            "total_ms": round(sum(o["ms_median"] for o in ok), 1),
+            "max_ms": max(o["ms_median"] for o in ok),
+            "max_py_peak_kb": max(o["py_peak_kb"] for o in ok),
+            "max_rss_peak_kb": max(o["rss_peak_kb"] for o in ok),
+        }
+    return summary
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Per-operation change in the summed per-form minimum (the least noisy
+    statistic) over the forms both runs measured; regressions are marked with ``!``."""
+    before_rows = {r["form"]: r["ops"] for r in baseline.get("forms", [])}
+    lines, regressions = [], []
+    for op in OPS:
+        pairs = []
+        for r in current["forms"]:
+            now, before = r["ops"].get(op, {}), before_rows.get(r["form"], {}).get(op, {})
+            if "ms_min" in now and "ms_min" in before:
+                pairs.append((r["form"], before, now))
+        if not pairs:
+            continue
+        t0 = sum(b["ms_min"] for _, b, _ in pairs)
+        t1 = sum(n["ms_min"] for _, _, n in pairs)
+        m0 = max(b["rss_peak_kb"] for _, b, _ in pairs)
+        m1 = max(n["rss_peak_kb"] for _, _, n in pairs)
+        ratio = t1 / t0 if t0 else 1.0
+        worst = max(pairs, key=lambda p: p[2]["ms_min"] / max(p[1]["ms_min"], 0.01))
+        flag = "!" if ratio > 1 + threshold else " "
+        lines.append(f"{flag} {op:16} {t0:>10.1f} -> {t1:>10.1f} ms  x{ratio:.2f}  rss {m0:.0f} -> {m1:.0f} KB  "
+                     f"({len(pairs)} forms, worst {worst[0]})")
+        if flag == "!":
+            regressions.append(op)
+    return lines + ([f"regressions: {', '.join(regressions)}"] if regressions else [])
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=APPS, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ops", default=",".join(OPS), help="comma-separated subset of: " + ", ".join(OPS))
+    parser.add_argument("--form", help="only forms whose app/form contains this")
+    parser.add_argument("--out", type=Path, help="write the full result as JSON")
+    parser.add_argument("--compare", type=Path, help="earlier result to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="regression threshold for --compare")
+    args = parser.parse_args(argv)
+
+    ops = [op for op in args.ops.split(",") if op]
+    unknown = set(ops) - set(OPS)
+    if unknown:
+        parser.error(f"unknown ops: {', '.join(sorted(unknown))}")
+    signature = _signature_png()
+    paths = [p for p in sorted(APPS.glob("*/forms/*/form.pdf"))
+             if not args.form or args.form in f"{p.parents[2].name}/{p.parent.name}"]
+    # The handlers log every filled field; keep the calls, drop the output
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        rows = [bench_form(p, ops, args.repeat, signature) for p in paths]
+    result = {
+        "meta": {
+            "commit": _commit(),
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pymupdf": fitz.VersionBind,
+            "pypdf2": PyPDF2.__version__,
+            "repeat": args.repeat,
+        },
+        "summary": summarize(rows),
+        "forms": rows,
+    }
+
+    print(f"{'form':60} {'pg':>3} " + " ".join(f"{op:>13}" for op in ops))
+    for r in rows:
+        cells = [f"{r['ops'][op]['ms_median']:>13}" if "ms_median" in r["ops"].get(op, {}) else f"{'-':>13}" for op in ops]
+        print(f"{r['form'][:60]:60} {r['pages']:>3} " + " ".join(cells))
+    print(json.dumps(result["summary"], indent=2))
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(result, indent=2) + "\n")
+    if args.compare:
+        lines = compare(result, json.loads(args.compare.read_text()), args.threshold)
+        print("\n".join(lines))
+        return 1 if lines and lines[-1].startswith("regressions:") else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Measure shared fill plans against per-process copies, across worker processes.
+
+``--procs`` spawned processes (standing in for uvicorn workers and PDF
+worker processes) each fill the largest ``--forms`` forms ``--rounds``
+times, in three modes:
+
+- ``private``: each process prepares every PDF itself and keeps the bytes
+  on its heap (the per-process LRU fills used before ``server.fill_plans``);
+- ``shared_cold``: ``fill_blob`` with no ``prepared.pdf`` on disk yet;
+- ``shared_warm``: ``fill_blob`` with the plans already on disk (a worker
+  started after others have filled).
+
+Per mode it reports the first fill and the median later fill per process,
+and the memory of all processes together while they are alive: USS (private
+to each process) and PSS (shared pages split between the processes that map
+them). It also times a cached page render read with ``read_bytes`` and
+through the shared mapping.
+
+    cd python && python -m bench.bench_shared_cache --out bench/results/shared_cache.json
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+MODES = ("private", "shared_cold", "shared_warm")
+
+
+def _worker(mode: str, jobs: List[Dict[str, Any]], rounds: int, barrier, queue):
+    import psutil
+
+    from overlay.fill_overlay import fill_pdf_overlay_prepared, prepare_pdf
+    from server.fill_plans import fill_blob
+
+    private: Dict[str, bytes] = {}
+    first, later = [], []
+    for r in range(rounds):
+        for job in jobs:
+            t0 = time.perf_counter()
+            if mode == "private":
+                base = private.get(job["sha"])
+                if base is None:
+                    base = private[job["sha"]] = prepare_pdf(job["path"])
+                fill_pdf_overlay_prepared(base, job["overlay"], job["answers"])
+            else:
+                fill_blob(job["sha"], job["path"], job["overlay"], job["answers"])
+            (first if r == 0 else later).append((time.perf_counter() - t0) * 1000)
+    barrier.wait()  # measure while every process still holds what it mapped
+    mem = psutil.Process().memory_full_info()
+    queue.put({"first_ms": sum(first), "later_ms": statistics.median(later) if later else None,
+               "uss": mem.uss, "pss": mem.pss})
+    barrier.wait()
+
+
+def run_mode(mode: str, jobs: List[Dict[str, Any]], procs: int, rounds: int) -> Dict[str, Any]:
+    from server.blob_store import blob_store
+    from server.fill_plans import PLAN_NAME, prepared_pdf
+
+    for job in jobs:
+        plan = blob_store.derived_dir(job["sha"]) / PLAN_NAME
+        if mode == "shared_warm":
+            prepared_pdf(job["sha"], job["path"])
+        else:
+            plan.unlink(missing_ok=True)
+    ctx = mp.get_context("spawn")
+    barrier, queue = ctx.Barrier(procs), ctx.Queue()
+    workers = [ctx.Process(target=_worker, args=(mode, jobs, rounds, barrier, queue)) for _ in range(procs)]
+    for w in workers:
+        w.start()
+    stats = [queue.get(timeout=600) for _ in workers]  # raises if a worker died
+    for w in workers:
+        w.join()
+    return {
+        "first_round_ms": round(statistics.median(s["first_ms"] for s in stats), 1),
+        "fill_ms_median": round(statistics.median(s["later_ms"] for s in stats), 1),
+        "uss_mb": round(sum(s["uss"] for s in stats) / 2**20, 1),
+        "pss_mb": round(sum(s["pss"] for s in stats) / 2**20, 1),
+    }
+
+
+def derived_reads(job: Dict[str, Any], repeat: int) -> Dict[str, float]:
+    import fitz
+
+    from server.blob_store import blob_store
+
+    def render() -> bytes:
+        with fitz.open(job["path"]) as doc:
+            return doc[0].get_pixmap(dpi=144, alpha=False).tobytes("png")
+
+    name = "page-0@144.png"
+    blob_store.derived(job["sha"], name, render)
+    path = blob_store.derived_dir(job["sha"]) / name
+
+    def timed(fn) -> float:
+        fn()
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return round((time.perf_counter() - t0) / repeat * 1e6, 2)
+
+    return {"kb": round(path.stat().st_size / 1024, 1),
+            "read_bytes_us": timed(path.read_bytes),
+            "shared_view_us": timed(lambda: blob_store.derived(job["sha"], name, render))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--forms", type=int, default=4, help="largest N forms")
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    from bench.bench_pdf_pipeline import synthetic_answers, synthetic_overlay
+    from bench.bench_signatures import largest_forms
+    from overlay.models import Overlay
+
+    jobs = []
+    for form in largest_forms(args.forms):
+        pdf_bytes = (form / "form.pdf").read_bytes()
+        sha = hashlib.sha256(pdf_bytes).hexdigest()
+        overlay = synthetic_overlay(json.loads((form / "overlay.json").read_text()), pdf_bytes)
+        jobs.append({"form": f"{form.parts[-3]}/{form.name}", "sha": sha, "path": str(form / "form.pdf"),
+                     "overlay": Overlay.from_dict(overlay), "answers": synthetic_answers(overlay["fields"], b"")})
+
+    results = {mode: run_mode(mode, jobs, args.procs, args.rounds) for mode in MODES}
+    reads = derived_reads(jobs[0], 200)
+
+    print(f"{args.procs} processes x {len(jobs)} forms x {args.rounds} rounds")
+    print(f"{'mode':<12} {'1st round ms':>13} {'fill ms p50':>12} {'USS MB':>8} {'PSS MB':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<12} {r['first_round_ms']:>13} {r['fill_ms_median']:>12} {r['uss_mb']:>8} {r['pss_mb']:>8}")
+    print(f"page render ({reads['kb']} KB): read_bytes {reads['read_bytes_us']} us, shared view {reads['shared_view_us']} us")
+    if args.out:
+        Path(args.out).write_text(json.dumps({"procs": args.procs, "rounds": args.rounds,
+                                              "forms": [j["form"] for j in jobs], "modes": results,
+                                              "derived_read": reads}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
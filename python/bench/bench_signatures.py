@@ -0,0 +1,131 @@
+"""
+Compare the two ways a fill request can carry signature images.
+
+- ``data_url``: ``data:image/png;base64,...`` strings inside ``answers_json``
+  (the original encoding);
+- ``parts``: one binary ``signature:<field id>,...`` multipart part.
+
+For the largest forms (by PDF size) it posts ``/fill-overlay`` requests with
+a signature field on every page. It does this in process against the
+offline app, with ``PDF_CPU_WORKERS=0`` so the fill's memory is counted
+here. Two images are used: a drawn signature (text rendered at 216 dpi) and
+a scanned one (incompressible noise, ``--scanned-kb``). With
+``--only-signatures`` the form's own fields are left out, so the
+signatures are the whole fill. Each row reports
+the request size, then median/min latency and the Python heap and RSS peaks
+from ``bench_pdf_pipeline.measure``. Request bodies are encoded up front,
+so the client side is not measured.
+
+    cd python && python -m bench.bench_signatures --out bench/results/signatures.json
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+os.environ.setdefault("PDF_CPU_WORKERS", "0")
+
+import fitz
+import httpx
+
+from bench.bench_pdf_pipeline import APPS, measure, synthetic_answers, synthetic_overlay
+
+ENCODINGS = ("data_url", "parts")
+
+
+def drawn_signature() -> bytes:
+    doc = fitz.open()
+    page = doc.new_page(width=300, height=80)
+    page.insert_text((12, 55), "Jane Q. Applicant", fontsize=30, fontname="tiro")
+    return page.get_pixmap(dpi=216, alpha=True).tobytes("png")
+
+
+def scanned_signature(kb: int) -> bytes:
+    # Noise does not compress, so the PNG ends up close to ``kb``
+    width = 1200
+    height = max(1, kb * 1024 // (width * 3))
+    pix = fitz.Pixmap(fitz.csRGB, width, height, os.urandom(width * height * 3), False)
+    return pix.tobytes("png")
+
+
+def largest_forms(count: int) -> List[Path]:
+    forms = [p.parent for p in APPS.glob("*/forms/*/form.pdf") if (p.parent / "overlay.json").exists()]
+    return sorted(forms, key=lambda d: (d / "form.pdf").stat().st_size, reverse=True)[:count]
+
+
+def signed_overlay(form: Path, pdf_bytes: bytes, only_signatures: bool = False) -> Dict[str, Any]:
+    """The form's overlay plus a signature field near the bottom of every page."""
+    overlay = synthetic_overlay(json.loads((form / "overlay.json").read_text()), pdf_bytes)
+    if only_signatures:
+        overlay["fields"] = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            w, h = page.rect.width, page.rect.height
+            overlay["fields"].append({"id": f"bench_signature_{page.number}", "type": "signature",
+                                      "page": page.number, "rect": [w - 250, h - 90, w - 40, h - 40]})
+    return overlay
+
+
+def encode(pdf_bytes: bytes, overlay: Dict[str, Any], png: bytes, encoding: str) -> Tuple[bytes, Dict[str, str]]:
+    signature_ids = [f["id"] for f in overlay["fields"] if f["type"] == "signature"]
+    answers = synthetic_answers([f for f in overlay["fields"] if f["type"] != "signature"], b"")
+    files = [("file", ("form.pdf", pdf_bytes, "application/pdf"))]
+    if encoding == "data_url":
+        url = "data:image/png;base64," + base64.b64encode(png).decode()
+        answers.update(dict.fromkeys(signature_ids, url))
+    else:
+        files.append((f"signature:{','.join(signature_ids)}", ("signature.png", png, "image/png")))
+    request = httpx.Request("POST", "http://bench/fill-overlay", files=files,
+                            data={"overlay_json": json.dumps(overlay), "answers_json": json.dumps(answers)})
+    return request.read(), dict(request.headers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--forms", type=int, default=4, help="largest N forms")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scanned-kb", type=int, default=900)
+    parser.add_argument("--only-signatures", action="store_true",
+                        help="drop the form's own fields, so the signatures are all the fill draws")
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    from fastapi.testclient import TestClient
+    from loadtest.offline_app import create_app
+
+    images = {"drawn": drawn_signature(), "scanned": scanned_signature(args.scanned_kb)}
+    rows = []
+    with TestClient(create_app()) as client:
+        for form in largest_forms(args.forms):
+            pdf_bytes = (form / "form.pdf").read_bytes()
+            overlay = signed_overlay(form, pdf_bytes, args.only_signatures)
+            for image, png in images.items():
+                for encoding in ENCODINGS:
+                    body, headers = encode(pdf_bytes, overlay, png, encoding)
+                    statuses = []
+
+                    def post():
+                        statuses.append(client.post("/fill-overlay", content=body, headers=headers).status_code)
+
+                    row = {"form": f"{form.parts[-3]}/{form.name}", "image": image, "image_kb": round(len(png) / 1024, 1),
+                           "encoding": encoding, "request_kb": round(len(body) / 1024, 1),
+                           **measure(post, args.repeat)}
+                    row["status"] = max(set(statuses), key=statuses.count)
+                    rows.append(row)
+
+    print(f"{'form':<60} {'image':<8} {'encoding':<9} {'req KB':>8} {'ms p50':>8} {'py KB':>9} {'rss KB':>9} {'status':>6}")
+    for r in rows:
+        print(f"{r['form'][-60:]:<60} {r['image']:<8} {r['encoding']:<9} {r['request_kb']:>8} {r['ms_median']:>8} "
+              f"{r['py_peak_kb']:>9} {r['rss_peak_kb']:>9} {r['status']:>6}")
+    if args.out:
+        Path(args.out).write_text(json.dumps({"scanned_kb": args.scanned_kb, "repeat": args.repeat,
+                                               "only_signatures": args.only_signatures, "rows": rows}, indent=2))
+    return 0 if all(r["status"] == 200 for r in rows if r["encoding"] == "parts") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Benchmark worker start-up: import cost and time to the first ``/health``.
+
+Import cost comes from ``python -X importtime -c "import server.main"``
+(cumulative time per top-level package). Time to first health is measured
+by starting ``uvicorn server.main:app`` on a free port and polling
+``/health`` until it answers 200, with and without background warm-up.
+Job workers are disabled so only the API process is measured.
+
+    cd python && python -m bench.bench_startup [--runs 5] [--out bench/results/startup.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+_IMPORTTIME = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_profile(top: int):
+    """Total ``import server.main`` time and the heaviest top-level imports."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server.main"],
+                          cwd=ROOT, env={**os.environ, "PYTHONPATH": str(ROOT)},
+                          capture_output=True, text=True, check=True)
+    main_us, packages = 0, {}
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if not m:
+            continue
+        cumulative, name = int(m.group(2)), m.group(4)
+        if name == "server.main":
+            main_us = cumulative
+        # A package's cost is its largest cumulative entry (its first import)
+        pkg = name.split(".")[0]
+        if pkg != "server":
+            packages[pkg] = max(packages.get(pkg, 0), cumulative)
+    heaviest = sorted(packages.items(), key=lambda kv: -kv[1])[:top]
+    return {
+        "import_server_main_ms": round(main_us / 1000, 1),
+        "top_imports_ms": {name: round(us / 1000, 1) for name, us in heaviest},
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _request(url: str, data: bytes = None, timeout: float = 60.0) -> float:
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(url, data=data, timeout=timeout) as r:
+        r.read()
+    return time.perf_counter() - t0
+
+
+def first_health(warmup: bool, form: str, timeout: float):
+    """Seconds from process spawn to the first 200 from ``/health``, then the
+    latency of the first ``/ai-status`` (OpenAI client) and the first fill of
+    ``form`` (PDF libraries)."""
+    port = _free_port()
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "JOBS_WORKERS": "0",
+           "STARTUP_WARMUP": "1" if warmup else "0"}
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "server.main:app", "--port", str(port),
+                             "--log-level", "warning"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+            if time.perf_counter() - t0 > timeout:
+                raise TimeoutError("no /health response")
+            try:
+                _request(base + "/health", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.01)
+        health_s = time.perf_counter() - t0
+        if warmup:
+            time.sleep(2.0)  # give the background warm-up time to finish
+        first = {"ai_status": _request(base + "/ai-status")}
+        if form:
+            body = urllib.parse.urlencode({"answers_json": "{}"}).encode()
+            first["fill"] = _request(f"{base}/apps/{form}/fill", body)
+        return health_s, first
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports to report")
+    parser.add_argument("--form", default="alameda_county_mehko/forms/MEHKO_APP_SOP",
+                        help="form filled right after /health ('' to skip)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--out", type=Path, help="write the result as JSON")
+    args = parser.parse_args(argv)
+
+    imports = [import_profile(args.top) for _ in range(args.runs)]
+    summary = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "import_server_main_ms": statistics.median(r["import_server_main_ms"] for r in imports),
+        "top_imports_ms": imports[-1]["top_imports_ms"],
+    }
+    for warmup in (False, True):
+        rows = [first_health(warmup, args.form, args.timeout) for _ in range(args.runs)]
+        key = "warmup" if warmup else "lazy"
+        summary[f"{key}_first_health_ms"] = round(statistics.median(h for h, _ in rows) * 1000, 1)
+        for name in rows[0][1]:
+            summary[f"{key}_first_{name}_ms"] = round(statistics.median(r[name] for _, r in rows) * 1000, 1)
+
+    print(json.dumps(summary, indent=2))
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(summary, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
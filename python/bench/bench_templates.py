@@ -0,0 +1,178 @@
+"""
+Measure typed templates and the JSON codec against every stored template.
+
+Over all ``overlay.json`` and ``acroform-definition.json`` files in
+``data/applications`` (times are totals for the whole set):
+
+- ``parse``: ``json.loads`` vs ``json_codec.loads``;
+- ``serialize``: the save encoding, ``json.dumps(indent=2)`` vs
+  ``json_codec.dumps(indent=True)``;
+- ``validate``: ``Overlay`` / ``AcroFormDefinition.from_dict`` (once per load);
+- ``field_loop``: a fill's per-field bookkeeping with every field answered,
+  without drawing: the ``dict.get``/coercion loop fills ran before the
+  models, vs attribute reads on the validated model;
+- ``pickle``: the overlay a fill sends to a PDF worker, dict vs model;
+- ``retained``: heap held by the parsed dicts vs the models.
+
+Then response rendering (``JSONResponse`` vs ``FastJSONResponse``) for the
+largest bodies the API returns as JSON, and ``fill_pdf_overlay_bytes``
+with a raw dict (validated on every call) vs a model on the largest forms.
+``orjson`` is optional: without it the codec rows measure the stdlib.
+
+    cd python && python -m bench.bench_templates --out bench/results/templates.json
+"""
+
+import argparse
+import json
+import pickle
+import platform
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from starlette.responses import JSONResponse
+
+from bench.bench_pdf_pipeline import APPS, measure, synthetic_answers, synthetic_overlay
+from overlay.fill_overlay import fill_pdf_overlay_bytes
+from overlay.models import AcroFormDefinition, Overlay
+from server import json_codec
+from server.json_codec import FastJSONResponse
+
+KINDS = {"overlay.json": Overlay, "acroform-definition.json": AcroFormDefinition}
+
+
+def load_templates() -> List[Dict[str, Any]]:
+    rows = []
+    for name, model in KINDS.items():
+        for path in sorted(APPS.glob(f"*/forms/*/{name}")):
+            body = path.read_bytes()
+            rows.append({"path": path, "body": body, "data": json.loads(body), "model": model})
+    return rows
+
+
+def legacy_field_loop(overlay: Dict[str, Any], answers: Dict[str, Any]) -> int:
+    """The per-field work of ``_fill`` before typed models (drawing left out)."""
+    n = 0
+    for f in overlay.get("fields", []):
+        fid = f["id"]; val = answers.get(fid)
+        if val in (None, ""): continue
+        page = int(f.get("page", 0))
+        ftype = (f.get("type", "text") or "text").lower()
+        if ftype == "checkbox":
+            n += bool(val) + page
+            continue
+        txt = str(val)
+        if f.get("uppercase"): txt = txt.upper()
+        n += f.get("bg") is not None
+        n += int(float(f.get("fontSize", 11))) + len(str(f.get("align", "left"))) + bool(f.get("shrink", True)) + len(txt)
+    return n
+
+
+def model_field_loop(overlay: Overlay, answers: Dict[str, Any]) -> int:
+    n = 0
+    for f in overlay.fields:
+        val = answers.get(f.id)
+        if val in (None, ""): continue
+        page = f.page or 0
+        if f.type == "checkbox":
+            n += bool(val) + page
+            continue
+        txt = str(val)
+        if f.uppercase: txt = txt.upper()
+        n += f.bg
+        n += int(f.font_size) + len(f.align) + f.shrink + len(txt)
+    return n
+
+
+def retained_kb(build: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    kept = build()  # noqa: F841 (held while measuring)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(size / 1024, 1)
+
+
+def compare(rows: Dict[str, Dict[str, Any]], name: str, before: Callable[[], Any], after: Callable[[], Any], repeat: int):
+    b, a = measure(before, repeat), measure(after, repeat)
+    rows[name] = {"before": b, "after": a, "speedup": round(b["ms_median"] / a["ms_median"], 2) if a["ms_median"] else None}
+
+
+def response_bodies() -> Dict[str, Any]:
+    from loadtest.payloads import load_counties
+    from server.blob_store import file_sha256
+    from server.form_index import form_index
+    from server.uploads import _page_texts
+
+    largest = max(APPS.glob("*/forms/*/form.pdf"), key=lambda p: p.stat().st_size)
+    return {
+        "/apps/index": {"version": 1, "apps": form_index.snapshot.to_dict()},
+        f"/text ({largest.parts[-3]})": {"pages": _page_texts(file_sha256(largest), largest)},
+        "/admin/counties": {"counties": load_counties()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--fill-forms", type=int, default=4, help="largest N forms for the fill comparison")
+    parser.add_argument("--fill-repeat", type=int, default=5)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    templates = load_templates()
+    models = [t["model"].from_dict(t["data"]) for t in templates]
+    answered = [synthetic_answers(t["data"].get("fields", []), b"") for t in templates]
+    ops: Dict[str, Dict[str, Any]] = {}
+
+    compare(ops, "parse", lambda: [json.loads(t["body"]) for t in templates],
+            lambda: [json_codec.loads(t["body"]) for t in templates], args.repeat)
+    compare(ops, "serialize", lambda: [json.dumps(t["data"], indent=2, default=str).encode() for t in templates],
+            lambda: [json_codec.dumps(t["data"], indent=True, default=str) for t in templates], args.repeat)
+    ops["validate"] = measure(lambda: [t["model"].from_dict(t["data"]) for t in templates], args.repeat)
+    compare(ops, "field_loop", lambda: [legacy_field_loop(t["data"], a) for t, a in zip(templates, answered)],
+            lambda: [model_field_loop(m, a) for m, a in zip(models, answered)], args.repeat)
+    compare(ops, "pickle", lambda: [pickle.loads(pickle.dumps(t["data"])) for t in templates],
+            lambda: [pickle.loads(pickle.dumps(m)) for m in models], args.repeat)
+    ops["pickle"]["bytes"] = {"before": sum(len(pickle.dumps(t["data"])) for t in templates),
+                              "after": sum(len(pickle.dumps(m)) for m in models)}
+    ops["retained"] = {"dict_kb": retained_kb(lambda: [json.loads(t["body"]) for t in templates]),
+                       "model_kb": retained_kb(lambda: [t["model"].from_dict(json.loads(t["body"])) for t in templates])}
+
+    responses = {}
+    for name, content in response_bodies().items():
+        compare(responses, name, lambda: JSONResponse(content), lambda: FastJSONResponse(content), args.repeat)
+        responses[name]["kb"] = round(len(FastJSONResponse(content).body) / 1024, 1)
+
+    fills = {}
+    forms = sorted((p.parent for p in APPS.glob("*/forms/*/form.pdf") if (p.parent / "overlay.json").exists()),
+                   key=lambda d: (d / "form.pdf").stat().st_size, reverse=True)[:args.fill_forms]
+    for form in forms:
+        pdf_bytes = (form / "form.pdf").read_bytes()
+        overlay = synthetic_overlay(json.loads((form / "overlay.json").read_text()), pdf_bytes)
+        answers = synthetic_answers(overlay["fields"], b"")
+        model = Overlay.from_dict(overlay)
+        compare(fills, f"{form.parts[-3]}/{form.name}", lambda: fill_pdf_overlay_bytes(pdf_bytes, overlay, answers),
+                lambda: fill_pdf_overlay_bytes(pdf_bytes, model, answers), args.fill_repeat)
+        fills[f"{form.parts[-3]}/{form.name}"]["fields"] = len(model.placed)
+
+    print(f"{len(templates)} templates, {sum(len(m.fields) for m in models)} fields, "
+          f"orjson={'yes' if json_codec.ORJSON_AVAILABLE else 'no'}")
+    print(f"{'operation':<40} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for section in (ops, responses, fills):
+        for name, r in section.items():
+            if "before" in r:
+                print(f"{name[-40:]:<40} {r['before']['ms_median']:>10} {r['after']['ms_median']:>10} {r['speedup']:>8}")
+    print(f"{'validate':<40} {'':>10} {ops['validate']['ms_median']:>10}")
+    print(f"pickle bytes {ops['pickle']['bytes']}, retained {ops['retained']}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({
+            "python": platform.python_version(), "orjson": json_codec.ORJSON_AVAILABLE,
+            "templates": len(templates), "fields": sum(len(m.fields) for m in models), "repeat": args.repeat,
+            "templates_ops": ops, "responses": responses, "fill": fills}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+End-to-end HTTP load test of the whole backend, offline.
+
+Starts ``loadtest.offline_app`` (the real app against the Firestore and
+OpenAI fakes) in a subprocess, or drives ``--target``, with the mixed
+traffic described by a scenario file: which routes, in what proportion, at
+what rate, with what fake upstream behaviour. The request sequence (route,
+form, page, payload and arrival time of every request) is generated up
+front from the scenario's seed, so two runs of the same scenario send the
+same requests; the report carries its digest.
+
+Reports latency percentiles, error rates and throughput per route and
+overall.
+
+    cd python && python -m loadtest.app_load loadtest/scenarios/mixed.json --out /tmp/mixed.json
+    cd python && python -m loadtest.app_load loadtest/scenarios/mixed.json --target http://127.0.0.1:8000
+
+Scenario keys (all optional except ``mix``):
+
+- ``mix``: route -> weight, routes from ``ROUTES``;
+- ``rate``: open-loop arrivals per second (0: closed loop of ``concurrency`` users);
+- ``duration_seconds`` / ``requests``: length of an open / closed-loop run;
+- ``forms``: ``app/form`` ids to use (default: every form with a PDF);
+- ``preview_dpi``: DPIs for ``preview`` (one is picked per request);
+- ``server``: ``workers``, ``firestore_latency`` and extra ``env`` for the app;
+- ``openai``: fake upstream settings (``latency``, ``token_rate``, ``error_rate``, ``rate_limit_rate``).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from loadtest.common import LoopLagProbe, free_port, percentiles
+from loadtest.payloads import APPS, payload_pool
+
+ROUTES = {
+    "list_apps": "GET /apps",
+    "list_forms": "GET /apps/{app}/forms",
+    "template": "GET /apps/{app}/forms/{form}/template",
+    "page_metrics": "GET /apps/{app}/forms/{form}/page-metrics",
+    "preview": "GET /apps/{app}/forms/{form}/preview-page",
+    "fill": "POST /apps/{app}/forms/{form}/fill",
+    "chat": "POST /ai-chat",
+    "status": "GET /ai-status",
+}
+
+DEFAULTS: Dict[str, Any] = {
+    "name": "unnamed",
+    "seed": 0,
+    "rate": 0.0,
+    "duration_seconds": 30,
+    "concurrency": 16,
+    "requests": 500,
+    "forms": None,
+    "preview_dpi": [144],
+    "chat_pool": 50,
+    "server": {"workers": 1, "firestore_latency": 0.0, "env": {}},
+    "openai": {"latency": "lognormal:0.6:0.35", "token_rate": 60.0, "error_rate": 0.0, "rate_limit_rate": 0.0},
+}
+
+
+def load_scenario(path: Path) -> Dict[str, Any]:
+    scenario = {**DEFAULTS, **json.loads(Path(path).read_text())}
+    for key in ("server", "openai"):
+        scenario[key] = {**DEFAULTS[key], **scenario.get(key, {})}
+    unknown = set(scenario["mix"]) - set(ROUTES)
+    if unknown:
+        raise ValueError(f"unknown routes in mix: {', '.join(sorted(unknown))}")
+    return scenario
+
+
+def _forms(selected: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Forms to exercise, with their page count and fill answers."""
+    import fitz
+
+    out = []
+    for pdf in sorted(APPS.glob("*/forms/*/form.pdf")):
+        app, form = pdf.parents[2].name, pdf.parent.name
+        if selected and f"{app}/{form}" not in selected:
+            continue
+        with fitz.open(pdf) as doc:
+            pages = len(doc)
+        overlay = pdf.parent / "overlay.json"
+        fields = json.loads(overlay.read_text()).get("fields", []) if overlay.exists() else []
+        answers = {}
+        for i, f in enumerate(fields):
+            if (f.get("type") or "text").lower() == "checkbox":
+                answers[f["id"]] = i % 2 == 0
+            elif (f.get("type") or "text").lower() != "signature":
+                answers[f["id"]] = f"Sample {i}"
+        out.append({"app": app, "form": form, "pages": pages, "answers": json.dumps(answers)})
+    return out
+
+
+def build_schedule(scenario: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Every request of the run, in order, with its arrival offset (open loop)."""
+    rng = random.Random(scenario["seed"])
+    forms = _forms(scenario["forms"])
+    chats = payload_pool(scenario["chat_pool"], seed=scenario["seed"]) if "chat" in scenario["mix"] else []
+    names = list(scenario["mix"])
+    weights = [scenario["mix"][n] for n in names]
+
+    schedule, at = [], 0.0
+    while True:
+        if scenario["rate"]:
+            at += rng.expovariate(scenario["rate"])
+            if at > scenario["duration_seconds"]:
+                break
+        elif len(schedule) >= scenario["requests"]:
+            break
+        route = rng.choices(names, weights)[0]
+        f = rng.choice(forms)
+        req: Dict[str, Any] = {"at": round(at, 4), "route": route}
+        if route == "list_apps":
+            req.update(method="GET", path="/apps")
+        elif route == "list_forms":
+            req.update(method="GET", path=f"/apps/{f['app']}/forms")
+        elif route == "template":
+            req.update(method="GET", path=f"/apps/{f['app']}/forms/{f['form']}/template")
+        elif route == "page_metrics":
+            req.update(method="GET", path=f"/apps/{f['app']}/forms/{f['form']}/page-metrics",
+                       params={"page": rng.randrange(f["pages"])})
+        elif route == "preview":
+            req.update(method="GET", path=f"/apps/{f['app']}/forms/{f['form']}/preview-page",
+                       params={"page": rng.randrange(f["pages"]), "dpi": rng.choice(scenario["preview_dpi"])})
+        elif route == "fill":
+            req.update(method="POST", path=f"/apps/{f['app']}/forms/{f['form']}/fill",
+                       data={"answers_json": f["answers"]})
+        elif route == "chat":
+            req.update(method="POST", path="/ai-chat", json=rng.choice(chats))
+        elif route == "status":
+            req.update(method="GET", path="/ai-status")
+        schedule.append(req)
+    return schedule
+
+
+def schedule_digest(schedule: List[Dict[str, Any]]) -> str:
+    return hashlib.sha1(json.dumps(schedule, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def start_server(scenario: Dict[str, Any], log_path: Path) -> (subprocess.Popen, str):
+    port = free_port()
+    server, upstream = scenario["server"], scenario["openai"]
+    cmd = [sys.executable, "-m", "loadtest.offline_app", "--port", str(port),
+           "--workers", str(server["workers"]), "--firestore-latency", str(server["firestore_latency"]),
+           "--latency", upstream["latency"], "--token-rate", str(upstream["token_rate"]),
+           "--error-rate", str(upstream["error_rate"]), "--rate-limit", str(upstream["rate_limit_rate"]),
+           "--seed", str(scenario["seed"])]
+    env = {**os.environ, **{k: str(v) for k, v in server["env"].items()}}
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(cmd, cwd=Path(__file__).resolve().parents[1], env=env,
+                                stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}; see {log_path}")
+        try:
+            if httpx.get(f"{base}/health", timeout=1).status_code == 200:
+                return proc, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"server did not become healthy; see {log_path}")
+
+
+async def drive(client: httpx.AsyncClient, scenario: Dict[str, Any], schedule: List[Dict[str, Any]]):
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    outcomes: Dict[str, Counter] = defaultdict(Counter)
+    sizes: Dict[str, int] = Counter()
+
+    async def one(req):
+        kwargs = {k: req[k] for k in ("params", "data", "json") if k in req}
+        started = time.perf_counter()
+        try:
+            r = await client.request(req["method"], req["path"], **kwargs)
+            elapsed = time.perf_counter() - started
+            outcomes[req["route"]]["ok" if r.status_code < 400 else f"http_{r.status_code}"] += 1
+            latencies[req["route"]].append(elapsed)
+            sizes[req["route"]] += len(r.content)
+        except httpx.HTTPError as e:
+            outcomes[req["route"]][type(e).__name__] += 1
+
+    lag = LoopLagProbe()
+    lag.start()
+    started = time.perf_counter()
+    if scenario["rate"]:
+        tasks = []
+        for req in schedule:
+            delay = started + req["at"] - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(req)))
+        await asyncio.gather(*tasks)
+    else:
+        queue = iter(schedule)
+
+        async def user():
+            for req in queue:
+                await one(req)
+
+        await asyncio.gather(*(user() for _ in range(scenario["concurrency"])))
+    wall = time.perf_counter() - started
+    await lag.stop()
+
+    routes = {}
+    for route in scenario["mix"]:
+        count = sum(outcomes[route].values())
+        if not count:
+            continue
+        errors = count - outcomes[route]["ok"]
+        routes[route] = {
+            "route": ROUTES[route],
+            "requests": count,
+            "errors": errors,
+            "error_rate": round(errors / count, 4),
+            "throughput_rps": round(count / wall, 2),
+            "latency_ms": percentiles(latencies[route]),
+            "mean_response_kb": round(sizes[route] / max(1, len(latencies[route])) / 1024, 1),
+            "outcomes": dict(outcomes[route]),
+        }
+    total = sum(r["requests"] for r in routes.values())
+    errors = sum(r["errors"] for r in routes.values())
+    return {
+        "wall_seconds": round(wall, 2),
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else None,
+        "throughput_rps": round(total / wall, 2) if wall else None,
+        "latency_ms": percentiles([x for v in latencies.values() for x in v]),
+        "client_loop_lag_ms": lag.report(),
+        "routes": routes,
+    }
+
+
+async def run(scenario: Dict[str, Any], target: Optional[str], log_path: Path) -> Dict[str, Any]:
+    schedule = build_schedule(scenario)
+    proc = None
+    if not target:
+        proc, target = start_server(scenario, log_path)
+    limits = httpx.Limits(max_connections=max(scenario["concurrency"], 64))
+    try:
+        async with httpx.AsyncClient(base_url=target, timeout=120, limits=limits) as client:
+            result = await drive(client, scenario, schedule)
+            server = {}
+            for path in ("/ai-status", "/admin/status"):
+                try:
+                    server[path] = (await client.get(path)).json()
+                except (httpx.HTTPError, ValueError):
+                    pass
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+    return {
+        "scenario": scenario["name"],
+        "seed": scenario["seed"],
+        "mode": f"open-loop {scenario['rate']}/s" if scenario["rate"] else f"closed-loop x{scenario['concurrency']}",
+        "schedule_digest": schedule_digest(schedule),
+        "scheduled": len(schedule),
+        **result,
+        "server": {
+            "ai_cache": server.get("/ai-status", {}).get("cache"),
+            "ai_upstream": server.get("/ai-status", {}).get("upstream"),
+            "application_cache": server.get("/admin/status", {}).get("application_cache"),
+        },
+        "server_log": None if target and proc is None else str(log_path),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("scenario", type=Path, help="scenario JSON (see loadtest/scenarios/)")
+    parser.add_argument("--target", help="base URL of a running server (default: start loadtest.offline_app)")
+    parser.add_argument("--seed", type=int, help="override the scenario seed")
+    parser.add_argument("--out", type=Path, help="write the report as JSON")
+    parser.add_argument("--server-log", type=Path, help="server output (default: a temporary file)")
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario)
+    if args.seed is not None:
+        scenario["seed"] = args.seed
+    log_path = args.server_log or Path(tempfile.mkstemp(prefix="app-load-", suffix=".log")[1])
+    report = asyncio.run(run(scenario, args.target, log_path))
+
+    print(f"{'route':14} {'req':>6} {'err%':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, r in report["routes"].items():
+        lat = r["latency_ms"]
+        print(f"{name:14} {r['requests']:>6} {r['error_rate'] * 100:>6.1f} {r['throughput_rps']:>7} "
+              f"{lat['p50']!s:>8} {lat['p95']!s:>8} {lat['p99']!s:>8}")
+    print(json.dumps({k: v for k, v in report.items() if k != "routes"}, indent=2))
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2) + "\n")
+    return 1 if report["requests"] == 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Offline load test for ``/ai-chat``.
+
+By default everything runs in one process: the fake OpenAI server is started
+on a local port, ``server.ai_routes`` is imported with ``OPENAI_BASE_URL``
+pointing at it, and requests are driven through an in-process ASGI transport
+on the same event loop. Loop lag measured here is therefore the lag the
+route itself causes. Use ``--target`` to drive an already running server
+instead (lag then only reflects the client).
+
+    cd python && python -m loadtest.chat_load --concurrency 32 --requests 500 --rate-limit 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from loadtest import fake_openai
+from loadtest.common import LoopLagProbe, free_port, percentiles, serve_in_thread
+from loadtest.payloads import payload_pool
+
+FALLBACK_MARKER = "experiencing technical difficulties"
+
+
+def build_inprocess_client(args) -> httpx.AsyncClient:
+    port = free_port()
+    serve_in_thread(fake_openai.create_app(fake_openai.config_from_args(args)), port)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    if args.no_cache:
+        os.environ["AI_CACHE_MAX_ENTRIES"] = "0"
+
+    from fastapi import FastAPI
+    from server.ai_routes import router as ai_router
+
+    app = FastAPI()
+    app.include_router(ai_router)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=120)
+
+
+async def run(args):
+    client = (httpx.AsyncClient(base_url=args.target, timeout=120) if args.target
+              else build_inprocess_client(args))
+    pool = payload_pool(args.pool, seed=args.seed)
+    rng = random.Random(args.seed)
+    latencies, outcomes = [], Counter()
+    remaining = args.requests
+    lag = LoopLagProbe()
+
+    async def one():
+        payload = rng.choice(pool)
+        started = time.perf_counter()
+        try:
+            r = await client.post("/ai-chat", json=payload)
+            elapsed = time.perf_counter() - started
+            if r.status_code != 200:
+                outcomes[f"http_{r.status_code}"] += 1
+            elif FALLBACK_MARKER in r.json().get("reply", ""):
+                outcomes["fallback"] += 1
+            else:
+                outcomes["ok"] += 1
+            latencies.append(elapsed)
+        except httpx.HTTPError as e:
+            outcomes[type(e).__name__] += 1
+
+    async def user():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await one()
+            if args.think_time:
+                await asyncio.sleep(rng.expovariate(1.0 / args.think_time))
+
+    async def open_loop():
+        tasks = []
+        for _ in range(args.requests):
+            tasks.append(asyncio.create_task(one()))
+            await asyncio.sleep(rng.expovariate(args.rate))
+        await asyncio.gather(*tasks)
+
+    lag.start()
+    started = time.perf_counter()
+    if args.rate:
+        await open_loop()
+    else:
+        await asyncio.gather(*(user() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - started
+    await lag.stop()
+
+    status = (await client.get("/ai-status")).json()
+    await client.aclose()
+    return {
+        "requests": args.requests,
+        "mode": f"open-loop {args.rate}/s" if args.rate else f"closed-loop x{args.concurrency}",
+        "wall_seconds": round(wall, 2),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "outcomes": dict(outcomes),
+        "latency_ms": percentiles(latencies),
+        "loop_lag_ms": lag.report(),
+        "server_cache": status.get("cache"),
+        "server_upstream": status.get("upstream"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test /ai-chat against a fake OpenAI upstream")
+    parser.add_argument("--target", help="base URL of a running server (default: in-process)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop virtual users")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrivals per second (overrides --concurrency)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between a user's requests")
+    parser.add_argument("--pool", type=int, default=50, help="distinct payloads to replay")
+    parser.add_argument("--no-cache", action="store_true", help="disable the answer cache (in-process only)")
+    parser.add_argument("--out", help="write the report as JSON")
+    fake_openai.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
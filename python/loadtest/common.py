@@ -0,0 +1,69 @@
+"""Shared helpers for the load-test harnesses."""
+
+import asyncio
+import socket
+import threading
+import time
+from typing import Dict, List, Sequence
+
+
+def percentiles(values: Sequence[float], points=(50, 95, 99)) -> Dict[str, float]:
+    """Nearest-rank percentiles in milliseconds (values are seconds)."""
+    if not values:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(values)
+    out = {}
+    for p in points:
+        rank = max(0, min(len(ordered) - 1, int(round(p / 100.0 * len(ordered) + 0.5)) - 1))
+        out[f"p{p}"] = round(ordered[rank] * 1000, 1)
+    out["max"] = round(ordered[-1] * 1000, 1)
+    return out
+
+
+class LoopLagProbe:
+    """Measures how late a periodic timer fires on the running event loop."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def report(self) -> Dict[str, float]:
+        return percentiles(self.samples)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_thread(app, port: int, host: str = "127.0.0.1"):
+    """Run an ASGI app with uvicorn on a daemon thread; returns the server."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"server on port {port} did not start")
+        time.sleep(0.02)
+    return server
@@ -0,0 +1,196 @@
+"""
+In-process Firestore fake for offline runs and load tests.
+
+Implements the subset of the ``google.cloud.firestore`` client the backend
+uses: collections and documents (get/set/create/update/delete/add), nested
+subcollections, ``batch()`` (atomic, with ``create`` preconditions),
+``bulk_writer()`` and collection ``on_snapshot`` listeners. An optional
+per-round-trip latency makes round-trip savings visible, and ``stats``
+counts them.
+
+    from loadtest.fake_firestore import FakeFirestore
+    from server.firestore_store import ApplicationStore
+    store = ApplicationStore(db=FakeFirestore(latency=0.02))
+"""
+
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+
+def _resolve(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: (time.time() if v is SERVER_TIMESTAMP else v) for k, v in data.items()}
+
+
+class FakeSnapshot:
+    def __init__(self, ref: "FakeDocument", data: Optional[Dict[str, Any]]):
+        self.reference = ref
+        self.id = ref.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db: "FakeFirestore", path: str):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> "FakeCollection":
+        return FakeCollection(self._db, f"{self.path}/{name}")
+
+    def get(self) -> FakeSnapshot:
+        self._db._round_trip("reads")
+        return FakeSnapshot(self, self._db._docs.get(self.path))
+
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        self._db._round_trip("writes")
+        self._db._apply([("set", self, data, merge)])
+
+    def create(self, data: Dict[str, Any]):
+        self._db._round_trip("writes")
+        self._db._apply([("create", self, data, False)])
+
+    def update(self, data: Dict[str, Any]):
+        self._db._round_trip("writes")
+        self._db._apply([("update", self, data, True)])
+
+    def delete(self):
+        self._db._round_trip("writes")
+        self._db._apply([("delete", self, None, False)])
+
+
+class FakeCollection:
+    def __init__(self, db: "FakeFirestore", path: str):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocument:
+        return FakeDocument(self._db, f"{self.path}/{doc_id or uuid.uuid4().hex[:20]}")
+
+    def add(self, data: Dict[str, Any]) -> Tuple[float, FakeDocument]:
+        ref = self.document()
+        ref.set(data)
+        return time.time(), ref
+
+    def stream(self):
+        self._db._round_trip("reads")
+        prefix = self.path + "/"
+        for path, data in list(self._db._docs.items()):
+            if path.startswith(prefix) and "/" not in path[len(prefix):]:
+                yield FakeSnapshot(FakeDocument(self._db, path), data)
+
+    def on_snapshot(self, callback: Callable) -> SimpleNamespace:
+        return self._db._listen(self.path, callback)
+
+
+class FakeBatch:
+    def __init__(self, db: "FakeFirestore"):
+        self._db = db
+        self._ops: List[tuple] = []
+
+    def set(self, ref: FakeDocument, data: Dict[str, Any], merge: bool = False):
+        self._ops.append(("set", ref, data, merge))
+
+    def create(self, ref: FakeDocument, data: Dict[str, Any]):
+        self._ops.append(("create", ref, data, False))
+
+    def update(self, ref: FakeDocument, data: Dict[str, Any]):
+        self._ops.append(("update", ref, data, True))
+
+    def delete(self, ref: FakeDocument):
+        self._ops.append(("delete", ref, None, False))
+
+    def commit(self):
+        self._db._round_trip("commits")
+        self._db._apply(self._ops)
+        self._ops = []
+
+
+class FakeBulkWriter(FakeBatch):
+    """Applies writes in chunks of ``batch_size`` on ``flush``/``close``."""
+
+    batch_size = 20
+
+    def flush(self):
+        while self._ops:
+            chunk, self._ops = self._ops[:self.batch_size], self._ops[self.batch_size:]
+            self._db._round_trip("commits")
+            self._db._apply(chunk)
+
+    close = flush
+
+
+class FakeFirestore:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._listeners: Dict[int, Tuple[str, Callable]] = {}
+        self.stats = {"round_trips": 0, "reads": 0, "writes": 0, "commits": 0}
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def bulk_writer(self) -> FakeBulkWriter:
+        return FakeBulkWriter(self)
+
+    def _round_trip(self, kind: str):
+        self.stats["round_trips"] += 1
+        self.stats[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _apply(self, ops: List[tuple]):
+        """Apply ``ops`` atomically: all preconditions are checked first."""
+        changes = []
+        with self._lock:
+            for op, ref, data, _ in ops:
+                if op == "create" and ref.path in self._docs:
+                    raise AlreadyExists(f"Document already exists: {ref.path}")
+                if op == "update" and ref.path not in self._docs:
+                    raise NotFound(f"No document to update: {ref.path}")
+            for op, ref, data, merge in ops:
+                existed = ref.path in self._docs
+                if op == "delete":
+                    if self._docs.pop(ref.path, None) is not None:
+                        changes.append(("REMOVED", ref, None))
+                    continue
+                doc = {**self._docs[ref.path], **_resolve(data)} if (merge and existed) else _resolve(data)
+                self._docs[ref.path] = doc
+                changes.append(("MODIFIED" if existed else "ADDED", ref, doc))
+        self._notify(changes)
+
+    def _listen(self, collection_path: str, callback: Callable) -> SimpleNamespace:
+        key = id(callback)
+        self._listeners[key] = (collection_path, callback)
+        prefix = collection_path + "/"
+        initial = [("ADDED", FakeDocument(self, p), d) for p, d in self._docs.items()
+                   if p.startswith(prefix) and "/" not in p[len(prefix):]]
+        self._deliver(callback, initial)
+        return SimpleNamespace(unsubscribe=lambda: self._listeners.pop(key, None))
+
+    def _notify(self, changes: List[tuple]):
+        for collection_path, callback in list(self._listeners.values()):
+            prefix = collection_path + "/"
+            mine = [c for c in changes if c[1].path.startswith(prefix) and "/" not in c[1].path[len(prefix):]]
+            if mine:
+                self._deliver(callback, mine)
+
+    @staticmethod
+    def _deliver(callback: Callable, changes: List[tuple]):
+        events = [SimpleNamespace(type=SimpleNamespace(name=kind), document=FakeSnapshot(ref, doc))
+                  for kind, ref, doc in changes]
+        callback([e.document for e in events], events, time.time())
@@ -0,0 +1,154 @@
+"""
+Fake OpenAI-compatible chat completions server for offline load tests.
+
+Serves ``POST /v1/chat/completions`` (plain and ``stream=true``) with a
+configurable latency distribution, token rate and error / 429 injection, so
+``/ai-chat`` can be driven hard without spending API quota.
+
+    cd python && python -m loadtest.fake_openai --port 8089 --latency lognormal:0.8:0.4 --rate-limit 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake uvicorn server.main:app
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "MEHKO permit applicants must submit the standard operating procedures form, "
+    "a health permit application, proof of a food safety manager certificate and "
+    "food handler cards for every helper before the county inspection is scheduled"
+).split()
+
+
+@dataclass
+class FakeConfig:
+    latency: str = "lognormal:0.6:0.35"   # fixed:S | uniform:A:B | lognormal:MEDIAN:SIGMA (seconds to first token)
+    token_rate: float = 60.0              # tokens per second after the first token
+    min_tokens: int = 40
+    max_tokens: int = 220
+    error_rate: float = 0.0               # fraction answered with HTTP 500
+    rate_limit_rate: float = 0.0          # fraction answered with HTTP 429
+    retry_after: float = 1.0              # Retry-After seconds sent with 429s
+    seed: int = 0
+    stats: Dict[str, int] = field(default_factory=lambda: {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "streamed": 0})
+
+    def first_token_delay(self, rng: random.Random) -> float:
+        kind, *params = self.latency.split(":")
+        values = [float(p) for p in params]
+        if kind == "fixed":
+            return values[0]
+        if kind == "uniform":
+            return rng.uniform(values[0], values[1])
+        if kind == "lognormal":
+            median, sigma = values
+            return rng.lognormvariate(0.0, sigma) * median
+        raise ValueError(f"unknown latency distribution: {self.latency}")
+
+
+def _error(status: int, message: str, kind: str, headers: Dict[str, str] = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": kind, "code": None, "param": None}},
+        headers=headers,
+    )
+
+
+def create_app(config: FakeConfig = None) -> FastAPI:
+    config = config or FakeConfig()
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Fake OpenAI", version="1.0")
+    app.state.config = config
+
+    @app.get("/v1/models")
+    def models():
+        return {"object": "list", "data": [{"id": "gpt-4", "object": "model", "owned_by": "fake"}]}
+
+    @app.get("/stats")
+    def stats():
+        return config.stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body: Dict[str, Any] = await request.json()
+        config.stats["requests"] += 1
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            config.stats["rate_limited"] += 1
+            return _error(429, "Rate limit reached (fake)", "requests",
+                          headers={"retry-after": str(config.retry_after)})
+        if roll < config.rate_limit_rate + config.error_rate:
+            config.stats["errors"] += 1
+            return _error(500, "The server had an error (fake)", "server_error")
+
+        n_tokens = rng.randint(config.min_tokens, min(config.max_tokens, int(body.get("max_tokens") or config.max_tokens)))
+        words = [rng.choice(WORDS) for _ in range(n_tokens)]
+        delay = config.first_token_delay(rng)
+        created = int(time.time())
+        model = body.get("model", "gpt-4")
+        cid = f"chatcmpl-fake{config.stats['requests']}"
+
+        if body.get("stream"):
+            config.stats["streamed"] += 1
+
+            async def events():
+                await asyncio.sleep(delay)
+                for i, word in enumerate(words):
+                    chunk = {
+                        "id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {"content": ("" if i == 0 else " ") + word}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(1.0 / config.token_rate)
+                done = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                yield f"data: {json.dumps(done)}\n\n"
+                yield "data: [DONE]\n\n"
+                config.stats["ok"] += 1
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(delay + n_tokens / config.token_rate)
+        config.stats["ok"] += 1
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        return {
+            "id": cid,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": n_tokens, "total_tokens": prompt_tokens + n_tokens},
+        }
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", default=FakeConfig.latency, help="fixed:S | uniform:A:B | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--token-rate", type=float, default=FakeConfig.token_rate)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, dest="rate_limit_rate")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def config_from_args(args) -> FakeConfig:
+    return FakeConfig(latency=args.latency, token_rate=args.token_rate, error_rate=args.error_rate,
+                      rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, seed=args.seed)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
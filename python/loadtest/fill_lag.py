@@ -0,0 +1,102 @@
+"""
+Event-loop lag during concurrent fills: fails if the loop stalls.
+
+Drives ``POST /apps/{app}/forms/{form}/fill`` through an in-process ASGI
+transport, so the app and this client share one event loop; a timer on that
+loop measures how late it fires while the fills run, and
+``server.loop_monitor`` names the route of any stall. Exits 1 if the worst
+lag exceeds ``--max-lag-ms``. Firestore and OpenAI are the offline fakes.
+
+    cd python && python -m loadtest.fill_lag --concurrency 8 --requests 32 --max-lag-ms 100
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import httpx
+
+from loadtest.common import LoopLagProbe, percentiles
+from loadtest.payloads import APPS
+
+
+def fill_targets(form_filter: str = ""):
+    targets = []
+    for pdf in sorted(APPS.glob("*/forms/*/form.pdf")):
+        app, form = pdf.parents[2].name, pdf.parent.name
+        overlay = pdf.parent / "overlay.json"
+        if form_filter not in f"{app}/{form}" or not overlay.exists():
+            continue
+        fields = json.loads(overlay.read_text()).get("fields", [])
+        answers = {f["id"]: f"Sample {i}" for i, f in enumerate(fields) if (f.get("type") or "text") == "text"}
+        targets.append((f"/apps/{app}/forms/{form}/fill", json.dumps(answers)))
+    return targets
+
+
+async def run(args):
+    from loadtest.offline_app import create_app
+    from server.loop_monitor import loop_monitor
+    from server.warmup import warm_up
+
+    app = create_app()
+    # As at server startup: imports and the PDF worker pool come up off the loop
+    await asyncio.to_thread(warm_up)
+    loop_monitor.start()
+    targets = fill_targets(args.form)
+    rng = random.Random(args.seed)
+    plan = [rng.choice(targets) for _ in range(args.requests)]
+    latencies, statuses = [], {}
+    lag = LoopLagProbe(interval=0.005)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fill-lag", timeout=300) as client:
+        async def user(queue):
+            for path, answers in queue:
+                started = time.perf_counter()
+                r = await client.post(path, data={"answers_json": answers})
+                latencies.append(time.perf_counter() - started)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+        lag.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(user(plan[i::args.concurrency]) for i in range(args.concurrency)))
+        wall = time.perf_counter() - started
+        await lag.stop()
+    await loop_monitor.stop()
+
+    worst = lag.report()["max"] or 0.0
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "wall_seconds": round(wall, 2),
+        "statuses": statuses,
+        "fill_latency_ms": percentiles(latencies),
+        "loop_lag_ms": lag.report(),
+        "stalls": loop_monitor.info(),
+        "max_lag_ms": args.max_lag_ms,
+        "passed": worst <= args.max_lag_ms and set(statuses) == {200},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--form", default="", help="only forms whose app/form contains this")
+    parser.add_argument("--max-lag-ms", type=float, default=100.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
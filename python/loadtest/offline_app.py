@@ -0,0 +1,80 @@
+"""
+The full backend (``server.main:app``) booted with no external services.
+
+Firestore is replaced by ``FakeFirestore`` seeded with the county documents
+from ``data/``, and OpenAI by ``loadtest.fake_openai`` on a local port, so
+every route, middleware and startup hook runs as in production without
+credentials or API quota. Background job workers are off (``JOBS_WORKERS=0``)
+and metrics snapshots go to a temporary directory unless set otherwise.
+
+    cd python && python -m loadtest.offline_app --port 8000 --workers 2 --firestore-latency 0.02
+
+With ``--workers`` > 1 each uvicorn worker gets its own Firestore fake; the
+fake OpenAI server is shared (it runs in the supervisor process).
+"""
+
+import argparse
+import os
+import tempfile
+
+from loadtest import fake_openai
+from loadtest.common import free_port, serve_in_thread
+from loadtest.fake_firestore import FakeFirestore
+from loadtest.payloads import load_counties
+
+FIRESTORE_LATENCY = float(os.getenv("LOADTEST_FIRESTORE_LATENCY", "0"))
+
+
+def install_fake_firestore(latency: float = FIRESTORE_LATENCY) -> FakeFirestore:
+    """Point ``server.firestore_store.applications`` at a seeded fake."""
+    from server.firestore_store import applications, county_document
+
+    db = FakeFirestore(latency=latency)
+    applications._db = db
+    applications.invalidate()
+    applications.save_many({c["id"]: county_document(c) for c in load_counties()})
+    return db
+
+
+def create_app(firestore_latency: float = FIRESTORE_LATENCY):
+    os.environ.setdefault("JOBS_WORKERS", "0")
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="loadtest-metrics-"))
+    if "OPENAI_BASE_URL" not in os.environ:
+        print("⚠️  OPENAI_BASE_URL not set; /ai-chat will call the real OpenAI API")
+    install_fake_firestore(firestore_latency)
+    from server.main import app
+    return app
+
+
+def __getattr__(name):
+    # ``loadtest.offline_app:app`` for uvicorn (one app per worker process)
+    if name == "app":
+        return create_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the backend against in-process Firestore and OpenAI fakes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--firestore-latency", type=float, default=FIRESTORE_LATENCY,
+                        help="seconds added to every Firestore round-trip")
+    parser.add_argument("--log-level", default="warning")
+    fake_openai.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    openai_port = free_port()
+    serve_in_thread(fake_openai.create_app(fake_openai.config_from_args(args)), openai_port)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{openai_port}/v1"
+    os.environ["LOADTEST_FIRESTORE_LATENCY"] = str(args.firestore_latency)
+    uvicorn.run("loadtest.offline_app:app", host=args.host, port=args.port, workers=args.workers,
+                log_level=args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
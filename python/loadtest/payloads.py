@@ -0,0 +1,89 @@
+"""
+Realistic ``/ai-chat`` payloads built from the county JSONs in ``data/``.
+
+Mirrors what ``AIChat.jsx`` sends: the last messages of a conversation plus
+the application, steps, progress and overlay context. A small pool of common
+applicant questions is reused across counties so the answer cache sees the
+repetition real traffic has.
+"""
+
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List
+
+DATA = Path(__file__).resolve().parents[2] / "data"
+APPS = DATA / "applications"
+NON_COUNTY = {"manifest.json", "county-template.json", "example-county.json"}
+
+QUESTIONS = [
+    "How much is the permit fee?",
+    "What documents do I need to submit?",
+    "How many meals can I sell per day?",
+    "Do I need a food handler card for my helper?",
+    "How long does the approval take?",
+    "Can I sell food from my home kitchen on weekends only?",
+    "What happens during the inspection?",
+    "Where do I submit the {step} form?",
+    "What should I write in the {step} section?",
+    "Is the {step} step required before I can start selling?",
+]
+
+
+def load_counties() -> List[Dict[str, Any]]:
+    counties = []
+    for path in sorted(DATA.glob("*.json")):
+        if path.name in NON_COUNTY:
+            continue
+        try:
+            county = json.loads(path.read_text())
+        except ValueError:
+            continue
+        if isinstance(county, dict) and isinstance(county.get("steps"), list):
+            counties.append(county)
+    return counties
+
+
+def _overlay_labels(app_id: str, form_id: str) -> List[Dict[str, str]]:
+    path = APPS / app_id / "forms" / form_id / "overlay.json"
+    if not path.exists():
+        return []
+    fields = json.loads(path.read_text()).get("fields", [])
+    return [{"id": f.get("id"), "label": f.get("label")} for f in fields[:40]]
+
+
+def build_payload(county: Dict[str, Any], rng: random.Random, history: int = 2) -> Dict[str, Any]:
+    steps = [s for s in county["steps"] if isinstance(s, dict)]
+    current = rng.choice(steps) if steps else {}
+    completed = [s["id"] for s in steps[: rng.randint(0, len(steps))] if "id" in s]
+    pdf_steps = [s for s in steps if s.get("type") == "pdf" and s.get("formId")]
+    overlays = {s["formId"]: _overlay_labels(county["id"], s["formId"]) for s in pdf_steps}
+
+    messages = []
+    for _ in range(rng.randint(0, history)):
+        messages.append({"role": "user", "content": rng.choice(QUESTIONS[:7])})
+        messages.append({"role": "assistant", "content": "Here is what the county requires for that step."})
+    question = rng.choice(QUESTIONS).format(step=current.get("title", "application"))
+    messages.append({"role": "user", "content": question})
+
+    return {
+        "messages": messages,
+        "applicationId": county["id"],
+        "context": {
+            "application": {"id": county["id"], "title": county.get("title"), "rootDomain": county.get("rootDomain")},
+            "steps": steps,
+            "currentStep": current,
+            "currentStepId": current.get("id"),
+            "completedStepIds": completed,
+            "comments": [],
+            "overlays": overlays,
+            "formData": {},
+            "pdfText": {},
+        },
+    }
+
+
+def payload_pool(size: int, seed: int = 0, history: int = 2) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    counties = load_counties()
+    return [build_payload(rng.choice(counties), rng, history=history) for _ in range(size)]
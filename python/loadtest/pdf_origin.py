@@ -0,0 +1,107 @@
+"""
+Local stand-in for the county PDF hosts, for testing re-sync offline.
+
+Serves every county's current ``form.pdf`` at the path of its ``pdfUrl``
+with ``ETag`` / ``Last-Modified`` and honours conditional GETs. ``POST
+/_mutate?path=...`` silently changes a document (as health departments do),
+``/_stats`` counts 200s and 304s.
+
+    cd python && python -m loadtest.pdf_origin --port 8090
+    cd python && python -m server.resync --origin http://127.0.0.1:8090
+    curl -X POST 'http://127.0.0.1:8090/_mutate?path=/operations-assets/docs/cottagefood/MEHKO_APP_SOP.pdf'
+"""
+
+import argparse
+import hashlib
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import unquote, urlsplit
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+
+from loadtest.payloads import APPS, load_counties
+
+
+class Document:
+    def __init__(self, content: bytes):
+        self.set(content)
+
+    def set(self, content: bytes):
+        self.content = content
+        self.etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+        self.modified = int(time.time())
+
+
+def load_documents() -> Dict[str, Document]:
+    """Decoded pdfUrl path -> current form.pdf of every county PDF step."""
+    docs = {}
+    for county in load_counties():
+        for step in county["steps"]:
+            if not isinstance(step, dict) or step.get("type") != "pdf" or not step.get("pdfUrl") or not step.get("formId"):
+                continue
+            pdf = APPS / county["id"] / "forms" / step["formId"] / "form.pdf"
+            if pdf.exists():
+                docs[unquote(urlsplit(step["pdfUrl"]).path)] = Document(pdf.read_bytes())
+    return docs
+
+
+def _not_modified(request: Request, doc: Document) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return doc.etag in [t.strip() for t in inm.split(",")] or inm.strip() == "*"
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return doc.modified <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def create_app(docs: Optional[Dict[str, Document]] = None) -> FastAPI:
+    docs = load_documents() if docs is None else docs
+    stats = {"ok": 0, "not_modified": 0, "missing": 0, "mutations": 0}
+    app = FastAPI(title="Fake PDF origin", version="1.0")
+
+    @app.get("/_stats")
+    def get_stats():
+        return {**stats, "documents": len(docs)}
+
+    @app.post("/_mutate")
+    def mutate(path: str):
+        doc = docs.get(path)
+        if doc is None:
+            raise HTTPException(404, f"no document at {path}")
+        # Content after %%EOF is ignored by readers, so the PDF stays valid
+        doc.set(doc.content + f"\n% revised {time.time()}\n".encode())
+        # Last-Modified has one-second resolution; make the change observable
+        doc.modified = max(doc.modified, int(time.time()) + 1)
+        stats["mutations"] += 1
+        return {"ok": True, "etag": doc.etag}
+
+    @app.get("/{path:path}")
+    def serve(path: str, request: Request):
+        doc = docs.get("/" + path)
+        if doc is None:
+            stats["missing"] += 1
+            raise HTTPException(404, "not found")
+        headers = {"ETag": doc.etag, "Last-Modified": formatdate(doc.modified, usegmt=True)}
+        if _not_modified(request, doc):
+            stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        stats["ok"] += 1
+        return Response(doc.content, media_type="application/pdf", headers=headers)
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local stand-in for county PDF hosts")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
@@ -1,16 +1,25 @@
 import io
 import json
 import base64
-from typing import Dict, Any, List, Optional
+from typing import BinaryIO, Dict, Any, List, Optional, Union
 import PyPDF2
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
+from overlay.timing import timed
+
+# A PDF argument is its bytes or an open binary file, such as a mapped blob
+# (``BlobStore.open``), which PyPDF2 then reads in place rather than from a copy
+PdfSource = Union[bytes, memoryview, BinaryIO]
+
+
+def _reader(pdf: PdfSource) -> PyPDF2.PdfReader:
+    return PyPDF2.PdfReader(io.BytesIO(pdf) if isinstance(pdf, (bytes, bytearray, memoryview)) else pdf)
 
 
 class AcroFormHandler:
     """Handle PDF AcroForm field filling using PyPDF2 and ReportLab"""
     
-    def __init__(self, pdf_bytes: bytes = None):
+    def __init__(self, pdf_bytes: PdfSource = None):
         self.pdf_bytes = pdf_bytes
         self.field_types = {
             'text': self._fill_text_field,
@@ -20,14 +29,16 @@ class AcroFormHandler:
             'signature': self._fill_signature_field,
         }
     
-    def is_acroform_pdf(self, pdf_bytes: bytes) -> bool:
+    def is_acroform_pdf(self, pdf_bytes: PdfSource) -> bool:
         """Check if a PDF already has AcroForm fields"""
         try:
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+            with timed("acroform.parse"):
+                pdf_reader = _reader(pdf_bytes)
+                root = pdf_reader.trailer['/Root']
             
             # Check if PDF has AcroForm
-            if '/AcroForm' in pdf_reader.trailer['/Root']:
-                form = pdf_reader.trailer['/Root']['/AcroForm']
+            if '/AcroForm' in root:
+                form = root['/AcroForm']
                 if '/Fields' in form and len(form['/Fields']) > 0:
                     return True
             
@@ -42,18 +53,21 @@ class AcroFormHandler:
             return []
         
         try:
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(self.pdf_bytes))
+            with timed("acroform.parse"):
+                pdf_reader = _reader(self.pdf_bytes)
+                root = pdf_reader.trailer['/Root']
             fields = []
             
             # Check if PDF has AcroForm
-            if '/AcroForm' in pdf_reader.trailer['/Root']:
-                form = pdf_reader.trailer['/Root']['/AcroForm']
+            if '/AcroForm' in root:
+                form = root['/AcroForm']
                 if '/Fields' in form:
-                    for field_ref in form['/Fields']:
-                        field = field_ref.get_object()
-                        field_info = self._extract_field_info(field)
-                        if field_info:
-                            fields.append(field_info)
+                    with timed("acroform.read_fields"):
+                        for field_ref in form['/Fields']:
+                            field = field_ref.get_object()
+                            field_info = self._extract_field_info(field)
+                            if field_info:
+                                fields.append(field_info)
             
             return fields
         except Exception as e:
@@ -107,35 +121,38 @@ class AcroFormHandler:
         else:
             return 'text'
     
-    def create_acroform_pdf(self, pdf_bytes: bytes, field_definitions: List[Dict[str, Any]]) -> bytes:
+    def create_acroform_pdf(self, pdf_bytes: PdfSource, field_definitions: List[Dict[str, Any]]) -> bytes:
         """Create a new PDF with AcroForm fields based on AI-detected field definitions"""
         # Load the existing PDF
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
-        pdf_writer = PyPDF2.PdfWriter()
-        
-        # Copy pages from existing PDF
-        for page in pdf_reader.pages:
-            pdf_writer.add_page(page)
+        with timed("acroform.parse"):
+            pdf_reader = _reader(pdf_bytes)
+            pdf_writer = PyPDF2.PdfWriter()
+            
+            # Copy pages from existing PDF
+            for page in pdf_reader.pages:
+                pdf_writer.add_page(page)
         
         # Add AcroForm fields based on definitions
         for field_def in field_definitions:
             self._add_acroform_field(pdf_writer, field_def)
         
         # Save to bytes
-        output = io.BytesIO()
-        pdf_writer.write(output)
-        return output.getvalue()
+        with timed("acroform.write"):
+            output = io.BytesIO()
+            pdf_writer.write(output)
+            return output.getvalue()
     
-    def fill_acroform_pdf(self, pdf_bytes: bytes, answers: Dict[str, Any]) -> bytes:
+    def fill_acroform_pdf(self, pdf_bytes: PdfSource, answers: Dict[str, Any]) -> bytes:
         """Fill an existing AcroForm PDF with user answers"""
         try:
             # Load the PDF
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
-            pdf_writer = PyPDF2.PdfWriter()
-            
-            # Copy all pages
-            for page in pdf_reader.pages:
-                pdf_writer.add_page(page)
+            with timed("acroform.parse"):
+                pdf_reader = _reader(pdf_bytes)
+                pdf_writer = PyPDF2.PdfWriter()
+                
+                # Copy all pages
+                for page in pdf_reader.pages:
+                    pdf_writer.add_page(page)
             
             # Copy the root object (including AcroForm data)
             if '/Root' in pdf_reader.trailer:
@@ -147,18 +164,20 @@ class AcroFormHandler:
                 form = pdf_reader.trailer['/Root']['/AcroForm']
                 if '/Fields' in form:
                     fields = form['/Fields']
-                    for field_ref in fields:
-                        field = field_ref.get_object()
-                        if '/T' in field:  # Field name
-                            field_name = field['/T']
-                            if field_name in answers:
-                                self._fill_form_field(field, answers[field_name])
-                                print(f"Filled field '{field_name}' with '{answers[field_name]}'")
+                    with timed("acroform.fill_fields"):
+                        for field_ref in fields:
+                            field = field_ref.get_object()
+                            if '/T' in field:  # Field name
+                                field_name = field['/T']
+                                if field_name in answers:
+                                    self._fill_form_field(field, answers[field_name])
+                                    print(f"Filled field '{field_name}' with '{answers[field_name]}'")
             
             # Save to bytes
-            output = io.BytesIO()
-            pdf_writer.write(output)
-            return output.getvalue()
+            with timed("acroform.write"):
+                output = io.BytesIO()
+                pdf_writer.write(output)
+                return output.getvalue()
             
         except Exception as e:
             print(f"Error filling AcroForm PDF: {e}")
@@ -207,13 +226,13 @@ class AcroFormHandler:
 
 
 # Convenience functions for backward compatibility
-def create_acroform_from_overlay(pdf_bytes: bytes, overlay: Dict[str, Any]) -> bytes:
+def create_acroform_from_overlay(pdf_bytes: PdfSource, overlay: Dict[str, Any]) -> bytes:
     """Convert overlay definition to AcroForm PDF"""
     handler = AcroFormHandler()
     field_definitions = overlay.get('fields', [])
     return handler.create_acroform_pdf(pdf_bytes, field_definitions)
 
-def fill_acroform_pdf_bytes(pdf_bytes: bytes, answers: Dict[str, Any]) -> bytes:
+def fill_acroform_pdf_bytes(pdf_bytes: PdfSource, answers: Dict[str, Any]) -> bytes:
     """Fill AcroForm PDF with answers"""
     handler = AcroFormHandler()
     return handler.fill_acroform_pdf(pdf_bytes, answers)
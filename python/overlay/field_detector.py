@@ -0,0 +1,309 @@
+"""
+Local geometric form-field detection.
+
+Finds fill-in targets on a PDF without any model: existing widgets, blank
+underlines, boxes and checkbox squares from the page's vector drawings, then
+pairs each one with the closest text label to its left or above. The output
+is a list of ``overlay.json`` fields with a ``confidence`` in [0, 1].
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Set, Union
+
+import fitz
+import numpy as np
+
+# Geometry thresholds, in PDF points
+MIN_LINE_WIDTH = 24.0      # shorter horizontal rules are decoration
+MAX_RULE_THICKNESS = 2.5   # thin filled rects are drawn underlines
+LINE_FIELD_HEIGHT = 14.0   # writing area placed above an underline
+CHECKBOX_MIN, CHECKBOX_MAX = 5.0, 20.0
+BOX_MIN_HEIGHT, BOX_MAX_HEIGHT = 10.0, 60.0
+BOX_MIN_WIDTH = 30.0
+LABEL_MAX_GAP_X = 220.0    # label to the left of a field
+LABEL_MAX_GAP_Y = 18.0     # label above a field
+NMS_IOU = 0.45
+
+KIND_CONFIDENCE = {"widget": 0.99, "checkbox": 0.8, "box": 0.65, "underline": 0.7}
+WIDGET_TYPES = {
+    fitz.PDF_WIDGET_TYPE_CHECKBOX: "checkbox",
+    fitz.PDF_WIDGET_TYPE_RADIOBUTTON: "checkbox",
+    fitz.PDF_WIDGET_TYPE_SIGNATURE: "signature",
+}
+
+_LABEL_TRIM = re.compile(r"^[\s_:.\-]+|[\s_:.\-]+$")
+_SLUG = re.compile(r"[^a-z0-9]+")
+
+
+# --- primitive extraction ---
+def _drawing_primitives(page: fitz.Page):
+    """Split vector drawings into horizontal segments and rectangles (x0, y0, x1, y1)."""
+    segments, rects = [], []
+    for path in page.get_drawings():
+        for item in path["items"]:
+            op = item[0]
+            if op == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) <= 1.0:
+                    segments.append((min(p1.x, p2.x), p1.y, max(p1.x, p2.x), p2.y))
+            elif op == "re":
+                r = item[1]
+                rects.append((r.x0, r.y0, r.x1, r.y1))
+            elif op == "qu":
+                r = item[1].rect
+                rects.append((r.x0, r.y0, r.x1, r.y1))
+    seg = np.array(segments, dtype=np.float64).reshape(-1, 4)
+    rec = np.array(rects, dtype=np.float64).reshape(-1, 4)
+    return seg, rec
+
+
+def _text_lines(page: fitz.Page):
+    """Word boxes grouped into lines: returns (bboxes[N,4], texts[N])."""
+    lines: Dict[tuple, list] = {}
+    for x0, y0, x1, y1, word, block, line, _ in page.get_text("words"):
+        entry = lines.setdefault((block, line), [x0, y0, x1, y1, []])
+        entry[0] = min(entry[0], x0); entry[1] = min(entry[1], y0)
+        entry[2] = max(entry[2], x1); entry[3] = max(entry[3], y1)
+        entry[4].append(word)
+    boxes = np.array([v[:4] for v in lines.values()], dtype=np.float64).reshape(-1, 4)
+    texts = [" ".join(v[4]) for v in lines.values()]
+    return boxes, texts
+
+
+# --- vectorised geometry ---
+def _unique_rows(a: np.ndarray) -> np.ndarray:
+    if len(a) == 0:
+        return a
+    return np.unique(np.round(a, 1), axis=0)
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between boxes a[N,4] and b[M,4] -> [N,M]."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    ix0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix1 - ix0, 0, None) * np.clip(iy1 - iy0, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def _text_coverage(fields: np.ndarray, words: np.ndarray) -> np.ndarray:
+    """Fraction of each field's area covered by text line boxes (capped at 1)."""
+    if len(fields) == 0 or len(words) == 0:
+        return np.zeros(len(fields))
+    ix = np.clip(np.minimum(fields[:, None, 2], words[None, :, 2]) - np.maximum(fields[:, None, 0], words[None, :, 0]), 0, None)
+    iy = np.clip(np.minimum(fields[:, None, 3], words[None, :, 3]) - np.maximum(fields[:, None, 1], words[None, :, 1]), 0, None)
+    area = np.maximum((fields[:, 2] - fields[:, 0]) * (fields[:, 3] - fields[:, 1]), 1e-6)
+    return np.minimum((ix * iy).sum(axis=1) / area, 1.0)
+
+
+def _nms(boxes: np.ndarray, scores: np.ndarray, threshold: float = NMS_IOU) -> np.ndarray:
+    """Indices of boxes kept by greedy non-maximum suppression."""
+    order = np.argsort(-scores, kind="stable")
+    iou = _iou(boxes, boxes)
+    keep, suppressed = [], np.zeros(len(boxes), dtype=bool)
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= iou[i] > threshold
+    return np.array(keep, dtype=np.int64)
+
+
+def _cells_above(rules: np.ndarray):
+    """
+    Table cells drawn as stacked rules (common in Word exports): pair each rule
+    with the nearest rule above it that spans the same columns. Returns the
+    cell boxes and a mask of rules that bound a cell from below.
+    """
+    x0, y, x1 = rules[:, 0], rules[:, 1], rules[:, 2]
+    dy = y[:, None] - y[None, :]
+    overlap = np.minimum(x1[:, None], x1[None, :]) - np.maximum(x0[:, None], x0[None, :])
+    shorter = np.minimum(x1 - x0, (x1 - x0)[:, None])
+    ok = (dy >= BOX_MIN_HEIGHT) & (dy <= BOX_MAX_HEIGHT) & (overlap >= 0.8 * shorter)
+    dy = np.where(ok, dy, np.inf)
+    top = dy.argmin(axis=1)
+    has_cell = np.isfinite(dy[np.arange(len(rules)), top])
+    i = np.nonzero(has_cell)[0]
+    j = top[i]
+    cells = np.column_stack([np.maximum(x0[i], x0[j]), y[j], np.minimum(x1[i], x1[j]), y[i]])
+    return cells.reshape(-1, 4), has_cell
+
+
+def _candidates(segments: np.ndarray, rects: np.ndarray):
+    """Turn raw primitives into (boxes[N,4], kinds[N])."""
+    boxes, kinds = [], []
+
+    # Underlines: stroked horizontal lines plus hairline filled rects
+    w = rects[:, 2] - rects[:, 0]
+    h = rects[:, 3] - rects[:, 1]
+    thin = (h <= MAX_RULE_THICKNESS) & (w >= MIN_LINE_WIDTH)
+    rules = np.vstack([segments, np.column_stack([rects[thin, 0], rects[thin, 3], rects[thin, 2], rects[thin, 3]])])
+    rules = _unique_rows(rules[(rules[:, 2] - rules[:, 0]) >= MIN_LINE_WIDTH])
+    if len(rules):
+        cells, has_cell = _cells_above(rules)
+        y = rules[~has_cell, 1]
+        boxes.append(np.column_stack([rules[~has_cell, 0], y - LINE_FIELD_HEIGHT, rules[~has_cell, 2], y]))
+        kinds += ["underline"] * int((~has_cell).sum())
+        boxes.append(cells)
+        kinds += ["box"] * len(cells)
+
+    # Checkbox squares
+    square = (w >= CHECKBOX_MIN) & (w <= CHECKBOX_MAX) & (h >= CHECKBOX_MIN) & (h <= CHECKBOX_MAX) & (np.abs(w - h) <= 0.2 * np.maximum(w, h))
+    if square.any():
+        sq = _unique_rows(rects[square])
+        boxes.append(sq)
+        kinds += ["checkbox"] * len(sq)
+
+    # Entry boxes: single-line rectangles wide enough to write in
+    entry = (~square) & (h >= BOX_MIN_HEIGHT) & (h <= BOX_MAX_HEIGHT) & (w >= BOX_MIN_WIDTH)
+    if entry.any():
+        bx = _unique_rows(rects[entry])
+        boxes.append(bx)
+        kinds += ["box"] * len(bx)
+
+    if not boxes:
+        return np.zeros((0, 4)), np.array([], dtype=object)
+    return np.vstack(boxes), np.array(kinds, dtype=object)
+
+
+def _pair_labels(fields: np.ndarray, lines: np.ndarray):
+    """
+    For each field pick the nearest text line that ends to its left on the same
+    row, or sits directly above it. Returns (line index or -1, distance).
+    """
+    n = len(fields)
+    if n == 0 or len(lines) == 0:
+        return np.full(n, -1), np.full(n, np.inf)
+    fx0, fy0, fx1, fy1 = (fields[:, i, None] for i in range(4))
+    lx0, ly0, lx1, ly1 = (lines[None, :, i] for i in range(4))
+    fcy = (fy0 + fy1) / 2
+    lcy = (ly0 + ly1) / 2
+
+    # Left: label ends before the field starts and overlaps its row
+    gap_x = fx0 - lx1
+    left_ok = (gap_x >= -2) & (gap_x <= LABEL_MAX_GAP_X) & (np.abs(lcy - fcy) <= np.maximum(fy1 - fy0, ly1 - ly0) / 2 + 2)
+    left_d = np.where(left_ok, np.maximum(gap_x, 0) + np.abs(lcy - fcy), np.inf)
+
+    # Above: label bottom just above the field top, horizontally overlapping
+    gap_y = fy0 - ly1
+    overlap = np.minimum(fx1, lx1) - np.maximum(fx0, lx0)
+    above_ok = (gap_y >= -2) & (gap_y <= LABEL_MAX_GAP_Y) & (overlap > 0)
+    above_d = np.where(above_ok, np.maximum(gap_y, 0) * 2 + np.abs(lx0 - fx0) * 0.1, np.inf)
+
+    dist = np.minimum(left_d, above_d)
+    best = dist.argmin(axis=1)
+    best_d = dist[np.arange(n), best]
+    return np.where(np.isfinite(best_d), best, -1), best_d
+
+
+# --- public API ---
+def _clean_label(text: str) -> str:
+    return _LABEL_TRIM.sub("", text)[:120]
+
+
+def _field_type(kind: str, label: str) -> str:
+    if kind == "checkbox":
+        return "checkbox"
+    if "signature" in label.lower():
+        return "signature"
+    return "text"
+
+
+def detect_page_fields(page: fitz.Page, use_widgets: bool = True) -> List[Dict[str, Any]]:
+    segments, rects = _drawing_primitives(page)
+    line_boxes, line_texts = _text_lines(page)
+    boxes, kinds = _candidates(segments, rects)
+
+    # Drop candidates that are already mostly text (underlined headings, table headers)
+    if len(boxes):
+        keep = _text_coverage(boxes, line_boxes) < 0.35
+        boxes, kinds = boxes[keep], kinds[keep]
+
+    widget_fields = []
+    if use_widgets:
+        for w in page.widgets() or []:
+            widget_fields.append((tuple(w.rect), w.field_name or "", WIDGET_TYPES.get(w.field_type, "text"), w.field_label or ""))
+    if widget_fields:
+        wboxes = np.array([wf[0] for wf in widget_fields], dtype=np.float64)
+        if len(boxes):
+            covered = (_iou(boxes, wboxes) > 0.2).any(axis=1)
+            boxes, kinds = boxes[~covered], kinds[~covered]
+    else:
+        wboxes = np.zeros((0, 4))
+
+    scores = np.array([KIND_CONFIDENCE[k] for k in kinds], dtype=np.float64)
+    if len(boxes):
+        keep = _nms(boxes, scores)
+        boxes, kinds, scores = boxes[keep], kinds[keep], scores[keep]
+
+    label_idx, label_dist = _pair_labels(boxes, line_boxes)
+    w_label_idx, _ = _pair_labels(wboxes, line_boxes)
+
+    out: List[Dict[str, Any]] = []
+    for (rect, name, wtype, tooltip), li in zip(widget_fields, w_label_idx):
+        label = _clean_label(tooltip or (line_texts[li] if li >= 0 else "") or name)
+        out.append(_field(page.number, rect, wtype, label, KIND_CONFIDENCE["widget"],
+                          "existing form widget", original_id=name))
+    for rect, kind, base, li, dist in zip(boxes, kinds, scores, label_idx, label_dist):
+        label = _clean_label(line_texts[li]) if li >= 0 else ""
+        if label:
+            confidence = base * (1.0 - 0.25 * min(dist / LABEL_MAX_GAP_X, 1.0))
+            reasoning = f"{kind} paired with label '{label[:40]}'"
+        else:
+            confidence = base * 0.6
+            reasoning = f"{kind} with no nearby label"
+        out.append(_field(page.number, tuple(rect), _field_type(kind, label), label, confidence, reasoning))
+    out.sort(key=lambda f: (round(f["rect"][1]), f["rect"][0]))
+    return out
+
+
+def _field(page_no: int, rect, ftype: str, label: str, confidence: float, reasoning: str,
+           original_id: Optional[str] = None) -> Dict[str, Any]:
+    x0, y0, x1, y1 = (round(float(v), 2) for v in rect)
+    field = {
+        "label": label,
+        "type": ftype,
+        "page": page_no,
+        "rect": [x0, y0, x1, y1],
+        "fontSize": float(max(6, min(11, round((y1 - y0) * 0.75)))),
+        "align": "left",
+        "shrink": True,
+        "confidence": round(float(confidence), 3),
+        "reasoning": reasoning,
+    }
+    if original_id:
+        field["originalId"] = original_id
+    return field
+
+
+def detect_fields(pdf: Union[bytes, fitz.Document], use_widgets: bool = True) -> List[Dict[str, Any]]:
+    """Detect fields on every page and assign stable, unique overlay ids."""
+    doc = pdf if isinstance(pdf, fitz.Document) else fitz.open(stream=pdf, filetype="pdf")
+    try:
+        fields = []
+        for page in doc:
+            fields.extend(detect_page_fields(page, use_widgets=use_widgets))
+    finally:
+        if doc is not pdf:
+            doc.close()
+
+    # A suffixed id can equal another label's base ("Name" twice, then "Name 2"),
+    # so check every candidate against all ids handed out so far
+    used: Set[str] = set()
+    suffix: Dict[str, int] = {}
+    for f in fields:
+        base = _SLUG.sub("_", (f["label"] or f["type"]).lower()).strip("_")[:48] or f["type"]
+        fid, n = base, suffix.get(base, 1)
+        while fid in used:
+            n += 1
+            fid = f"{base}_{n}"
+        suffix[base] = n
+        used.add(fid)
+        f["id"] = fid
+    return fields
@@ -1,5 +1,8 @@
 import fitz
-from typing import Dict, Any, List
+from typing import Dict, Any, Sequence, Union
+from overlay.models import Overlay, OverlayField
+from overlay.signature_utils import DATA_URL_PREFIX, SignatureImage, signature_xobject
+from overlay.timing import timed
 ALIGN={"left":0,"center":1,"right":2}
 
 def _clear_all_widgets(doc: fitz.Document):
@@ -8,21 +11,21 @@ def _clear_all_widgets(doc: fitz.Document):
             try: p.delete_widget(w)
             except Exception: pass
 
-def _bg(p: fitz.Page, r: List[float], color=(1,1,1)):
+def _bg(p: fitz.Page, r: Sequence[float], color=(1,1,1)):
     p.draw_rect(fitz.Rect(*r), fill=color, width=0, overlay=True)
 
-def _checkbox(p: fitz.Page, rect: List[float], v: bool):
+def _checkbox(p: fitz.Page, rect: Sequence[float], v: bool):
     R = fitz.Rect(*rect)
     p.draw_rect(R, width=1.0, color=(0,0,0), overlay=True)
     if v:
         p.draw_line(R.tl, R.br, width=1.5, color=(0,0,0), overlay=True)
         p.draw_line(R.tr, R.bl, width=1.5, color=(0,0,0), overlay=True)
 
-def _signature(p: fitz.Page, rect: List[float], png_bytes: bytes):
+def _signature(p: fitz.Page, rect: Sequence[float], sig: SignatureImage):
     r = fitz.Rect(*rect)
-    p.insert_image(r, stream=png_bytes, keep_proportion=True, overlay=True)
+    p.show_pdf_page(r, signature_xobject(sig), 0, keep_proportion=True, overlay=True)
 
-def _text(p: fitz.Page, rect: List[float], text: str, size=11, align="left", shrink=True):
+def _text(p: fitz.Page, rect: Sequence[float], text: str, size=11.0, align="left", shrink=True):
     R = fitz.Rect(*rect)
     if not text: return
     for fs in (size, 12, 11, 10, 9, 8) if shrink else (size,):
@@ -32,36 +35,69 @@ def _text(p: fitz.Page, rect: List[float], text: str, size=11, align="left", shr
         if placed > 0: return
     p.insert_text(R.tl, text, fontsize=8, fontname="Helvetica", color=(0,0,0))
 
-def fill_pdf_overlay_bytes(pdf_bytes: bytes, overlay: Dict[str,Any], answers: Dict[str,Any]) -> bytes:
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    _clear_all_widgets(doc)
-    for f in overlay.get("fields", []):
-        fid = f["id"]; val = answers.get(fid)
-        if val in (None, ""): continue
-        page = doc[int(f["page"])]
+def _draw_field(page: fitz.Page, f: OverlayField, val: Any):
+    if f.type == "checkbox":
+        _checkbox(page, f.rect, bool(val))
+        return
+
+    if f.type == "signature":
+        # a multipart signature part, raw PNG bytes, or a base64 data URL string
+        sig = val
+        if isinstance(val, str) and val.startswith(DATA_URL_PREFIX):
+            sig = SignatureImage.from_data_url(val)
+        elif isinstance(val, (bytes, bytearray)):
+            sig = SignatureImage.from_bytes(bytes(val))
+        _bg(page, f.rect, color=(1,1,1)) if f.bg else None
+        _signature(page, f.rect, sig)
+        return
+
+    # text (existing)
+    txt = str(val)
+    if f.uppercase: txt = txt.upper()
+    if f.bg: _bg(page, f.rect)  # white-out under text if needed
+
+    _text(page, f.rect, txt, size=f.font_size, align=f.align, shrink=f.shrink)
 
-        ftype = (f.get("type","text") or "text").lower()
-        if ftype == "checkbox":
-            _checkbox(page, f["rect"], bool(val))
-            continue
+# ``overlay`` is an ``overlay.models.Overlay`` (validated once, e.g. by the template
+# store) or a raw overlay dict, which is validated on every call
+OverlayLike = Union[Overlay, Dict[str,Any]]
 
-        if ftype == "signature":
-            # accept either raw PNG bytes or a base64/data URL string
-            png = val
-            if isinstance(val, str) and val.startswith("data:image/png;base64,"):
-                import base64
-                png = base64.b64decode(val.split(",",1)[1])
-            _bg(page, f["rect"], color=(1,1,1)) if f.get("bg") else None
-            _signature(page, f["rect"], png)
-            continue
+def fill_pdf_overlay_bytes(pdf_bytes: bytes, overlay: OverlayLike, answers: Dict[str,Any]) -> bytes:
+    with timed("overlay.open"):
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    return _fill(doc, overlay, answers)
 
-        # text (existing)
-        txt = str(val)
-        if f.get("uppercase"): txt = txt.upper()
-        if f.get("bg"): _bg(page, f["rect"])  # white-out under text if needed
+def fill_pdf_overlay_file(pdf_path: str, overlay: OverlayLike, answers: Dict[str,Any]) -> bytes:
+    """Like ``fill_pdf_overlay_bytes`` for a PDF on disk (MuPDF reads it lazily)."""
+    with timed("overlay.open"):
+        doc = fitz.open(pdf_path, filetype="pdf")
+    with doc:  # release the file handle so the caller can remove it
+        return _fill(doc, overlay, answers)
 
-        _text(page, f["rect"], txt,
-              size=float(f.get("fontSize", 11)),
-              align=str(f.get("align","left")),
-              shrink=bool(f.get("shrink", True)))
-    return doc.tobytes(deflate=True, garbage=4)
+def prepare_pdf(pdf_path: str) -> bytes:
+    """The PDF at ``pdf_path`` with its widgets removed: the base every overlay
+    fill of it starts from (cache it by content, see ``server.fill_plans``)."""
+    with timed("overlay.prepare"):
+        with fitz.open(pdf_path, filetype="pdf") as doc:
+            _clear_all_widgets(doc)
+            return doc.tobytes()
+
+def fill_pdf_overlay_prepared(base: Union[bytes, memoryview], overlay: OverlayLike, answers: Dict[str,Any]) -> bytes:
+    """Fill a ``prepare_pdf`` result: no widget pass, and ``base`` is not copied."""
+    with timed("overlay.open"):
+        doc = fitz.open(stream=base, filetype="pdf")
+    return _fill(doc, overlay, answers, clear=False)
+
+def _fill(doc: fitz.Document, overlay: OverlayLike, answers: Dict[str,Any], clear: bool = True) -> bytes:
+    overlay = Overlay.coerce(overlay)
+    if clear:
+        with timed("overlay.clear_widgets"):
+            _clear_all_widgets(doc)
+    for f in overlay.placed:  # fields without a page and rect have nothing to draw
+        val = answers.get(f.id)
+        if val in (None, ""): continue
+        page = doc[f.page]
+        with timed("overlay.draw_field", f.type):
+            _draw_field(page, f, val)
+    with timed("overlay.save"):
+        return doc.tobytes(deflate=True, garbage=4)
@@ -0,0 +1,160 @@
+"""
+Typed views of a form's templates: ``overlay.json`` (``Overlay``) and
+``acroform-definition.json`` (``AcroFormDefinition``).
+
+A template is validated once, when the template store loads or saves it, and
+its fields become slotted ``OverlayField`` objects with their defaults applied
+and their types checked. A fill then reads attributes: there is no
+``dict.get`` or ``float()`` per field per request, and an invalid field fails
+its save with a message naming it, not a later fill. The JSON document stays
+as the client wrote it (keys the models do not know about are kept there).
+
+Models pickle as positional tuples, because a fill sends its overlay to a PDF
+worker process (``aio.run_cpu``).
+
+    overlay = Overlay.from_dict(json.loads(body))     # ValueError if invalid
+    for f in overlay.placed: ...                      # fields with a page and a rect
+"""
+
+from dataclasses import dataclass, field, fields
+from operator import attrgetter
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+ALIGNMENTS = ("left", "center", "right")
+
+Rect = Tuple[float, float, float, float]
+
+_state: Dict[type, Callable[[Any], tuple]] = {}
+
+
+class _Model:
+    __slots__ = ()
+
+    def __reduce__(self):
+        cls = type(self)
+        get = _state.get(cls)
+        if get is None:
+            get = _state[cls] = attrgetter(*(f.name for f in fields(cls) if f.init))
+        return cls, get(self)
+
+
+def _number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _flag(d: Dict[str, Any], key: str, default: bool) -> bool:
+    v = d.get(key)
+    return default if v is None else bool(v)
+
+
+def _text(d: Dict[str, Any], key: str, where: str) -> Optional[str]:
+    v = d.get(key)
+    if v is not None and not isinstance(v, str):
+        raise ValueError(f"{where}.{key}: expected a string")
+    return v
+
+
+@dataclass(slots=True)
+class OverlayField(_Model):
+    id: str
+    type: str = "text"
+    page: Optional[int] = None
+    rect: Optional[Rect] = None
+    label: str = ""
+    required: bool = False
+    font_size: float = 11.0
+    align: str = "left"
+    shrink: bool = True
+    uppercase: bool = False
+    bg: bool = False
+
+    @property
+    def placed(self) -> bool:
+        """Drawable by the overlay filler (AcroForm-derived fields have no rect)."""
+        return self.page is not None and self.rect is not None
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], where: str = "field") -> "OverlayField":
+        if not isinstance(d, dict):
+            raise ValueError(f"{where}: expected an object")
+        fid = d.get("id")
+        if not isinstance(fid, str) or not fid:
+            raise ValueError(f"{where}.id: expected a non-empty string")
+        where = f"{where} {fid!r}"
+
+        ftype = _text(d, "type", where) or "text"
+        page = d.get("page")
+        if page is not None:
+            if _number(page) and float(page).is_integer() and page >= 0:
+                page = int(page)
+            else:
+                raise ValueError(f"{where}.page: expected a page index >= 0")
+        rect = d.get("rect")
+        if rect is not None:
+            if not isinstance(rect, (list, tuple)) or len(rect) != 4 or not all(_number(v) for v in rect):
+                raise ValueError(f"{where}.rect: expected [x0, y0, x1, y1]")
+            rect = tuple(float(v) for v in rect)
+        size = d.get("fontSize")
+        if size is not None and not (_number(size) and size > 0):
+            raise ValueError(f"{where}.fontSize: expected a positive number")
+        align = _text(d, "align", where) or "left"
+        if align not in ALIGNMENTS:
+            raise ValueError(f"{where}.align: expected one of {', '.join(ALIGNMENTS)}")
+
+        return cls(
+            id=fid,
+            type=ftype.lower(),
+            page=page,
+            rect=rect,
+            label=str(d.get("label") or ""),
+            required=_flag(d, "required", False),
+            font_size=float(size) if size is not None else 11.0,
+            align=align,
+            shrink=_flag(d, "shrink", True),
+            uppercase=_flag(d, "uppercase", False),
+            bg=_flag(d, "bg", False),
+        )
+
+
+def _fields(data: Dict[str, Any], name: str) -> Tuple[OverlayField, ...]:
+    raw = data.get("fields")
+    if raw is None:
+        return ()
+    if not isinstance(raw, list):
+        raise ValueError(f"{name}.fields: expected an array")
+    return tuple(OverlayField.from_dict(f, f"{name}.fields[{i}]") for i, f in enumerate(raw))
+
+
+@dataclass(slots=True)
+class Overlay(_Model):
+    fields: Tuple[OverlayField, ...] = ()
+    id: Optional[str] = None
+    title: Optional[str] = None
+    placed: Tuple[OverlayField, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.placed = tuple(f for f in self.fields if f.placed)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], name: str = "overlay") -> "Overlay":
+        if not isinstance(data, dict):
+            raise ValueError(f"{name}: expected a JSON object")
+        return cls(_fields(data, name), _text(data, "id", name), _text(data, "title", name))
+
+    @classmethod
+    def coerce(cls, overlay: Union["Overlay", Dict[str, Any]]) -> "Overlay":
+        """``overlay`` itself, or a parsed dict (callers that still pass raw JSON)."""
+        return overlay if isinstance(overlay, Overlay) else cls.from_dict(overlay)
+
+
+@dataclass(slots=True)
+class AcroFormDefinition(Overlay):
+    kind: str = "template"  # "type" in the JSON: existing_acroform or template
+    source: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], name: str = "acroform_definition") -> "AcroFormDefinition":
+        if not isinstance(data, dict):
+            raise ValueError(f"{name}: expected a JSON object")
+        return cls(_fields(data, name), _text(data, "id", name), _text(data, "title", name),
+                   _text(data, "type", name) or "template", _text(data, "source", name))
@@ -1,10 +1,17 @@
 """
-Utility functions for generating signature images from text names.
+Utility functions for generating signature images from text names, and for
+placing signature images on PDF pages.
 """
 
 import base64
+import hashlib
 import io
-from typing import Union, Optional
+import os
+import struct
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Union, Optional, Tuple
 
 try:
     from PIL import Image, ImageDraw, ImageFont
@@ -87,3 +94,96 @@ def is_signature_field(field: dict) -> bool:
         True if field type is "signature"
     """
     return field.get("type", "text").lower() == "signature"
+
+
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+JPEG_MAGIC = b"\xff\xd8\xff"
+DATA_URL_PREFIX = "data:image/png;base64,"
+
+# Placed-image cache per thread (see signature_xobject); one per PDF worker process
+SIGNATURE_CACHE_SIZE = int(os.getenv("SIGNATURE_CACHE_SIZE", "128"))
+_local = threading.local()
+
+@dataclass(frozen=True)
+class SignatureImage:
+    """
+    A signature image sent as its own multipart part (or decoded from a data URL).
+
+    Attributes:
+        sha256: Digest of ``data``; keys the placed-image cache
+        data: PNG or JPEG bytes
+    """
+    sha256: str
+    data: bytes = field(repr=False)  # fill logs print answer values
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SignatureImage":
+        return cls(hashlib.sha256(data).hexdigest(), data)
+
+    @classmethod
+    def from_data_url(cls, url: str) -> "SignatureImage":
+        return cls.from_bytes(base64.b64decode(url.split(",", 1)[1]))
+
+def image_kind(head: bytes) -> Optional[str]:
+    """
+    Identify a signature image from its first bytes.
+    
+    Args:
+        head: At least the first 8 bytes of the image
+        
+    Returns:
+        "png", "jpeg", or None for anything else
+    """
+    if head.startswith(PNG_MAGIC):
+        return "png"
+    if head.startswith(JPEG_MAGIC):
+        return "jpeg"
+    return None
+
+def png_size(head: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Width and height from a PNG's IHDR chunk, without decoding the image.
+    
+    Args:
+        head: At least the first 24 bytes of the PNG
+        
+    Returns:
+        (width, height), or None if the header is not a valid IHDR
+    """
+    if len(head) < 24 or head[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", head[16:24])
+
+def signature_xobject(sig: SignatureImage):
+    """
+    A one-page PDF holding ``sig`` as an encoded image, cached by hash.
+
+    ``page.insert_image(stream=png)`` decodes and re-encodes the image on every
+    fill; placing this page with ``show_pdf_page`` copies the encoded stream.
+    PyMuPDF documents must not be shared between threads, so with
+    ``PDF_CPU_WORKERS=0`` (fills in the thread pool) each thread keeps its own.
+    
+    Args:
+        sig: The signature image
+        
+    Returns:
+        fitz.Document with one page the size of the image
+    """
+    import fitz
+
+    cache = getattr(_local, "xobjects", None)
+    if cache is None:
+        cache = _local.xobjects = OrderedDict()
+    doc = cache.get(sig.sha256)
+    if doc is not None:
+        cache.move_to_end(sig.sha256)
+        return doc
+    pix = fitz.Pixmap(sig.data)
+    doc = fitz.open()
+    page = doc.new_page(width=pix.width, height=pix.height)
+    page.insert_image(page.rect, pixmap=pix)
+    doc = fitz.open("pdf", doc.tobytes(deflate=True))
+    cache[sig.sha256] = doc
+    while len(cache) > SIGNATURE_CACHE_SIZE:
+        cache.popitem(last=False)[1].close()
+    return doc
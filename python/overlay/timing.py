@@ -0,0 +1,40 @@
+"""
+Stage timers for the PDF pipeline.
+
+The overlay package does not depend on the server, so timings go to a
+pluggable recorder. Nothing is measured until one is installed with
+``set_recorder`` (``server.metrics`` does this).
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+Recorder = Callable[[str, float, str], None]  # (stage, seconds, field_type)
+
+_recorder: Optional[Recorder] = None
+
+
+def set_recorder(recorder: Optional[Recorder]):
+    global _recorder
+    _recorder = recorder
+
+
+def record(stage: str, seconds: float, field_type: str = ""):
+    """Report a duration measured elsewhere (e.g. in a worker process)."""
+    recorder = _recorder
+    if recorder is not None:
+        recorder(stage, seconds, field_type)
+
+
+@contextmanager
+def timed(stage: str, field_type: str = ""):
+    recorder = _recorder
+    if recorder is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder(stage, time.perf_counter() - t0, field_type)
@@ -1,11 +1,22 @@
-from fastapi import APIRouter, HTTPException, Form, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Form, UploadFile, File, Query, Request
+from fastapi.responses import JSONResponse, Response
+import asyncio
 import json
 import os
 import pathlib
 import logging
 from typing import List, Optional
 
+from server import aio, json_codec
+from server.catalog_store import SUMMARY_COLUMNS, get_catalog
+from server.firestore_store import applications
+from server import warmup
+from server.form_index import form_index
+from server.template_store import template_store
+from server.blob_store import blob_store
+from server.loop_monitor import loop_monitor
+from server.paths import DATA
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -48,30 +59,14 @@ async def process_county(county_data: str = Form(...), filename: Optional[str] =
                 )
         
         # Save county JSON to data directory
-        data_dir = pathlib.Path("data")
+        data_dir = DATA
         data_dir.mkdir(exist_ok=True)
         
         county_file = data_dir / f"{county['id']}.json"
-        with open(county_file, "w") as f:
-            json.dump(county, f, indent=2)
-        
-        # Update manifest.json
-        manifest_file = data_dir / "manifest.json"
-        if manifest_file.exists():
-            with open(manifest_file, "r") as f:
-                manifest = json.load(f)
-        else:
-            manifest = {"counties": []}
-        
-        # Add or update county in manifest
-        existing_county = next((c for c in manifest["counties"] if c["id"] == county["id"]), None)
-        if existing_county:
-            existing_county.update(county)
-        else:
-            manifest["counties"].append(county)
-        
-        with open(manifest_file, "w") as f:
-            json.dump(manifest, f, indent=2)
+        await aio.write_json(county_file, county)
+        
+        # Add or update county in the catalog (re-exports manifest.json)
+        version = await aio.run(lambda: get_catalog().upsert(county))
         
         logger.info(f"County processed successfully: {county['id']}")
         
@@ -79,6 +74,7 @@ async def process_county(county_data: str = Form(...), filename: Optional[str] =
             "status": "success",
             "message": f"County '{county['title']}' processed successfully",
             "county_id": county["id"],
+            "catalog_version": version,
             "steps_count": len(county["steps"]),
             "pdf_steps_count": len(pdf_steps)
         })
@@ -89,24 +85,58 @@ async def process_county(county_data: str = Form(...), filename: Optional[str] =
         logger.error(f"County processing error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"County processing error: {str(e)}")
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def _counties_response(fields: Optional[str], summary: bool, limit: Optional[int], offset: int,
+                       if_none_match: Optional[str]) -> Response:
+    snap = get_catalog().snapshot()
+    if summary:
+        selected = SUMMARY_COLUMNS
+    else:
+        selected = tuple(f.strip() for f in fields.split(",") if f.strip()) if fields else None
+    key = (selected, limit, offset)
+    etag = snap.etag(*key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    def build() -> bytes:
+        counties = snap.select(selected, limit, offset)
+        end = offset + len(counties)
+        return json_codec.dumps({
+            "counties": counties,
+            "status": "success",
+            "count": len(counties),
+            "total": len(snap),
+            "offset": offset,
+            "limit": limit,
+            "next_offset": end if end < len(snap) else None,
+            "version": snap.version
+        }, default=str)
+
+    return Response(snap.body(key, build), media_type="application/json", headers=headers)
+
 @router.get("/admin/counties")
-async def get_counties():
+async def get_counties(
+    request: Request,
+    fields: Optional[str] = None,
+    summary: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
     """
-    Get list of all counties - migrated from Node.js server
+    Get list of counties - paginated (limit/offset), projected (fields=id,title,status)
+    or summary columns only (summary=true). Served from the in-memory catalog snapshot,
+    with a strong ETag per catalog version and query (If-None-Match -> 304)
     """
     try:
-        manifest_file = pathlib.Path("data/manifest.json")
-        if not manifest_file.exists():
-            return JSONResponse(content={"counties": [], "status": "success"})
-        
-        with open(manifest_file, "r") as f:
-            manifest = json.load(f)
-        
-        return JSONResponse(content={
-            "counties": manifest.get("counties", []),
-            "status": "success",
-            "count": len(manifest.get("counties", []))
-        })
+        return await asyncio.to_thread(
+            _counties_response, fields, summary, limit, offset, request.headers.get("if-none-match")
+        )
         
     except Exception as e:
         logger.error(f"Get counties error: {str(e)}")
@@ -119,24 +149,14 @@ async def delete_county(county_id: str):
     """
     try:
         # Remove county JSON file
-        county_file = pathlib.Path(f"data/{county_id}.json")
-        if county_file.exists():
-            county_file.unlink()
+        county_file = DATA / f"{county_id}.json"
+        if await aio.exists(county_file):
+            await aio.unlink(county_file)
             logger.info(f"County file deleted: {county_id}")
         
-        # Update manifest.json
-        manifest_file = pathlib.Path("data/manifest.json")
-        if manifest_file.exists():
-            with open(manifest_file, "r") as f:
-                manifest = json.load(f)
-            
-            # Remove county from manifest
-            manifest["counties"] = [c for c in manifest["counties"] if c["id"] != county_id]
-            
-            with open(manifest_file, "w") as f:
-                json.dump(manifest, f, indent=2)
-            
-            logger.info(f"County removed from manifest: {county_id}")
+        # Remove from the catalog (re-exports manifest.json)
+        if await aio.run(lambda: get_catalog().delete(county_id)):
+            logger.info(f"County removed from catalog: {county_id}")
         
         return JSONResponse(content={
             "status": "success",
@@ -153,23 +173,90 @@ async def admin_status():
     Check admin service status
     """
     try:
-        data_dir = pathlib.Path("data")
-        manifest_file = data_dir / "manifest.json"
-        
-        county_count = 0
-        if manifest_file.exists():
-            with open(manifest_file, "r") as f:
-                manifest = json.load(f)
-                county_count = len(manifest.get("counties", []))
+        data_dir = DATA
+        # Off the loop: opening the catalog may import manifest.json
+        def catalog_info():
+            catalog = get_catalog()
+            return catalog.count(), catalog.version()
+
+        county_count, catalog_version = await asyncio.to_thread(catalog_info)
         
         return {
             "status": "operational",
             "backend": "python",
             "data_directory": str(data_dir.absolute()),
             "county_count": county_count,
+            "catalog_version": catalog_version,
+            "application_cache": applications.cache_stats(),
+            "warmup": warmup.report,
+            "form_index": form_index.info(),
+            "templates": template_store.info(),
+            "shared_cache": blob_store.cache.info(),
+            "event_loop": loop_monitor.info(),
             "message": "Admin services running on Python backend"
         }
         
     except Exception as e:
         logger.error(f"Admin status error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Admin status error: {str(e)}")
+
+@router.get("/admin/storage")
+async def admin_storage():
+    """
+    PDF blob store deduplication report
+    """
+    try:
+        return await asyncio.to_thread(blob_store.report)
+    except Exception as e:
+        logger.error(f"Admin storage error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Admin storage error: {str(e)}")
+
+def _require_profile_token(request: Request):
+    from server.profiling import has_token
+    if not has_token(request.scope):
+        raise HTTPException(status_code=403, detail="X-Profile: <PROFILE_TOKEN> required")
+
+@router.get("/admin/profiles")
+async def admin_profiles(request: Request, limit: int = Query(100, ge=1, le=1000)):
+    """
+    Stored request profiles (newest first): route, app/form, duration, trigger
+    """
+    _require_profile_token(request)
+    from server.profiling import list_profiles
+    profiles = await asyncio.to_thread(list_profiles, limit)
+    return {"profiles": profiles, "count": len(profiles)}
+
+@router.get("/admin/profiles/{profile_id}")
+async def admin_profile(request: Request, profile_id: str, format: str = "json", kind: str = "wall"):
+    """
+    Download a profile: full JSON, or folded stacks (format=folded, kind=wall|cpu)
+    for flamegraph.pl / speedscope
+    """
+    _require_profile_token(request)
+    from server.profiling import folded, load_profile
+    profile = await asyncio.to_thread(load_profile, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    if format == "folded":
+        if kind not in ("wall", "cpu"):
+            raise HTTPException(status_code=400, detail="kind must be wall or cpu")
+        return Response(folded(profile, kind), media_type="text/plain",
+                        headers={"Content-Disposition": f'attachment; filename="{profile_id}.{kind}.folded"'})
+    return JSONResponse(profile, headers={"Content-Disposition": f'attachment; filename="{profile_id}.json"'})
+
+@router.post("/admin/resync", status_code=202)
+async def admin_resync(app: Optional[str] = None, dry_run: bool = False, wait: bool = False):
+    """
+    Revalidate county PDFs with conditional GETs and re-process only the changed forms
+    """
+    from server.jobs import get_queue
+    from server.job_routes import wait_for_job
+
+    queue = get_queue()
+    job_id = await aio.run(queue.enqueue, "resync", {"app": app, "dry_run": dry_run})
+    if not wait:
+        return {"ok": True, "job_id": job_id, "status_url": f"/jobs/{job_id}", "events_url": f"/jobs/{job_id}/events"}
+    job = await wait_for_job(queue, job_id)
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=500, detail=f"Re-sync failed: {job['error']} (job {job_id})")
+    return JSONResponse({**job["result"], "job_id": job_id})
@@ -0,0 +1,167 @@
+"""
+Answer cache and single-flight coalescing for the AI chat endpoint.
+
+Applicants in the same county tend to ask the same questions against the
+same application context, so identical prompts are answered once and served
+from memory until they expire. Concurrent identical prompts share a single
+upstream call instead of each hitting OpenAI.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+CacheKey = Tuple[str, str, str]
+
+_WS = re.compile(r"\s+")
+_PUNCT = re.compile(r"[^\w\s$%]")
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivially
+    different phrasings ("How much is the fee?" / "how much is the fee")
+    share a cache entry."""
+    text = _PUNCT.sub(" ", (text or "").lower())
+    return _WS.sub(" ", text).strip()
+
+
+def context_fingerprint(*parts: Any) -> str:
+    """Stable sha256 over everything (besides the question) that shapes the answer."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class _Flight:
+    """One in-flight computation and the number of callers awaiting it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+
+
+class AnswerCache:
+    """TTL + LRU cache of AI answers with in-flight request coalescing."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, "_Flight"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(application_id: str, question: str, fingerprint: str) -> CacheKey:
+        return (application_id or "", normalize_question(question), fingerprint)
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: CacheKey, value: str):
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_compute(
+        self,
+        key: CacheKey,
+        compute: Callable[[], Awaitable[Tuple[str, bool]]],
+    ) -> Tuple[str, str]:
+        """
+        Return ``(answer, source)`` where source is ``"cache"``, ``"coalesced"``
+        or ``"upstream"``. ``compute`` returns ``(answer, cacheable)`` so that
+        fallback answers produced on upstream failure are never cached.
+
+        ``compute`` runs as a task of its own, not in the caller that started
+        it: a caller cancelled by its client disconnecting leaves the others
+        waiting for the answer. It is cancelled once no caller is left.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, "cache"
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            source = "coalesced"
+        else:
+            self.misses += 1
+            self.upstream_calls += 1
+            flight = self._inflight[key] = _Flight()
+            flight.task = asyncio.create_task(self._compute(key, flight, compute))
+            source = "upstream"
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), source
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller is gone: nobody is left to answer
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    async def _compute(self, key: CacheKey, flight: "_Flight",
+                       compute: Callable[[], Awaitable[Tuple[str, bool]]]) -> str:
+        try:
+            answer, cacheable = await compute()
+            if cacheable:
+                self.put(key, answer)
+            return answer
+        finally:
+            self._forget(key, flight)
+
+    def _forget(self, key: CacheKey, flight: "_Flight"):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.coalesced + self.misses
+        saved = self.hits + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "upstream_calls": self.upstream_calls,
+            "upstream_calls_saved": saved,
+            "hit_rate": round(saved / lookups, 4) if lookups else 0.0,
+        }
+
+
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("AI_CACHE_MAX_ENTRIES", "512")),
+    ttl_seconds=float(os.getenv("AI_CACHE_TTL_SECONDS", "3600")),
+)
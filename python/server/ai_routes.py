@@ -1,25 +1,41 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
 from fastapi.responses import JSONResponse
+import asyncio
 import json
 import os
-import openai
 import re
-import requests
+import time
 from typing import Optional
 import logging
 
+from server import aio
+from server.ai_cache import answer_cache, context_fingerprint
+from server.llm_gate import openai_gate, UpstreamUnavailable
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize OpenAI client
-openai_client = None
-try:
-    openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-except Exception as e:
-    logger.warning(f"OpenAI client not initialized: {e}")
+# OpenAI client, created on first use (importing openai is slow)
+_openai_client = None
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        import openai
+        try:
+            # Retries and backoff are handled by openai_gate, not the SDK
+            _openai_client = openai.OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_retries=0,
+                timeout=float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30")),
+            )
+        except Exception as e:
+            logger.warning(f"OpenAI client not initialized: {e}")
+            _openai_client = False
+    return _openai_client or None
 
 @router.post("/ai-chat")
 async def ai_chat(request: dict):
@@ -28,6 +44,8 @@ async def ai_chat(request: dict):
     Accepts JSON payload with 'messages' array and full context
     """
     try:
+        # First call imports openai (slow): keep it off the event loop
+        openai_client = _openai_client or await aio.run(get_openai_client)
         if not openai_client:
             raise HTTPException(status_code=500, detail="OpenAI client not configured")
         
@@ -181,28 +199,44 @@ FORM-SPECIFIC CONTEXT:
             content = msg.get("content", "") if isinstance(msg, dict) else ""
             openai_messages.append({"role": role, "content": content})
         
-        # Call OpenAI API
-        try:
-            completion = openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=openai_messages,
-                max_tokens=1000,
-                temperature=0.7
-            )
-            
-            ai_response = completion.choices[0].message.content
-            
-        except Exception as openai_error:
-            logger.error(f"OpenAI API error: {str(openai_error)}")
-            # Fallback response if OpenAI fails
-            ai_response = f"I understand you're asking about '{last_user_message}'. I'm here to help with your MEHKO application, but I'm experiencing technical difficulties. Please try again or contact support."
+        # Identical questions against identical context share one answer
+        history = openai_messages[:-1] if openai_messages[-1]["role"] == "user" else openai_messages
+        cache_key = answer_cache.make_key(
+            str(application.get("id") or application.get("title") or ""),
+            last_user_message,
+            context_fingerprint(history),
+        )
+
+        # Fallback response if OpenAI fails or the upstream gate rejects the call
+        fallback_reply = f"I understand you're asking about '{last_user_message}'. I'm here to help with your MEHKO application, but I'm experiencing technical difficulties. Please try again or contact support."
+
+        async def call_openai():
+            # Call OpenAI API (off the event loop so concurrent requests can coalesce)
+            try:
+                # ``.chat.completions`` imports lazily on first access: resolve it in the thread too
+                completion = await openai_gate.call(lambda: asyncio.to_thread(
+                    lambda **kwargs: openai_client.chat.completions.create(**kwargs),
+                    model="gpt-4",
+                    messages=openai_messages,
+                    max_tokens=1000,
+                    temperature=0.7
+                ))
+                return completion.choices[0].message.content, True
+            except UpstreamUnavailable as rejected:
+                logger.warning(f"OpenAI call not admitted: {rejected.reason}")
+                return fallback_reply, False
+            except Exception as openai_error:
+                logger.error(f"OpenAI API error: {str(openai_error)}")
+                return fallback_reply, False
+
+        ai_response, source = await answer_cache.get_or_compute(cache_key, call_openai)
         
         response = {
             "reply": ai_response,
             "status": "success"
         }
         
-        logger.info(f"AI chat request processed with full context: {last_user_message[:50]}...")
+        logger.info(f"AI chat request processed with full context ({source}): {last_user_message[:50]}...")
         return JSONResponse(content=response)
         
     except Exception as e:
@@ -212,37 +246,32 @@ FORM-SPECIFIC CONTEXT:
 @router.post("/ai-analyze-pdf")
 async def ai_analyze_pdf(pdf: UploadFile = File(...)):
     """
-    AI PDF analysis endpoint - migrated from Node.js server
+    Detect form fields locally from the PDF's drawings, text and widgets.
+    Returns overlay.json-compatible fields with confidences for the Field Mapper.
     """
     try:
-        if not openai_client:
-            raise HTTPException(status_code=500, detail="OpenAI client not configured")
-        
         # Validate PDF file
         if not pdf.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="File must be a PDF")
         
-        # For now, return a placeholder response
-        # TODO: Implement full OpenAI Vision API integration
+        from overlay.field_detector import detect_fields
+        pdf_bytes = await pdf.read()
+        started = time.perf_counter()
+        fields = await asyncio.to_thread(detect_fields, pdf_bytes)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+
         response = {
-            "fields": [
-                {
-                    "type": "text",
-                    "x": 100,
-                    "y": 200,
-                    "width": 150,
-                    "height": 25,
-                    "label": "Sample Field",
-                    "confidence": 0.95
-                }
-            ],
+            "fields": fields,
             "status": "success",
-            "message": "PDF analysis endpoint migrated to Python backend"
+            "elapsed_ms": elapsed_ms,
+            "message": f"Detected {len(fields)} fields"
         }
         
-        logger.info(f"PDF analysis request processed: {pdf.filename}")
+        logger.info(f"PDF analysis request processed: {pdf.filename} ({len(fields)} fields, {elapsed_ms} ms)")
         return JSONResponse(content=response)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"PDF analysis error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"PDF analysis error: {str(e)}")
@@ -308,11 +337,10 @@ async def form_fields(application_id: str, form_name: str):
         json_filename = form_name.replace(".pdf", ".json")
         json_path = f"data/applications/{application_id}/forms/{json_filename}"
         
-        if not os.path.exists(json_path):
+        if not await aio.exists(json_path):
             raise HTTPException(status_code=404, detail="Form JSON not found")
         
-        with open(json_path, 'r') as f:
-            merged_fields = json.load(f)
+        merged_fields = await aio.read_json(json_path)
         
         return {"fields": merged_fields}
         
@@ -327,6 +355,8 @@ async def download_pdf(request: dict):
     """
     Download PDF from URL - migrated from Node.js server
     """
+    import httpx
+
     try:
         url = request.get("url")
         app_id = request.get("appId")
@@ -343,29 +373,20 @@ async def download_pdf(request: dict):
         if not re.match(r'^[A-Za-z0-9_-]+$', form_id):
             raise HTTPException(status_code=400, detail="Invalid formId format. Use only letters, numbers, hyphens, and underscores.")
         
-        # Create directory structure
-        app_dir = f"data/applications/{app_id}"
-        forms_dir = f"{app_dir}/forms"
-        form_dir = f"{forms_dir}/{form_id}"
-        
-        os.makedirs(form_dir, exist_ok=True)
-        
         # Download PDF from URL
         logger.info(f"Downloading PDF from: {url}")
-        import requests
         
-        response = requests.get(url)
-        response.raise_for_status()
+        content, content_type = await aio.fetch(url)
         
         # Check if response is actually a PDF
-        content_type = response.headers.get("content-type", "")
         if "application/pdf" not in content_type:
             logger.warning(f"Warning: Response may not be a PDF. Content-Type: {content_type}")
         
-        # Save PDF to local filesystem
-        pdf_path = f"{form_dir}/form.pdf"
-        with open(pdf_path, 'wb') as f:
-            f.write(response.content)
+        # Save PDF to the blob store and link it as the form's form.pdf
+        from server.blob_store import store_form_pdf
+        from server.paths import form_dir
+        sha = await aio.run(store_form_pdf, app_id, form_id, content)
+        pdf_path = str(form_dir(app_id, form_id) / "form.pdf")
         
         logger.info(f"PDF saved to: {pdf_path}")
         
@@ -373,10 +394,11 @@ async def download_pdf(request: dict):
             "success": True,
             "message": f"PDF downloaded and saved to {pdf_path}",
             "path": pdf_path,
-            "size": len(response.content)
+            "size": len(content),
+            "sha256": sha,
         }
         
-    except requests.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
         logger.error(f"Download error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to download PDF: {str(e)}")
     except Exception as e:
@@ -391,6 +413,8 @@ async def ai_status():
     return {
         "status": "operational",
         "backend": "python",
-        "openai_configured": openai_client is not None,
+        "openai_configured": (_openai_client or await aio.run(get_openai_client)) is not None,
+        "cache": answer_cache.stats(),
+        "upstream": openai_gate.stats(),
         "message": "AI services running on Python backend"
     }
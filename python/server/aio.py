@@ -0,0 +1,142 @@
+"""
+Non-blocking file, network and CPU work for ``async def`` routes.
+
+An ``async def`` route runs on the event loop, so a blocking call there (a
+file read, a JSON write, a synchronous HTTP request, a PDF fill) stalls
+every other request on the worker. Routes use these helpers instead:
+
+- file operations and short blocking calls run in the default thread pool
+  (``run``, ``read_bytes``, ``write_json``, ...);
+- downloads use ``httpx.AsyncClient`` with a timeout and a size cap (``fetch``);
+- long CPU-bound PDF work (fills, AcroForm generation) runs in a ``spawn``
+  process pool of ``PDF_CPU_WORKERS`` (``run_cpu``). In a thread it would
+  still hold the GIL and starve the loop (PyPDF2 is pure Python). Stage
+  timings recorded in the worker are replayed into this process's metrics.
+  With ``PDF_CPU_WORKERS=0`` it falls back to the thread pool.
+
+    pdf_bytes = await aio.read_bytes(path)
+    filled = await aio.run_cpu(fill_acroform_pdf_bytes, pdf_bytes, answers)
+    content, content_type = await aio.fetch(url)
+"""
+
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+from overlay import timing
+
+PDF_CPU_WORKERS = int(os.getenv("PDF_CPU_WORKERS", str(min(2, os.cpu_count() or 1))))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT_SECONDS", "30"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(50 * 1024 * 1024)))
+
+T = TypeVar("T")
+
+
+async def run(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run blocking ``fn`` in the thread pool."""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def cpu_pool() -> Optional[ProcessPoolExecutor]:
+    """The worker pool for ``run_cpu`` (created on first use), or None if disabled."""
+    global _pool
+    if _pool is None and PDF_CPU_WORKERS > 0:
+        with _pool_lock:
+            if _pool is None:
+                # spawn, not fork: the parent holds gRPC/HTTP threads that must not be forked
+                _pool = ProcessPoolExecutor(max_workers=PDF_CPU_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+    _pool = None
+
+
+def _recorded(fn: Callable[..., T], args: tuple, kwargs: dict) -> Tuple[T, List[tuple]]:
+    # Runs in the worker process: collect stage timings to send back with the result
+    records: List[tuple] = []
+    timing.set_recorder(lambda stage, seconds, field_type: records.append((stage, seconds, field_type)))
+    try:
+        return fn(*args, **kwargs), records
+    finally:
+        timing.set_recorder(None)
+
+
+def preload():
+    """Import the PDF libraries (run in each worker by the warm-up)."""
+    import overlay.acroform_handler  # noqa: F401
+    import overlay.fill_overlay  # noqa: F401
+
+
+async def run_cpu(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run CPU-bound ``fn`` (a module-level function) in the worker pool."""
+    pool = cpu_pool()
+    if pool is None:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    result, records = await asyncio.get_running_loop().run_in_executor(pool, _recorded, fn, args, kwargs)
+    for record in records:
+        timing.record(*record)
+    return result
+
+
+async def read_bytes(path: Path) -> bytes:
+    return await asyncio.to_thread(Path(path).read_bytes)
+
+
+async def read_text(path: Path) -> str:
+    return await asyncio.to_thread(Path(path).read_text)
+
+
+async def read_json(path: Path) -> Any:
+    return await asyncio.to_thread(lambda: json.loads(Path(path).read_text()))
+
+
+async def write_bytes(path: Path, data: bytes):
+    await asyncio.to_thread(Path(path).write_bytes, data)
+
+
+async def write_text(path: Path, text: str):
+    await asyncio.to_thread(Path(path).write_text, text)
+
+
+async def write_json(path: Path, data: Any, indent: Optional[int] = 2, **kwargs):
+    # Serialise in the thread too: large documents take a while to encode
+    await asyncio.to_thread(lambda: Path(path).write_text(json.dumps(data, indent=indent, **kwargs)))
+
+
+async def unlink(path: Path, missing_ok: bool = True):
+    await asyncio.to_thread(Path(path).unlink, missing_ok=missing_ok)
+
+
+async def exists(path: Path) -> bool:
+    return await asyncio.to_thread(Path(path).exists)
+
+
+async def fetch(url: str, timeout: float = FETCH_TIMEOUT, max_bytes: int = FETCH_MAX_BYTES) -> Tuple[bytes, str]:
+    """GET ``url`` following redirects; returns ``(content, content_type)``.
+    Raises ``httpx.HTTPError`` on transport errors, timeouts and non-2xx
+    responses, and ``ValueError`` if the body exceeds ``max_bytes``."""
+    import httpx
+
+    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            chunks, size = [], 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"response from {url} exceeds {max_bytes} bytes")
+                chunks.append(chunk)
+            return b"".join(chunks), response.headers.get("content-type", "")
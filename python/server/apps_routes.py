@@ -1,19 +1,26 @@
-import io, json, os
+import asyncio, os
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 # NEW: load .env early (so env vars exist when this module is imported)
 from dotenv import load_dotenv
 load_dotenv()  # will pick up /python/.env if you start the server from /python
 
-import fitz
-from fastapi import APIRouter, UploadFile, File, Form, Request, HTTPException
-from fastapi.responses import FileResponse
-from starlette.responses import Response, StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Form, Header, Request, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.responses import Response
 
-from overlay.fill_overlay import fill_pdf_overlay_bytes
-from server.firebase_admin_init import db
-from firebase_admin import firestore
+from server.paths import ROOT, app_dir, form_dir, ensure_dir
+from server.blob_store import blob_store, form_pdf_blob, form_pdf_path, form_pdf_hash
+from server.uploads import UploadRejected, derived_json, signature_answers, store_upload, warm_derived
+from server.jobs import get_queue
+from server.job_routes import wait_for_job
+from server.firestore_store import applications, new_application
+from server.form_index import form_index
+from server.json_codec import FastJSONResponse, loads
+from server.template_store import (TEMPLATE_REQUIRE_IF_MATCH, TEMPLATES, TemplateConflict, TemplateSnapshot,
+                                   etag_matches, template_store)
+from server import aio, metrics
 
 
 router = APIRouter(tags=["apps"])
@@ -28,44 +35,36 @@ def env_bool(name: str, default: bool = True) -> bool:
 # Use it here — defaults to True so mapper is ON unless explicitly disabled
 MAPPER_ENABLED = env_bool("MAPPER_ENABLED", True)
 
-# --- Paths ---
-ROOT = Path(__file__).resolve().parents[2]        # repo root
-APPS = ROOT / "data" / "applications"             # data/applications/<app>/<form>/
+# Preview renders are cached per (PDF, page, dpi), so only these resolutions are served
+PREVIEW_DPIS = (72, 144, 300)
 
-def app_dir(app: str) -> Path:
-    return APPS / app
-
-def form_dir(app: str, form: str) -> Path:
-    return app_dir(app) / "forms" / form
-
-def ensure_dir(p: Path):
-    p.mkdir(parents=True, exist_ok=True)
 
 # --- Apps CRUD (minimal) ---
 @router.get("")
-def list_apps() -> List[str]:
-    if not APPS.exists():
-        return []
-    return sorted([p.name for p in APPS.iterdir() if p.is_dir()])
+def list_apps(response: Response) -> List[str]:
+    snap = form_index.snapshot
+    response.headers["X-Index-Version"] = str(snap.version)
+    return list(snap.app_names)
+
+@router.get("/index")
+def get_index(request: Request):
+    """Every app, its forms and their available artifacts, with the index version.
+    The ETag is content-derived, so it matches across workers."""
+    snap = form_index.snapshot
+    headers = {"ETag": f'"index-{snap.digest}"', "X-Index-Version": str(snap.version), "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse({"version": snap.version, "digest": snap.digest, "apps": snap.to_dict()}, headers=headers)
 
 @router.get("/{app}/forms")
-def list_forms(app: str) -> List[str]:
-    """List all available forms for a given application."""
-    app_path = app_dir(app)
-    if not app_path.exists():
+def list_forms(app: str, response: Response) -> List[str]:
+    """List all available forms (those with a PDF) for a given application."""
+    snap = form_index.snapshot
+    forms = snap.form_names.get(app)
+    if forms is None:
         raise HTTPException(404, f"Application '{app}' not found")
-    
-    forms_path = app_path / "forms"
-    if not forms_path.exists():
-        return []
-    
-    # Return all form directories that contain a form.pdf file
-    forms = []
-    for form_dir in forms_path.iterdir():
-        if form_dir.is_dir() and (form_dir / "form.pdf").exists():
-            forms.append(form_dir.name)
-    
-    return sorted(forms)
+    response.headers["X-Index-Version"] = str(snap.version)
+    return list(forms)
 
 @router.post("")
 async def create_app(request: Request, app: str = Form(None)):
@@ -80,33 +79,21 @@ async def create_app(request: Request, app: str = Form(None)):
     if not name:
         raise HTTPException(400, "missing app")
 
-    ensure_dir(app_dir(name))
-
-    # Firestore doc + comments subcollection (idempotent)
-    app_ref = db.collection("applications").document(name)
-    snap = app_ref.get()
-    if not snap.exists:
-        payload = {
-            "id": name,
-            "title": data.get("title", name.replace("_", " ").title()),
-            "description": data.get("description", ""),
-            "rootDomain": data.get("rootDomain", ""),
-            "supportTools": {"aiEnabled": True, "commentsEnabled": True},
-            "steps": [],
-        }
-        app_ref.set(payload)
-        app_ref.collection("comments").add({
-            "displayName": "System",
-            "text": "Comments thread started.",
-            "timestamp": firestore.SERVER_TIMESTAMP,
-            "userId": "system",
-        })
-
-    return {"ok": True, "app": name}
-
-@router.post("/process-county")
-async def process_county_application(request: Request):
-    """Process a complete county application JSON with PDF downloads and automatic field detection"""
+    await aio.run(ensure_dir, app_dir(name))
+    await aio.run(form_index.refresh, name)
+
+    # Firestore doc + comments subcollection (idempotent): cached existence check,
+    # then one batched commit that fails its create precondition if the doc exists
+    payload, comment = new_application(name, data)
+    created = await asyncio.to_thread(applications.create_application, name, payload, comment)
+
+    return {"ok": True, "app": name, "created": created}
+
+@router.post("/process-county", status_code=202)
+async def process_county_application(request: Request, wait: bool = False):
+    """Queue a county application for processing (config, catalog, Firestore,
+    PDF downloads and field detection). Returns the job id immediately; follow
+    progress at /jobs/{id} or /jobs/{id}/events. ``?wait=true`` runs it inline."""
     try:
         # Get the JSON data from the request
         data = await request.json()
@@ -117,205 +104,25 @@ async def process_county_application(request: Request):
             if field not in data:
                 raise HTTPException(400, f"Missing required field: {field}")
         
-        app_id = data["id"]
-        app_title = data["title"]
-        
-        print(f"🔄 Processing county application: {app_title}")
-        
-        # Create application directory
-        ensure_dir(app_dir(app_id))
-        print(f"✅ Created application directory: {app_dir(app_id)}")
-        
-        # Save county JSON to data directory
-        data_dir = ROOT / "data"
-        county_file = data_dir / f"{app_id}.json"
-        with open(county_file, "w") as f:
-            json.dump(data, f, indent=2)
-        print(f"✅ Saved county configuration: {county_file}")
-        
-        # Load and update manifest.json
-        manifest_file = data_dir / "manifest.json"
-        manifest = []
-        if manifest_file.exists():
-            with open(manifest_file, "r") as f:
-                manifest = json.load(f)
-        
-        # Check if county already exists
-        existing_index = next((i for i, c in enumerate(manifest) if c.get("id") == app_id), -1)
-        if existing_index != -1:
-            print(f"⚠️  County {app_id} already exists in manifest, updating...")
-            manifest[existing_index] = data
-        else:
-            print(f"➕ Adding {app_id} to manifest...")
-            manifest.append(data)
-        
-        # Save updated manifest
-        with open(manifest_file, "w") as f:
-            json.dump(manifest, f, indent=2)
-        print(f"✅ Updated manifest.json")
-        
-        # Create Firestore document
-        app_ref = db.collection("applications").document(app_id)
-        app_ref.set({
-            **data,
-            "createdAt": firestore.SERVER_TIMESTAMP,
-            "updatedAt": firestore.SERVER_TIMESTAMP,
-            "status": "active",
-            "source": "admin-upload",
-        })
-        print(f"✅ Created Firestore document: {app_id}")
-        
-        # Process PDF steps
-        pdf_steps = [step for step in data["steps"] if step.get("type") == "pdf"]
-        downloaded_count = 0
-        field_detection_count = 0
-        
-        for step in pdf_steps:
-            if not step.get("pdfUrl") or not step.get("formId"):
-                print(f"⚠️  Skipping PDF step {step['id']}: missing pdfUrl or formId")
-                continue
-                
-            try:
-                print(f"📥 Downloading PDF for {step['title']}...")
-                
-                # Create form directory
-                form_path = form_dir(app_id, step["formId"])
-                ensure_dir(form_path)
-                
-                # Download PDF
-                import httpx
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.get(step["pdfUrl"])
-                    response.raise_for_status()
-                    
-                    # Save PDF
-                    pdf_dest = form_path / "form.pdf"
-                    pdf_dest.write_bytes(response.content)
-                    
-                    # Create meta.json
-                    meta_data = {
-                        "id": step["formId"],
-                        "title": step["title"],
-                        "type": "pdf",
-                        "appId": app_id,
-                        "stepId": step["id"],
-                        "pdfUrl": step["pdfUrl"],
-                        "createdAt": firestore.SERVER_TIMESTAMP,
-                    }
-                    
-                    meta_path = form_path / "meta.json"
-                    meta_path.write_text(json.dumps(meta_data, indent=2, default=str))
-                    
-                    print(f"✅ Downloaded {step['title']} ({len(response.content)} bytes)")
-                    downloaded_count += 1
-                    
-                    # NEW: Automatically detect form fields and create acroform-definition.json
-                    try:
-                        print(f"🔍 Detecting form fields for {step['title']}...")
-                        
-                        # Use AI field detection to automatically identify form fields
-                        from overlay.acroform_handler import AcroFormHandler
-                        handler = AcroFormHandler(response.content)
-                        
-                        # Get existing AcroForm fields if any
-                        existing_fields = handler.get_existing_fields()
-                        
-                        if existing_fields:
-                            # PDF already has AcroForm fields, use them
-                            print(f"✅ Found existing AcroForm fields: {len(existing_fields)} fields")
-                            acroform_definition = {
-                                "id": step["formId"],
-                                "title": step["title"],
-                                "type": "existing_acroform",
-                                "appId": app_id,
-                                "stepId": step["id"],
-                                "fields": existing_fields,
-                                "createdAt": firestore.SERVER_TIMESTAMP,
-                                "source": "existing_pdf_fields"
-                            }
-                        else:
-                            # No existing fields, create a basic template for manual field mapping
-                            print(f"📝 Creating basic field template for manual mapping")
-                            acroform_definition = {
-                                "id": step["formId"],
-                                "title": step["title"],
-                                "type": "template",
-                                "appId": app_id,
-                                "stepId": step["id"],
-                                "fields": [],
-                                "createdAt": firestore.SERVER_TIMESTAMP,
-                                "source": "auto_generated_template",
-                                "note": "This is a basic template. Use the Field Mapper to add form fields."
-                            }
-                        
-                        # Save acroform-definition.json
-                        acroform_path = form_path / "acroform-definition.json"
-                        acroform_path.write_text(json.dumps(acroform_definition, indent=2, default=str))
-                        
-                        # Also create a basic overlay.json for backward compatibility
-                        overlay_data = {
-                            "id": step["formId"],
-                            "title": step["title"],
-                            "fields": acroform_definition["fields"],
-                            "createdAt": firestore.SERVER_TIMESTAMP,
-                        }
-                        overlay_path = form_path / "overlay.json"
-                        overlay_path.write_text(json.dumps(overlay_data, indent=2, default=str))
-                        
-                        print(f"✅ Created field definitions for {step['title']}")
-                        field_detection_count += 1
-                        
-                    except Exception as field_error:
-                        print(f"⚠️  Field detection failed for {step['title']}: {str(field_error)}")
-                        # Create minimal template files even if detection fails
-                        try:
-                            minimal_acroform = {
-                                "id": step["formId"],
-                                "title": step["title"],
-                                "type": "template",
-                                "appId": app_id,
-                                "stepId": step["id"],
-                                "fields": [],
-                                "createdAt": firestore.SERVER_TIMESTAMP,
-                                "source": "fallback_template",
-                                "note": "Field detection failed. Use the Field Mapper to add form fields manually."
-                            }
-                            
-                            acroform_path = form_path / "acroform-definition.json"
-                            acroform_path.write_text(json.dumps(minimal_acroform, indent=2, default=str))
-                            
-                            overlay_data = {
-                                "id": step["formId"],
-                                "title": step["title"],
-                                "fields": [],
-                                "createdAt": firestore.SERVER_TIMESTAMP,
-                            }
-                            overlay_path = form_path / "overlay.json"
-                            overlay_path.write_text(json.dumps(overlay_data, indent=2, default=str))
-                            
-                            print(f"✅ Created fallback templates for {step['title']}")
-                            
-                        except Exception as template_error:
-                            print(f"❌ Failed to create fallback templates: {str(template_error)}")
-                    
-            except Exception as e:
-                print(f"❌ Failed to download {step['title']}: {str(e)}")
-                continue
-        
-        print(f"✅ PDF download process completed ({downloaded_count}/{len(pdf_steps)} forms)")
-        print(f"✅ Field detection completed ({field_detection_count}/{len(pdf_steps)} forms)")
-        
-        return {
-            "ok": True,
-            "app": app_id,
-            "title": app_title,
-            "pdfs_downloaded": downloaded_count,
-            "total_pdf_steps": len(pdf_steps),
-            "field_definitions_created": field_detection_count,
-            "config_saved": str(county_file),
-            "manifest_updated": str(manifest_file)
-        }
-        
+        queue = get_queue()
+        job_id = await aio.run(queue.enqueue, "process_county", data)
+        print(f"🔄 Queued county application {data['title']} as job {job_id}")
+        if not wait:
+            return {
+                "ok": True,
+                "app": data["id"],
+                "job_id": job_id,
+                "status_url": f"/jobs/{job_id}",
+                "events_url": f"/jobs/{job_id}/events",
+            }
+
+        job = await wait_for_job(queue, job_id)
+        if job["status"] != "succeeded":
+            raise HTTPException(500, f"Failed to process county application: {job['error']} (job {job_id})")
+        return JSONResponse({**job["result"], "job_id": job_id})
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error processing county application: {str(e)}")
         raise HTTPException(500, f"Failed to process county application: {str(e)}")
@@ -324,9 +131,9 @@ async def process_county_application(request: Request):
 # serve the actual PDF (GET endpoint must come before POST to avoid conflicts)
 @router.get("/{app}/forms/{form}/pdf")
 def download_pdf(app: str, form: str, inline: bool = False):
-    p = form_dir(app, form) / "form.pdf"
-    if not p.exists():
-        raise HTTPException(404, f"missing PDF at {p}")
+    p = form_pdf_path(app, form)
+    if p is None:
+        raise HTTPException(404, f"missing PDF at {form_dir(app, form) / 'form.pdf'}")
     disposition = "inline" if inline else "attachment"
     return FileResponse(
         path=str(p),
@@ -336,95 +143,122 @@ def download_pdf(app: str, form: str, inline: bool = False):
     )
 
 @router.post("/{app}/forms/{form}/pdf")
-async def upload_pdf(app: str, form: str, file: UploadFile = File(...)):
-    ensure_dir(form_dir(app, form))
+async def upload_pdf(app: str, form: str, background: BackgroundTasks, file: UploadFile = File(...)):
     dest = form_dir(app, form) / "form.pdf"
-    data = await file.read()
-    dest.write_bytes(data)
-    return {"ok": True, "bytes": len(data), "path": str(dest.relative_to(ROOT))}
+    try:
+        spooled, new = await aio.run(store_upload, app, form, file.file)
+    except UploadRejected as e:
+        raise HTTPException(e.status, str(e))
+    await aio.run(form_index.refresh, app)
+    if new:
+        background.add_task(warm_derived, spooled.sha256)
+    return {"ok": True, "bytes": spooled.size, "pages": spooled.pages, "sha256": spooled.sha256,
+            "new": new, "path": str(dest.relative_to(ROOT))}
+
+def _template_response(snap: Optional[TemplateSnapshot], if_none_match: Optional[str], empty: Any = None) -> Response:
+    if snap is None:
+        return JSONResponse(empty)
+    headers = {"ETag": snap.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, snap.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(snap.body, media_type="application/json", headers=headers)
+
+def _get_template(app: str, form: str, kind: str) -> Optional[TemplateSnapshot]:
+    try:
+        return template_store.get(app, form, kind)
+    except ValueError as e:
+        raise HTTPException(500, f"invalid {TEMPLATES[kind]}: {e}")
+
+def _save_template(app: str, form: str, kind: str, data: Dict[str, Any], if_match: Optional[str]) -> TemplateSnapshot:
+    if if_match is None and TEMPLATE_REQUIRE_IF_MATCH:
+        raise HTTPException(428, "If-Match required: send the ETag of the template you edited")
+    try:
+        snap = template_store.save(app, form, kind, data, if_match=if_match)
+    except TemplateConflict as e:
+        headers = {"ETag": e.current.etag} if e.current else {}
+        raise HTTPException(412, f"{TEMPLATES[kind]} {e}; reload it and apply your changes again", headers=headers)
+    except ValueError as e:
+        raise HTTPException(400, f"invalid {TEMPLATES[kind]}: {e}")
+    form_index.refresh(app)
+    return snap
 
 @router.get("/{app}/forms/{form}/template")
-def get_template(app: str, form: str):
-    p = form_dir(app, form) / "overlay.json"
-    if not p.exists():
-        return {"fields": []}
-    return json.loads(p.read_text())
+def get_template(app: str, form: str, if_none_match: Optional[str] = Header(None)):
+    return _template_response(_get_template(app, form, "overlay"), if_none_match, empty={"fields": []})
 
 @router.post("/{app}/forms/{form}/template")
-def save_template(app: str, form: str, overlay_json: str = Form(...)):
-    ensure_dir(form_dir(app, form))
-    p = form_dir(app, form) / "overlay.json"
+def save_template(app: str, form: str, overlay_json: str = Form(...), if_match: Optional[str] = Header(None)):
     try:
-        overlay = json.loads(overlay_json)
-    except Exception:
+        overlay = loads(overlay_json)
+    except ValueError:
         raise HTTPException(400, "overlay_json must be valid JSON")
-    p.write_text(json.dumps(overlay, indent=2))
-    return {"ok": True, "fields": len(overlay.get("fields", []))}
+    if not isinstance(overlay, dict):
+        raise HTTPException(400, "overlay_json must be a JSON object")
+    snap = _save_template(app, form, "overlay", overlay, if_match)
+    return JSONResponse({"ok": True, "fields": snap.fields, "version": snap.version, "etag": snap.etag},
+                        headers={"ETag": snap.etag})
+
+def _blob_is_acroform(sha: str) -> bool:
+    from overlay.acroform_handler import AcroFormHandler
+    with blob_store.open(sha) as pdf:
+        return AcroFormHandler().is_acroform_pdf(pdf)
+
+
+def _blob_acroform_fields(sha: str) -> List[Dict[str, Any]]:
+    from overlay.acroform_handler import AcroFormHandler
+    with blob_store.open(sha) as pdf:
+        return AcroFormHandler(pdf).get_existing_fields()
 
 @router.post("/{app}/forms/{form}/create-acroform")
 async def create_acroform_pdf(app: str, form: str):
     """Create an AcroForm PDF from the existing overlay definition"""
-    pdf_path = form_dir(app, form) / "form.pdf"
-    tpl_path = form_dir(app, form) / "overlay.json"
+    pdf_path = await aio.run(form_pdf_path, app, form)
 
-    if not pdf_path.exists():
-        raise HTTPException(404, f"missing PDF at {pdf_path}")
+    if pdf_path is None:
+        raise HTTPException(404, f"missing PDF at {form_dir(app, form) / 'form.pdf'}")
 
+    headers = {"Content-Disposition": f'attachment; filename="{app}_{form}_acroform.pdf"'}
     try:
-        pdf_bytes = pdf_path.read_bytes()
+        # The PDF is read in place from its blob's mapping, never copied per request
+        sha = await aio.run(form_pdf_blob, app, form)
         
         # Check if PDF is already an AcroForm
-        from overlay.acroform_handler import AcroFormHandler
-        handler = AcroFormHandler()
-        
-        if handler.is_acroform_pdf(pdf_bytes):
+        if await aio.run(_blob_is_acroform, sha):
             # PDF already has AcroForm fields, return it directly
-            return StreamingResponse(
-                io.BytesIO(pdf_bytes),
-                media_type="application/pdf",
-                headers={"Content-Disposition": f'attachment; filename="{app}_{form}_acroform.pdf"'},
-            )
+            return Response(blob_store.view(sha), media_type="application/pdf", headers=headers)
         
         # Check if overlay exists for creating new AcroForm fields
-        if not tpl_path.exists():
+        tpl = await aio.run(template_store.get, app, form, "overlay")
+        if tpl is None:
             # No overlay, return original PDF
-            return StreamingResponse(
-                io.BytesIO(pdf_bytes),
-                media_type="application/pdf",
-                headers={"Content-Disposition": f'attachment; filename="{app}_{form}_acroform.pdf"'},
-            )
-        
-        overlay = json.loads(tpl_path.read_text())
+            return Response(blob_store.view(sha), media_type="application/pdf", headers=headers)
+        overlay = tpl.data
         
         # Create new AcroForm PDF with overlay fields
-        from overlay.acroform_handler import create_acroform_from_overlay
-        acroform_pdf = create_acroform_from_overlay(pdf_bytes, overlay)
+        from server.fill_plans import acroform_from_blob
+        acroform_pdf = await aio.run_cpu(acroform_from_blob, sha, overlay)
         
         # Save the AcroForm PDF
         acroform_path = form_dir(app, form) / "form_acroform.pdf"
-        acroform_path.write_bytes(acroform_pdf)
+        await aio.write_bytes(acroform_path, acroform_pdf)
         
         # Save the AcroForm definition file
-        acroform_def_path = form_dir(app, form) / "acroform-definition.json"
-        acroform_def_path.write_text(json.dumps(overlay, indent=2))
+        await aio.run(template_store.save, app, form, "acroform_definition", overlay)
+        await aio.run(form_index.refresh, app)
         
-        return StreamingResponse(
-            io.BytesIO(acroform_pdf),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f'attachment; filename="{app}_{form}_acroform.pdf"'},
-        )
+        return Response(acroform_pdf, media_type="application/pdf", headers=headers)
     except Exception as e:
         raise HTTPException(500, f"Failed to create AcroForm PDF: {str(e)}")
 
 # extract text for AI context
 @router.get("/{app}/forms/{form}/text")
 def get_pdf_text(app: str, form: str):
-    p = form_dir(app, form) / "form.pdf"
-    if not p.exists():
-        raise HTTPException(404, f"missing PDF at {p}")
-    doc = fitz.open(p)
-    pages = [doc[i].get_text("text") for i in range(len(doc))]
-    return {"pages": pages, "chars": sum(len(t) for t in pages)}
+    p = form_pdf_path(app, form)
+    if p is None:
+        raise HTTPException(404, f"missing PDF at {form_dir(app, form) / 'form.pdf'}")
+
+    pages = derived_json(form_pdf_hash(app, form), "text.json", p)
+    return FastJSONResponse({"pages": pages, "chars": sum(len(t) for t in pages)})
 
 
 
@@ -434,9 +268,9 @@ def download_acroform_pdf(app: str, form: str, inline: bool = False):
     p = form_dir(app, form) / "form_acroform.pdf"
     if not p.exists():
         # Fall back to regular PDF if AcroForm doesn't exist
-        p = form_dir(app, form) / "form.pdf"
-        if not p.exists():
-            raise HTTPException(404, f"missing PDF at {p}")
+        p = form_pdf_path(app, form)
+        if p is None:
+            raise HTTPException(404, f"missing PDF at {form_dir(app, form) / 'form.pdf'}")
     
     disposition = "inline" if inline else "attachment"
     return FileResponse(
@@ -448,81 +282,75 @@ def download_acroform_pdf(app: str, form: str, inline: bool = False):
 
 # --- AcroForm Definition Management ---
 @router.get("/{app}/forms/{form}/acroform-definition")
-def get_acroform_definition(app: str, form: str):
+def get_acroform_definition(app: str, form: str, if_none_match: Optional[str] = Header(None)):
     """Get the AcroForm definition for a form"""
-    p = form_dir(app, form) / "acroform-definition.json"
-    if not p.exists():
-        raise HTTPException(404, f"missing AcroForm definition at {p}")
-    
-    try:
-        definition = json.loads(p.read_text())
-        return definition
-    except Exception as e:
-        raise HTTPException(500, f"error reading AcroForm definition: {e}")
+    snap = _get_template(app, form, "acroform_definition")
+    if snap is None:
+        raise HTTPException(404, f"missing AcroForm definition at {template_store.path(app, form, 'acroform_definition')}")
+    return _template_response(snap, if_none_match)
 
 @router.post("/{app}/forms/{form}/acroform-definition")
-async def save_acroform_definition(app: str, form: str, request: Request):
-    """Save or update the AcroForm definition for a form"""
-    ensure_dir(form_dir(app, form))
-    
+async def save_acroform_definition(app: str, form: str, request: Request, if_match: Optional[str] = Header(None)):
+    """Save or update the AcroForm definition for a form (If-Match: ETag of the version edited)"""
     try:
-        definition = await request.json()
-        
-        # Validate the definition structure
-        if not isinstance(definition, dict):
-            raise HTTPException(400, "definition must be a JSON object")
-        
-        if "fields" not in definition:
-            raise HTTPException(400, "definition must contain 'fields' array")
-        
-        if not isinstance(definition["fields"], list):
-            raise HTTPException(400, "fields must be an array")
-        
-        # Save to file
-        p = form_dir(app, form) / "acroform-definition.json"
-        p.write_text(json.dumps(definition, indent=2))
-        
-        return {
-            "ok": True, 
-            "message": f"AcroForm definition saved for {form}",
-            "fields_count": len(definition["fields"]),
-            "path": str(p.relative_to(ROOT))
-        }
-        
+        definition = loads(await request.body())
+    except ValueError:
+        raise HTTPException(400, "definition must be valid JSON")
+
+    # Validate the definition structure
+    if not isinstance(definition, dict):
+        raise HTTPException(400, "definition must be a JSON object")
+
+    if "fields" not in definition:
+        raise HTTPException(400, "definition must contain 'fields' array")
+
+    if not isinstance(definition["fields"], list):
+        raise HTTPException(400, "fields must be an array")
+
+    try:
+        snap = await aio.run(_save_template, app, form, "acroform_definition", definition, if_match)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"error saving AcroForm definition: {e}")
 
+    return JSONResponse({
+        "ok": True,
+        "message": f"AcroForm definition saved for {form}",
+        "fields_count": snap.fields,
+        "version": snap.version,
+        "etag": snap.etag,
+        "path": str(template_store.path(app, form, "acroform_definition").relative_to(ROOT))
+    }, headers={"ETag": snap.etag})
+
 @router.delete("/{app}/forms/{form}/acroform-definition")
-def delete_acroform_definition(app: str, form: str):
+def delete_acroform_definition(app: str, form: str, if_match: Optional[str] = Header(None)):
     """Delete the AcroForm definition for a form"""
-    p = form_dir(app, form) / "acroform-definition.json"
-    if not p.exists():
-        raise HTTPException(404, f"missing AcroForm definition at {p}")
-    
+    p = template_store.path(app, form, "acroform_definition")
     try:
-        p.unlink()
-        return {"ok": True, "message": f"AcroForm definition deleted for {form}"}
+        deleted = template_store.delete(app, form, "acroform_definition", if_match=if_match)
+    except TemplateConflict as e:
+        raise HTTPException(412, f"AcroForm definition {e}")
     except Exception as e:
         raise HTTPException(500, f"error deleting AcroForm definition: {e}")
+    if not deleted:
+        raise HTTPException(404, f"missing AcroForm definition at {p}")
+    form_index.refresh(app)
+    return {"ok": True, "message": f"AcroForm definition deleted for {form}"}
 
 @router.get("/{app}/forms/{form}/acroform-fields")
 def get_pdf_acroform_fields(app: str, form: str):
     """Extract existing AcroForm fields from a PDF"""
-    pdf_path = form_dir(app, form) / "form.pdf"
-    if not pdf_path.exists():
-        raise HTTPException(404, f"missing PDF at {pdf_path}")
+    pdf_path = form_pdf_path(app, form)
+    if pdf_path is None:
+        raise HTTPException(404, f"missing PDF at {form_dir(app, form) / 'form.pdf'}")
     
     try:
-        from overlay.acroform_handler import AcroFormHandler
-        
-        # Read the PDF and extract existing AcroForm fields
-        pdf_bytes = pdf_path.read_bytes()
-        handler = AcroFormHandler(pdf_bytes)
+        # Extract existing AcroForm fields once per distinct PDF
+        sha = form_pdf_blob(app, form)
+        existing_fields = blob_store.derived_json(sha, "acroform-fields.json", lambda: _blob_acroform_fields(sha))
         
-        # Get existing fields from the PDF
-        existing_fields = handler.get_existing_fields()
-        
-        return existing_fields or []
+        return FastJSONResponse(existing_fields or [])
         
     except Exception as e:
         # If we can't extract fields, return empty array
@@ -531,76 +359,74 @@ def get_pdf_acroform_fields(app: str, form: str):
 
 # --- Filling ---
 @router.post("/{app}/forms/{form}/fill")
-async def fill_from_stored_pdf(app: str, form: str, answers_json: str = Form(...)):
-    pdf_path = form_dir(app, form) / "form.pdf"
-    tpl_path = form_dir(app, form) / "overlay.json"
-    acroform_path = form_dir(app, form) / "acroform-definition.json"
-
-    if not pdf_path.exists():
-        raise HTTPException(404, f"missing PDF at {pdf_path}")
+async def fill_from_stored_pdf(app: str, form: str, request: Request, answers_json: str = Form(...)):
+    # PDF workers read the form from its blob's mapping: pass the hash, not a copy
+    sha = await aio.run(form_pdf_blob, app, form)
+    if sha is None:
+        raise HTTPException(404, f"missing PDF at {form_dir(app, form) / 'form.pdf'}")
 
     try:
-        answers: Dict[str, Any] = json.loads(answers_json)
-    except Exception:
+        answers: Dict[str, Any] = loads(answers_json)
+    except ValueError:
         raise HTTPException(400, "answers_json must be valid JSON")
+    if not isinstance(answers, dict):
+        raise HTTPException(400, "answers_json must be a JSON object")
+    answers.update(await signature_answers(request))
 
-    pdf_bytes = pdf_path.read_bytes()
+    from server.fill_plans import fill_acroform_blob, fill_blob
+    headers = {"Content-Disposition": f'attachment; filename="{app}_{form}_filled.pdf"'}
     
-    # Check if we have AcroForm definition first (new system)
-    if acroform_path.exists():
+    # Check if we have AcroForm definition first (new system). The template
+    # store stats the file, so a template saved by another worker is seen now
+    try:
+        acroform = await aio.run(template_store.get, app, form, "acroform_definition")
+    except ValueError:
+        acroform = None  # unreadable: fill with the overlay
+    if acroform is not None:
         try:
-            from overlay.acroform_handler import fill_acroform_pdf_bytes
             print(f"Using AcroForm filling for {form}")
-            filled = fill_acroform_pdf_bytes(pdf_bytes, answers)
-            return StreamingResponse(
-                io.BytesIO(filled),
-                media_type="application/pdf",
-                headers={"Content-Disposition": f'attachment; filename="{app}_{form}_filled.pdf"'},
-            )
+            filled = await aio.run_cpu(fill_acroform_blob, sha, answers)
+            return Response(filled, media_type="application/pdf", headers=headers)
         except Exception as e:
             print(f"AcroForm filling failed: {e}")
             # Fall through to overlay method
     
     # Fall back to overlay method (old system)
-    if not tpl_path.exists():
-        raise HTTPException(404, f"missing overlay at {tpl_path} and no AcroForm definition found")
-
-    overlay = json.loads(tpl_path.read_text())
+    tpl = await aio.run(_get_template, app, form, "overlay")
+    if tpl is None:
+        raise HTTPException(404, f"missing overlay at {template_store.path(app, form, 'overlay')} and no AcroForm definition found")
+    overlay = tpl.model  # validated when the snapshot was loaded
     
     # Try AcroForm filling first, fall back to overlay if not available
     try:
-        from overlay.acroform_handler import fill_acroform_pdf_bytes
-        filled = fill_acroform_pdf_bytes(pdf_bytes, answers)
+        filled = await aio.run_cpu(fill_acroform_blob, sha, answers)
     except Exception as e:
         # Fall back to original overlay method
         print(f"AcroForm filling failed, falling back to overlay: {e}")
-        filled = fill_pdf_overlay_bytes(pdf_bytes, overlay, answers)
+        filled = await aio.run_cpu(fill_blob, sha, str(blob_store.path(sha)), overlay, answers)
 
-    return StreamingResponse(
-        io.BytesIO(filled),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{app}_{form}_filled.pdf"'},
-    )
+    # One body message; StreamingResponse over BytesIO sent the PDF line by line
+    return Response(filled, media_type="application/pdf", headers=headers)
 
 # --- Mapper helpers (preview) ---
 @router.get("/{app}/forms/{form}/page-metrics")
 def app_page_metrics(app: str, form: str, page: int = 0, dpi: int = 144):
     if not MAPPER_ENABLED:
         raise HTTPException(404, "mapper disabled")
-    pdf_path = form_dir(app, form) / "form.pdf"
-    if not pdf_path.exists():
-        raise HTTPException(404, f"missing PDF at {pdf_path}")
-    doc = fitz.open(pdf_path)
-    try:
-        pg = doc[page]
-    except Exception:
+    pdf_path = form_pdf_path(app, form)
+    if pdf_path is None:
+        raise HTTPException(404, f"missing PDF at {form_dir(app, form) / 'form.pdf'}")
+
+    sizes = derived_json(form_pdf_hash(app, form), "page-sizes.json", pdf_path)
+    if not 0 <= page < len(sizes):
         raise HTTPException(400, f"invalid page {page}")
+    width, height = sizes[page]
     return {
-        "pages": len(doc),
-        "pointsWidth": pg.rect.width,
-        "pointsHeight": pg.rect.height,
-        "pixelWidth": int(pg.rect.width / 72 * dpi),
-        "pixelHeight": int(pg.rect.height / 72 * dpi),
+        "pages": len(sizes),
+        "pointsWidth": width,
+        "pointsHeight": height,
+        "pixelWidth": int(width / 72 * dpi),
+        "pixelHeight": int(height / 72 * dpi),
         "dpi": dpi,
     }
 
@@ -608,14 +434,22 @@ def app_page_metrics(app: str, form: str, page: int = 0, dpi: int = 144):
 def app_preview_page(app: str, form: str, page: int = 0, dpi: int = 144):
     if not MAPPER_ENABLED:
         raise HTTPException(404, "mapper disabled")
-    pdf_path = form_dir(app, form) / "form.pdf"
-    if not pdf_path.exists():
-        raise HTTPException(404, f"missing PDF at {pdf_path}")
-    doc = fitz.open(pdf_path)
-    try:
-        pg = doc[page]
-    except Exception:
-        raise HTTPException(400, f"invalid page {page}")
-    pix = pg.get_pixmap(dpi=dpi, alpha=False)
-    return Response(pix.tobytes("png"), media_type="image/png")
+    if dpi not in PREVIEW_DPIS:
+        raise HTTPException(400, f"dpi must be one of {', '.join(map(str, PREVIEW_DPIS))}")
+    pdf_path = form_pdf_path(app, form)
+    if pdf_path is None:
+        raise HTTPException(404, f"missing PDF at {form_dir(app, form) / 'form.pdf'}")
+
+    sha = form_pdf_blob(app, form)
+
+    def render():
+        import fitz
+        with fitz.open(stream=blob_store.view(sha), filetype="pdf") as doc:
+            if not 0 <= page < len(doc):
+                raise HTTPException(400, f"invalid page {page}")
+            with metrics.timer("preview.render"):
+                return doc[page].get_pixmap(dpi=dpi, alpha=False).tobytes("png")
+
+    png = blob_store.derived(sha, f"page-{page}@{dpi}.png", render)
+    return Response(png, media_type="image/png")
 
@@ -0,0 +1,142 @@
+"""
+Upload-once PDF blobs for ``/fill-overlay``.
+
+A client that fills the same PDF repeatedly hashes it locally, asks
+``HEAD /blobs/{sha}`` whether the server has it, uploads it once with
+``POST /blobs`` if not, and then fills with ``pdf_sha`` instead of a file.
+Blobs are the blob store's content-addressed files, so a form's own PDF is
+already known under its hash.
+
+``POST /blobs`` needs no login, so each client (the address Caddy puts in
+``X-Forwarded-For``) gets an hourly budget of uploads and bytes, kept per
+worker process; past it the upload is refused with ``429`` and not stored.
+The byte budget must also have room for the request's ``Content-Length``
+(the body is already received when the budget is checked); a chunked body
+declares no length, so it can overshoot by up to ``UPLOAD_MAX_BYTES`` once.
+"""
+
+import os
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import FileResponse, JSONResponse
+
+from server import aio
+from server.blob_store import blob_store
+from server.uploads import UploadRejected, store_blob, warm_derived
+
+BLOB_UPLOADS_PER_HOUR = int(os.getenv("BLOB_UPLOADS_PER_HOUR", "60"))
+BLOB_UPLOAD_MB_PER_HOUR = float(os.getenv("BLOB_UPLOAD_MB_PER_HOUR", "500"))
+
+router = APIRouter(tags=["blobs"])
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadBudget:
+    """Uploads and bytes per client over a sliding window."""
+
+    MAX_CLIENTS = 10000
+
+    def __init__(self, uploads: int = BLOB_UPLOADS_PER_HOUR, max_bytes: float = BLOB_UPLOAD_MB_PER_HOUR * 2**20,
+                 window: float = 3600.0, clock=time.monotonic):
+        self.uploads = uploads
+        self.max_bytes = max_bytes
+        self.window = window
+        self.clock = clock
+        self._clients: Dict[str, Deque[Tuple[float, int]]] = {}
+        self.stats = {"charged": 0, "refused": 0}
+
+    def _recent(self, client: str, now: float) -> Deque[Tuple[float, int]]:
+        entries = self._clients.setdefault(client, deque())
+        while entries and entries[0][0] <= now - self.window:
+            entries.popleft()
+        return entries
+
+    def retry_after(self, client: str, size: int = 0) -> Optional[float]:
+        """Seconds until ``client`` may upload ``size`` more bytes, or None if it may now."""
+        now = self.clock()
+        entries = self._recent(client, now)
+        used = sum(n for _, n in entries)
+        if len(entries) < self.uploads and used < self.max_bytes and used + min(size, self.max_bytes) <= self.max_bytes:
+            return None
+        self.stats["refused"] += 1
+        return max(1.0, entries[0][0] + self.window - now)
+
+    def charge(self, client: str, size: int):
+        now = self.clock()
+        self._recent(client, now).append((now, size))
+        self.stats["charged"] += 1
+        if len(self._clients) > self.MAX_CLIENTS:
+            for key in [k for k, v in self._clients.items() if not v or v[-1][0] <= now - self.window]:
+                del self._clients[key]
+
+
+upload_budget = UploadBudget()
+
+
+def client_address(request: Request) -> str:
+    # Caddy sets X-Forwarded-For to the address it received the request from
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def check_sha(sha: str) -> str:
+    sha = sha.strip().lower()
+    if not _SHA256.match(sha):
+        raise HTTPException(400, "expected a hex sha256")
+    return sha
+
+
+@router.api_route("/blobs/{sha}", methods=["GET", "HEAD"])
+async def get_blob(sha: str):
+    sha = check_sha(sha)
+    if not await aio.run(blob_store.exists, sha):
+        raise HTTPException(404, f"unknown blob {sha}; upload it with POST /blobs")
+    return FileResponse(
+        path=str(blob_store.path(sha)),
+        media_type="application/pdf",
+        headers={"ETag": f'"{sha}"', "Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+
+def _declared_length(request: Request) -> int:
+    try:
+        return max(0, int(request.headers.get("content-length", "0")))
+    except ValueError:
+        return 0
+
+
+async def _within_budget(request: Request) -> str:
+    client = client_address(request)
+    wait = upload_budget.retry_after(client, _declared_length(request))
+    if wait is not None:
+        raise HTTPException(429, "upload budget exceeded; HEAD /blobs/{sha} before uploading",
+                            headers={"Retry-After": str(int(wait + 0.999))})
+    return client
+
+
+@router.post("/blobs")
+async def upload_blob(background: BackgroundTasks, client: str = Depends(_within_budget),
+                      file: UploadFile = File(...), sha256: str = Form(None)):
+    try:
+        spooled, new = await aio.run(store_blob, file.file)
+    except UploadRejected as e:
+        raise HTTPException(e.status, str(e))
+    upload_budget.charge(client, spooled.size)
+    if sha256 is not None and check_sha(sha256) != spooled.sha256:
+        # Stored anyway (it is a valid PDF), but the client hashed something else
+        raise HTTPException(400, f"sha256 mismatch: received {spooled.sha256}")
+    if new:
+        background.add_task(warm_derived, spooled.sha256)
+    return JSONResponse(
+        {"sha256": spooled.sha256, "bytes": spooled.size, "pages": spooled.pages, "new": new},
+        status_code=201 if new else 200,
+        headers={"Location": f"/blobs/{spooled.sha256}"},
+        background=background,
+    )
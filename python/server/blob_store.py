@@ -0,0 +1,415 @@
+"""
+Content-addressed PDF storage.
+
+Every PDF is stored once under ``data/blobs/<aa>/<sha256>`` (read-only). A
+form's ``form.pdf`` is its own file, a copy-on-write clone of the blob where
+the filesystem supports it (btrfs, XFS) and a plain copy elsewhere, and
+``form.pdf.sha256`` records the digest and the ``(inode, mtime, size)`` of the
+``form.pdf`` it describes. Readers go through the pointer to the blob while
+that stamp still matches, so a blob is never mapped through a file that
+something else may write in place. Everything derived from a PDF (page
+renders, text, page sizes, detected fields, prepared fill PDFs) is cached
+under ``data/derived/<aa>/<sha256>/`` so it is computed once per distinct
+PDF, and read through ``SharedCache`` mappings that every process shares.
+
+Write form PDFs with ``store_form_pdf``. A ``form.pdf`` changed any other way
+no longer matches its pointer and is re-hashed.
+
+    cd python && python -m server.blob_store report   # dedup savings
+    cd python && python -m server.blob_store migrate  # adopt existing form.pdf copies
+    cd python && python -m server.blob_store gc       # drop unreferenced blobs and caches
+
+Clients can also upload a PDF by itself (``POST /blobs``) and fill it by
+hash; such blobs have no form and are kept while used within
+``BLOB_GC_GRACE_SECONDS``. Once blobs take more than ``BLOB_CACHE_MAX_BYTES``
+the least recently used unreferenced ones are evicted (``trim``).
+"""
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from server import json_codec
+from server.paths import APPS, DATA, form_dir, ensure_dir
+from server.shared_cache import SharedCache, atomic_write, open_mapped
+
+BLOBS = Path(os.getenv("BLOB_STORE_PATH", str(DATA / "blobs")))
+DERIVED = Path(os.getenv("DERIVED_CACHE_PATH", str(DATA / "derived")))
+CHUNK = 1 << 20
+HASH_MEMO_ENTRIES = 4096
+FICLONE = 0x40049409  # linux/fs.h: share the source's extents (copy-on-write)
+POINTER_SUFFIX = ".sha256"
+GC_GRACE_SECONDS = float(os.getenv("BLOB_GC_GRACE_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", str(10 * 2**30)))
+
+
+def _tmp_name(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _stamp(st: os.stat_result) -> Tuple[int, int, int]:
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def clone_file(src: Path, dst: Path) -> bool:
+    """Copy ``src`` to a new file ``dst``: a reflink where the filesystem
+    supports it (True), else a byte copy (False)."""
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            return True
+        except OSError:
+            shutil.copyfileobj(s, d, CHUNK)
+            return False
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BlobStore:
+    def __init__(self, root: Path = BLOBS, derived_root: Path = DERIVED, max_bytes: int = CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.derived_root = Path(derived_root)
+        self.max_bytes = max_bytes
+        self.cache = SharedCache(self.derived_root / ".epoch")
+        self.stats = {"derived_hits": 0, "derived_misses": 0, "clones": 0, "copies": 0}
+        self._hashed: "OrderedDict[tuple, str]" = OrderedDict()
+        self._hashed_lock = threading.Lock()
+
+    # --- blobs ---
+    def path(self, sha: str) -> Path:
+        return self.root / sha[:2] / sha
+
+    def exists(self, sha: str) -> bool:
+        return self.path(sha).exists()
+
+    def view(self, sha: str) -> Optional[memoryview]:
+        """Blob ``sha`` mapped read-only, or None if it is not stored. The mapping
+        is shared by every request and process (page cache): open it with PyMuPDF
+        (``fitz.open(stream=view)``) or send it as a body, without a copy."""
+        return self.cache.view(self.path(sha))
+
+    def open(self, sha: str) -> mmap.mmap:
+        """Blob ``sha`` as a read-only file with its own position, for stream
+        readers (PyPDF2). Raises FileNotFoundError if it is not stored."""
+        return open_mapped(self.path(sha))
+
+    def put_bytes(self, data: bytes) -> str:
+        """Store ``data`` (no-op if already present) and return its sha256."""
+        sha = hashlib.sha256(data).hexdigest()
+        dest = self.path(sha)
+        if not dest.exists():
+            ensure_dir(dest.parent)
+            tmp = _tmp_name(dest)
+            tmp.write_bytes(data)
+            os.chmod(tmp, 0o444)
+            os.replace(tmp, dest)
+        return sha
+
+    def put_file(self, src: Path, sha: Optional[str] = None, link: bool = False) -> str:
+        """Store a copy of an existing file. With ``link`` (a temporary file the
+        caller discards) it is hardlinked instead; never link a form's file."""
+        sha = sha or file_sha256(src)
+        dest = self.path(sha)
+        if not dest.exists():
+            ensure_dir(dest.parent)
+            tmp = _tmp_name(dest)
+            try:
+                if not link:
+                    raise OSError
+                os.link(src, tmp)
+            except OSError:
+                clone_file(src, tmp)
+            os.chmod(tmp, 0o444)
+            os.replace(tmp, dest)
+        return sha
+
+    def link(self, sha: str, dest: Path):
+        """Make ``dest`` a copy of blob ``sha`` (a reflink where possible; never
+        the blob's own inode) and point it at the blob."""
+        blob = self.path(sha)
+        ensure_dir(dest.parent)
+        try:
+            st = os.stat(dest)
+        except FileNotFoundError:
+            st = None
+        if st is not None and self._linked(dest, st) == sha:
+            return
+        if st is None or os.path.samestat(st, os.stat(blob)) or self.hash_of(dest) != sha:
+            tmp = _tmp_name(dest)
+            try:
+                self.stats["clones" if clone_file(blob, tmp) else "copies"] += 1
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, dest)
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                raise
+            st = os.stat(dest)
+        atomic_write(dest.with_name(dest.name + POINTER_SUFFIX), " ".join(map(str, (sha, *_stamp(st)))).encode())
+
+    # --- forms ---
+    def resolve(self, pdf_path: Path) -> Optional[Path]:
+        """The file to read for ``pdf_path``: its blob while the pointer still
+        describes ``pdf_path`` (or it is gone), else ``pdf_path`` itself."""
+        try:
+            st = os.stat(pdf_path)
+        except FileNotFoundError:
+            sha = self._pointer(pdf_path)
+            return self.path(sha) if sha and self.exists(sha) else None
+        sha = self._linked(pdf_path, st)
+        if sha and self.exists(sha):
+            return self.path(sha)
+        return pdf_path
+
+    def _read_pointer(self, pdf_path: Path) -> Tuple[Optional[str], Optional[Tuple[int, ...]]]:
+        """``(sha, stamp)`` from the pointer file; stamp is None for pointers
+        written before it was recorded."""
+        try:
+            parts = pdf_path.with_name(pdf_path.name + POINTER_SUFFIX).read_text().split()
+        except OSError:
+            return None, None
+        if not parts:
+            return None, None
+        try:
+            stamp = tuple(int(v) for v in parts[1:4]) if len(parts) == 4 else None
+        except ValueError:
+            stamp = None
+        return parts[0], stamp
+
+    def _pointer(self, pdf_path: Path) -> Optional[str]:
+        return self._read_pointer(pdf_path)[0]
+
+    def _linked(self, pdf_path: Path, st: os.stat_result) -> Optional[str]:
+        """The pointer's hash if it was written for exactly this file."""
+        sha, stamp = self._read_pointer(pdf_path)
+        return sha if sha and stamp == _stamp(st) else None
+
+    def hash_of(self, pdf_path: Path) -> Optional[str]:
+        """sha256 of a form PDF; changes nothing. Trusts the pointer only while
+        ``pdf_path`` has the inode, mtime and size it records; a file changed
+        out of band is hashed (once per stamp) until it is adopted."""
+        try:
+            st = os.stat(pdf_path)
+        except FileNotFoundError:
+            sha = self._pointer(pdf_path)
+            return sha if sha and self.exists(sha) else None
+        sha = self._linked(pdf_path, st)
+        if sha:
+            return sha
+        key = (st.st_dev, *_stamp(st))
+        with self._hashed_lock:
+            sha = self._hashed.get(key)
+            if sha is not None:
+                self._hashed.move_to_end(key)
+                return sha
+        sha = file_sha256(pdf_path)
+        with self._hashed_lock:
+            self._hashed[key] = sha
+            while len(self._hashed) > HASH_MEMO_ENTRIES:
+                self._hashed.popitem(last=False)
+        return sha
+
+    def adopt(self, pdf_path: Path) -> Optional[str]:
+        """Store a form PDF written out of band and link ``pdf_path`` to it;
+        returns its sha256 (None if the form has no PDF)."""
+        sha = self.hash_of(pdf_path)
+        if sha and pdf_path.exists():
+            self.put_file(pdf_path, sha)
+            self.link(sha, pdf_path)
+        return sha
+
+    # --- derived caches ---
+    def derived_dir(self, sha: str) -> Path:
+        return self.derived_root / sha[:2] / sha
+
+    def derived(self, sha: str, name: str, compute: Callable[[], bytes]) -> memoryview:
+        """Cached artifact ``name`` for blob ``sha``, computed once per host.
+        A read-only view of the shared mapping: pass it on, do not keep it."""
+        p = self.derived_dir(sha) / name
+        view = self.cache.view(p)
+        if view is not None:
+            self.stats["derived_hits"] += 1
+            return view
+        self.stats["derived_misses"] += 1
+        return self.cache.get(p, compute)
+
+    def derived_json(self, sha: str, name: str, compute: Callable[[], Any]) -> Any:
+        return json_codec.loads(self.derived(sha, name, lambda: json_codec.dumps(compute())))
+
+    def invalidate_derived(self, sha: str):
+        shutil.rmtree(self.derived_dir(sha), ignore_errors=True)
+        self.cache.invalidate()
+
+    def release(self, sha: str, referenced: Optional[Set[str]] = None) -> bool:
+        """Drop blob ``sha`` and its derived caches if no form refers to it any more.
+        Pass ``referenced()`` when releasing several blobs, to scan the forms once."""
+        blob = self.path(sha)
+        try:
+            if blob.stat().st_nlink > 1:  # a form hardlinked before ``migrate``, or a spool in flight
+                return False
+        except FileNotFoundError:
+            self.invalidate_derived(sha)
+            return True
+        if sha in (self.referenced() if referenced is None else referenced):
+            return False
+        blob.unlink(missing_ok=True)
+        self.invalidate_derived(sha)
+        return True
+
+    # --- maintenance ---
+    def _blob_files(self):
+        if not self.root.exists():
+            return []
+        return [p for p in self.root.glob("*/*") if p.is_file() and not p.name.startswith(".")]
+
+    def _form_pdfs(self):
+        if not APPS.exists():
+            return []
+        paths = set(APPS.glob("*/forms/*/form.pdf"))
+        paths.update(p.with_name("form.pdf") for p in APPS.glob(f"*/forms/*/form.pdf{POINTER_SUFFIX}"))
+        return sorted(paths)
+
+    def referenced(self) -> Set[str]:
+        """Hashes that some form's pointer names."""
+        return {sha for sha in map(self._pointer, self._form_pdfs()) if sha}
+
+    def migrate(self) -> Dict[str, int]:
+        """Adopt every existing form.pdf into the store."""
+        adopted = 0
+        for pdf in self._form_pdfs():
+            if self.adopt(pdf):
+                adopted += 1
+        return {"forms": adopted, "blobs": len(self._blob_files())}
+
+    def report(self) -> Dict[str, Any]:
+        """Logical vs physical bytes for all forms, and the shared blobs."""
+        refs: Dict[str, list] = {}
+        logical = 0
+        unmanaged = 0
+        for pdf in self._form_pdfs():
+            form = f"{pdf.parts[-4]}/{pdf.parts[-2]}"
+            sha = self._pointer(pdf)
+            if not sha or not self.exists(sha):
+                unmanaged += 1
+                continue
+            refs.setdefault(sha, []).append(form)
+            logical += self.path(sha).stat().st_size
+        physical = sum(self.path(sha).stat().st_size for sha in refs)
+        derived_bytes = sum(p.stat().st_size for p in self.derived_root.rglob("*") if p.is_file()) if self.derived_root.exists() else 0
+        return {
+            "forms": sum(len(v) for v in refs.values()),
+            "unmanaged_forms": unmanaged,
+            "blobs": len(refs),
+            "logical_bytes": logical,
+            "physical_bytes": physical,
+            "saved_bytes": logical - physical,
+            "dedup_ratio": round(logical / physical, 3) if physical else None,
+            "derived_bytes": derived_bytes,
+            "shared": {sha: forms for sha, forms in refs.items() if len(forms) > 1},
+            "stats": dict(self.stats),
+        }
+
+    def touch(self, sha: str):
+        """Mark blob ``sha`` as used now (keeps unreferenced uploads alive through ``gc``)."""
+        os.utime(self.path(sha))
+
+    def gc(self, grace: float = GC_GRACE_SECONDS) -> Dict[str, int]:
+        """Remove blobs no form points at, with their derived caches. Blobs
+        uploaded or used by fills within ``grace`` seconds are kept."""
+        referenced = self.referenced()
+        cutoff = time.time() - grace
+        removed = 0
+        for blob in self._blob_files():
+            if blob.name not in referenced and blob.stat().st_mtime < cutoff:
+                blob.unlink(missing_ok=True)
+                self.invalidate_derived(blob.name)
+                removed += 1
+        return {"removed_blobs": removed}
+
+    def trim(self, max_bytes: Optional[int] = None, keep: Set[str] = frozenset()) -> Dict[str, int]:
+        """Evict unreferenced blobs, least recently used first (the mtime ``touch``
+        keeps), with their derived caches, until all blobs fit in ``max_bytes``.
+        Blobs a form points at, and those in ``keep``, are never evicted."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        blobs = []
+        for blob in self._blob_files():
+            try:
+                blobs.append((blob.stat(), blob))
+            except FileNotFoundError:
+                continue
+        total = sum(st.st_size for st, _ in blobs)
+        removed = 0
+        if max_bytes <= 0 or total <= max_bytes:
+            return {"removed_blobs": removed, "bytes": total}
+        referenced = self.referenced() | set(keep)
+        for st, blob in sorted(blobs, key=lambda b: b[0].st_mtime):
+            if total <= max_bytes:
+                break
+            if blob.name in referenced or st.st_nlink > 1:
+                continue
+            blob.unlink(missing_ok=True)
+            self.invalidate_derived(blob.name)
+            total -= st.st_size
+            removed += 1
+        return {"removed_blobs": removed, "bytes": total}
+
+
+blob_store = BlobStore()
+
+
+def store_form_pdf(app: str, form: str, data: bytes) -> str:
+    """Store a form's PDF by content and link ``form.pdf`` to it; returns the sha256."""
+    sha = blob_store.put_bytes(data)
+    blob_store.link(sha, form_dir(app, form) / "form.pdf")
+    return sha
+
+
+def form_pdf_path(app: str, form: str) -> Optional[Path]:
+    """Readable path of a form's PDF, or None if the form has no PDF."""
+    return blob_store.resolve(form_dir(app, form) / "form.pdf")
+
+
+def form_pdf_hash(app: str, form: str) -> Optional[str]:
+    return blob_store.hash_of(form_dir(app, form) / "form.pdf")
+
+
+def form_pdf_blob(app: str, form: str) -> Optional[str]:
+    """sha256 of a form's PDF, with the PDF present in the store so it can be
+    read by hash (``view``, ``open``, PDF workers). A form written out of band
+    has its content stored; its own files are left alone."""
+    pdf_path = form_dir(app, form) / "form.pdf"
+    sha = blob_store.hash_of(pdf_path)
+    if sha and not blob_store.exists(sha):
+        blob_store.put_file(pdf_path, sha)
+    return sha
+
+
+def form_pdf_view(app: str, form: str) -> Optional[memoryview]:
+    """A form's PDF mapped read-only (``BlobStore.view``), or None if it has none."""
+    sha = form_pdf_blob(app, form)
+    return blob_store.view(sha) if sha else None
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+    if command == "migrate":
+        print(json.dumps(blob_store.migrate(), indent=2))
+    elif command == "gc":
+        print(json.dumps(blob_store.gc(), indent=2))
+    else:
+        print(json.dumps(blob_store.report(), indent=2))
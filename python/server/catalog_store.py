@@ -0,0 +1,380 @@
+"""
+County catalog store.
+
+Single source of truth for the county list, replacing read-modify-write of
+``data/manifest.json``. Counties live in an embedded SQLite database (WAL
+mode) indexed by id; every upsert/delete is one transaction that bumps a
+global change version and re-exports ``manifest.json`` as a snapshot, so the
+file stays available to tooling that reads it directly.
+
+The manifest can still be edited by hand or by scripts
+(``scripts/clear-all-counties.mjs`` resets it to ``[]``). The database
+records the (inode, mtime, size) of the last export; when the file no longer
+matches, it was changed outside the store and is imported again (counties it
+no longer lists are deleted) before the next read or write.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from server import json_codec
+from server.paths import DATA
+
+MANIFEST = DATA / "manifest.json"
+
+log = logging.getLogger(__name__)
+
+# Columns kept alongside the JSON document so summaries never parse it
+SUMMARY_COLUMNS = ("id", "title", "status", "rootDomain", "stepCount", "pdfStepCount", "version", "updatedAt")
+_COLUMN_SQL = {
+    "id": "id", "title": "title", "status": "status", "rootDomain": "root_domain",
+    "stepCount": "step_count", "pdfStepCount": "pdf_step_count", "version": "version", "updatedAt": "updated_at",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counties (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    status TEXT,
+    root_domain TEXT,
+    step_count INTEGER NOT NULL DEFAULT 0,
+    pdf_step_count INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    version INTEGER PRIMARY KEY,
+    county_id TEXT NOT NULL,
+    op TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class CatalogSnapshot:
+    """
+    Immutable, parsed view of the catalog at one version. Summary columns are
+    loaded eagerly; county documents are parsed on first use. Serialized
+    response bodies are memoised per query, so repeated reads of an unchanged
+    catalog cost a dict lookup.
+    """
+
+    MAX_BODIES = 64
+
+    def __init__(self, version: int, rows: List[sqlite3.Row]):
+        self.version = version
+        self.summaries: Tuple[Dict[str, Any], ...] = tuple(
+            {f: r[_COLUMN_SQL[f]] for f in SUMMARY_COLUMNS} for r in rows
+        )
+        self._raw = [r["data"] for r in rows]
+        self._documents: Optional[Tuple[Dict[str, Any], ...]] = None
+        self._bodies: "OrderedDict[Any, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.summaries)
+
+    @property
+    def documents(self) -> Tuple[Dict[str, Any], ...]:
+        if self._documents is None:
+            with self._lock:
+                if self._documents is None:
+                    self._documents = tuple(json_codec.loads(d) for d in self._raw)
+                    self._raw = None
+        return self._documents
+
+    def select(self, fields: Optional[Iterable[str]] = None, limit: Optional[int] = None,
+               offset: int = 0) -> List[Dict[str, Any]]:
+        """Same projection rules as ``CatalogStore.list``, without touching SQLite."""
+        fields = list(fields) if fields else None
+        end = None if limit is None else offset + limit
+        if fields and all(f in _COLUMN_SQL for f in fields):
+            return [{f: s[f] for f in fields} for s in self.summaries[offset:end]]
+        docs = self.documents[offset:end]
+        if fields:
+            return [{f: c.get(f) for f in fields} for c in docs]
+        return list(docs)
+
+    def etag(self, *query: Any) -> str:
+        """Strong validator for a response built from this snapshot and ``query``."""
+        digest = hashlib.sha1(json.dumps(query, default=str).encode()).hexdigest()[:12]
+        return f'"catalog-{self.version}-{digest}"'
+
+    def body(self, key: Any, build) -> bytes:
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+                return body
+        body = build()
+        with self._lock:
+            self._bodies[key] = body
+            while len(self._bodies) > self.MAX_BODIES:
+                self._bodies.popitem(last=False)
+        return body
+
+
+class CatalogStore:
+    def __init__(self, db_path: Path, manifest_path: Optional[Path] = MANIFEST):
+        self.db_path = Path(db_path)
+        self.manifest_path = manifest_path
+        self._local = threading.local()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._snapshot_lock = threading.Lock()
+        self._manifest_seen: Optional[Tuple[int, int, int]] = None
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._bootstrap()
+
+    # --- connections ---
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _meta(self, conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_meta(self, conn: sqlite3.Connection, key: str, value: int):
+        conn.execute("INSERT INTO meta(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+    def _bootstrap(self):
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._meta(conn, "initialized") == 0:
+                for county in self._read_manifest():
+                    self._upsert(conn, county)
+                self._set_meta(conn, "initialized", 1)
+                self._record_manifest(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _read_manifest(self) -> List[Dict[str, Any]]:
+        """Accepts both historical shapes: a list, or {"counties": [...]}."""
+        if not self.manifest_path or not self.manifest_path.exists():
+            return []
+        data = json.loads(self.manifest_path.read_text())
+        if isinstance(data, dict):
+            data = data.get("counties", [])
+        return [c for c in data if isinstance(c, dict) and c.get("id")]
+
+    # --- outside edits of manifest.json ---
+    def _manifest_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.manifest_path)
+        except (OSError, TypeError):
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _record_manifest(self, conn: sqlite3.Connection):
+        stamp = self._manifest_stamp()
+        if stamp is not None:
+            for key, value in zip(("manifest_ino", "manifest_mtime_ns", "manifest_size"), stamp):
+                self._set_meta(conn, key, value)
+        self._manifest_seen = stamp
+
+    def _import_if_edited(self, conn: sqlite3.Connection):
+        """In a write transaction: import ``manifest.json`` if it changed since
+        the last export. A missing or unreadable file is left alone."""
+        stamp = self._manifest_stamp()
+        exported = tuple(self._meta(conn, k) for k in ("manifest_ino", "manifest_mtime_ns", "manifest_size"))
+        if stamp is None or stamp == exported:
+            self._manifest_seen = stamp
+            return
+        try:
+            counties = self._read_manifest()
+        except ValueError as e:
+            log.warning("catalog: not importing edited %s: %s", self.manifest_path, e)
+            self._manifest_seen = stamp  # retried once the file changes again
+            return
+        listed = {c["id"] for c in counties}
+        stored = {r[0]: r[1] for r in conn.execute("SELECT id, data FROM counties")}
+        for county in counties:
+            if stored.get(county["id"]) != json.dumps(county, default=str):
+                self._upsert(conn, county)
+        for county_id in stored.keys() - listed:
+            self._delete(conn, county_id)
+        log.info("catalog: imported %d counties from edited %s", len(counties), self.manifest_path)
+        self._record_manifest(conn)
+
+    def _check_manifest(self):
+        """One ``stat`` per call; imports only when the file was changed."""
+        if not self.manifest_path or self._manifest_stamp() in (None, self._manifest_seen):
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._import_if_edited(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # --- writes ---
+    def _upsert(self, conn: sqlite3.Connection, county: Dict[str, Any]) -> int:
+        version = self._meta(conn, "version") + 1
+        steps = county.get("steps") if isinstance(county.get("steps"), list) else []
+        existed = conn.execute("SELECT 1 FROM counties WHERE id = ?", (county["id"],)).fetchone() is not None
+        conn.execute(
+            """INSERT INTO counties(id, title, status, root_domain, step_count, pdf_step_count, data, version, updated_at)
+               VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(id) DO UPDATE SET title = excluded.title, status = excluded.status,
+                   root_domain = excluded.root_domain, step_count = excluded.step_count,
+                   pdf_step_count = excluded.pdf_step_count, data = excluded.data,
+                   version = excluded.version, updated_at = excluded.updated_at""",
+            (
+                county["id"], county.get("title"), county.get("status", "active"), county.get("rootDomain"),
+                len(steps), sum(1 for s in steps if isinstance(s, dict) and s.get("type") == "pdf"),
+                json.dumps(county, default=str), version, time.time(),
+            ),
+        )
+        conn.execute("INSERT INTO changes(version, county_id, op, at) VALUES(?, ?, 'upsert', ?)", (version, county["id"], time.time()))
+        self._set_meta(conn, "version", version)
+        if not existed:
+            self._set_meta(conn, "count", self._meta(conn, "count") + 1)
+        return version
+
+    def _write(self, fn) -> Any:
+        """Run ``fn(conn)`` in one write transaction and re-export the snapshot
+        before committing, so concurrent writers never publish stale files."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.manifest_path:
+                self._import_if_edited(conn)
+            result = fn(conn)
+            self._export(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def upsert(self, county: Dict[str, Any]) -> int:
+        """Insert or replace a county; returns the new catalog version."""
+        if not county.get("id"):
+            raise ValueError("county must have an id")
+        return self._write(lambda conn: self._upsert(conn, county))
+
+    def _delete(self, conn: sqlite3.Connection, county_id: str) -> bool:
+        cur = conn.execute("DELETE FROM counties WHERE id = ?", (county_id,))
+        if cur.rowcount == 0:
+            return False
+        version = self._meta(conn, "version") + 1
+        conn.execute("INSERT INTO changes(version, county_id, op, at) VALUES(?, ?, 'delete', ?)", (version, county_id, time.time()))
+        self._set_meta(conn, "version", version)
+        self._set_meta(conn, "count", self._meta(conn, "count") - 1)
+        return True
+
+    def delete(self, county_id: str) -> bool:
+        return self._write(lambda conn: self._delete(conn, county_id))
+
+    def _export(self, conn: sqlite3.Connection):
+        if not self.manifest_path:
+            return
+        counties = [json.loads(r[0]) for r in conn.execute("SELECT data FROM counties ORDER BY rowid")]
+        tmp = self.manifest_path.with_name(f".{self.manifest_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(counties, indent=2))
+        os.replace(tmp, self.manifest_path)
+        self._record_manifest(conn)
+
+    # --- reads ---
+    def version(self) -> int:
+        self._check_manifest()
+        return self._meta(self._conn(), "version")
+
+    def count(self) -> int:
+        self._check_manifest()
+        return self._meta(self._conn(), "count")
+
+    def get(self, county_id: str) -> Optional[Dict[str, Any]]:
+        self._check_manifest()
+        row = self._conn().execute("SELECT data FROM counties WHERE id = ?", (county_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self, fields: Optional[Iterable[str]] = None, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Counties in insertion order. ``fields`` projects the result: summary
+        columns are read without touching the JSON documents; any other
+        top-level key is taken from the document.
+        """
+        self._check_manifest()
+        fields = list(fields) if fields else None
+        page = " LIMIT ? OFFSET ?"
+        args = (limit if limit is not None else -1, offset)
+        if fields and all(f in _COLUMN_SQL for f in fields):
+            cols = ", ".join(f"{_COLUMN_SQL[f]} AS \"{f}\"" for f in fields)
+            rows = self._conn().execute(f"SELECT {cols} FROM counties ORDER BY rowid{page}", args)
+            return [dict(r) for r in rows]
+        rows = self._conn().execute(f"SELECT data FROM counties ORDER BY rowid{page}", args)
+        counties = [json.loads(r[0]) for r in rows]
+        if fields:
+            counties = [{f: c.get(f) for f in fields} for c in counties]
+        return counties
+
+    def snapshot(self) -> CatalogSnapshot:
+        """
+        Parsed in-memory snapshot, rebuilt only when the change version moves.
+        Checking is one indexed read of ``meta``, and the version is bumped in
+        the same transaction as every write, so changes made by other workers
+        or processes are picked up on the next call.
+        """
+        version = self.version()
+        snap = self._snapshot
+        if snap is not None and snap.version == version:
+            return snap
+        with self._snapshot_lock:
+            snap = self._snapshot
+            if snap is not None and snap.version == version:
+                return snap
+            conn = self._conn()
+            conn.execute("BEGIN")
+            try:
+                version = self._meta(conn, "version")
+                cols = ", ".join(dict.fromkeys([*_COLUMN_SQL.values(), "data"]))
+                rows = conn.execute(f"SELECT {cols} FROM counties ORDER BY rowid").fetchall()
+            finally:
+                conn.execute("COMMIT")
+            self._snapshot = snap = CatalogSnapshot(version, rows)
+            return snap
+
+    def changes_since(self, version: int) -> List[Dict[str, Any]]:
+        self._check_manifest()
+        rows = self._conn().execute("SELECT version, county_id, op, at FROM changes WHERE version > ? ORDER BY version", (version,))
+        return [{"version": r[0], "id": r[1], "op": r[2], "at": r[3]} for r in rows]
+
+
+_store: Optional[CatalogStore] = None
+_store_lock = threading.Lock()
+
+
+def get_catalog() -> CatalogStore:
+    """Process-wide store, opened on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CatalogStore(Path(os.getenv("CATALOG_DB_PATH", str(DATA / "catalog.db"))))
+    return _store
@@ -0,0 +1,50 @@
+"""
+Fill plans: what an overlay fill of a PDF starts from, shared by every process.
+
+The plan for blob ``sha`` is its PDF with the widgets removed
+(``prepare_pdf``), stored as ``prepared.pdf`` in the blob's derived cache.
+Whichever process fills the PDF first computes it, once per host. After
+that, every uvicorn worker and PDF worker process opens the same shared
+mapping (``SharedCache``). No process keeps a private copy, a new worker
+process starts warm, and repeated fills skip the widget pass.
+
+AcroForm fills read the blob itself from a read-only mapping
+(``BlobStore.open``), so no worker copies the form onto its heap either.
+Callers pass the hash to the pool, not the PDF's bytes.
+
+Run fills in the PDF worker pool:
+
+    out = await aio.run_cpu(fill_blob, sha, str(pdf_path), overlay, answers)
+    out = await aio.run_cpu(fill_acroform_blob, sha, answers)
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Union
+
+from overlay.acroform_handler import create_acroform_from_overlay, fill_acroform_pdf_bytes
+from overlay.fill_overlay import OverlayLike, fill_pdf_overlay_prepared, prepare_pdf
+from server.blob_store import blob_store
+
+PLAN_NAME = "prepared.pdf"
+
+
+def prepared_pdf(sha: str, pdf_path: Union[str, Path]) -> memoryview:
+    """The fill base for blob ``sha`` (stored at ``pdf_path``), mapped."""
+    return blob_store.derived(sha, PLAN_NAME, lambda: prepare_pdf(str(pdf_path)))
+
+
+def fill_blob(sha: str, pdf_path: str, overlay: OverlayLike, answers: Dict[str, Any]) -> bytes:
+    """Overlay-fill the PDF with content hash ``sha``."""
+    return fill_pdf_overlay_prepared(prepared_pdf(sha, pdf_path), overlay, answers)
+
+
+def fill_acroform_blob(sha: str, answers: Dict[str, Any]) -> bytes:
+    """AcroForm-fill the PDF with content hash ``sha``."""
+    with blob_store.open(sha) as pdf:
+        return fill_acroform_pdf_bytes(pdf, answers)
+
+
+def acroform_from_blob(sha: str, overlay: Dict[str, Any]) -> bytes:
+    """``create_acroform_from_overlay`` for the PDF with content hash ``sha``."""
+    with blob_store.open(sha) as pdf:
+        return create_acroform_from_overlay(pdf, overlay)
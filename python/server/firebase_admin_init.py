@@ -1,14 +1,19 @@
 # python/server/firebase_admin_init.py
-import os, json
+import os, json, threading
 from pathlib import Path
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
 
 # Load /python/.env
 load_dotenv(dotenv_path=Path(__file__).resolve().parents[1] / ".env")
 
+_db = None
+_lock = threading.Lock()
+
 def _init_app():
+    # firebase_admin pulls in grpc and google-cloud; import only when first needed
+    import firebase_admin
+    from firebase_admin import credentials
+
     if firebase_admin._apps:
         return firebase_admin.get_app()
 
@@ -20,5 +25,19 @@ def _init_app():
 
     raise RuntimeError("FIREBASE_SERVICE_ACCOUNT_PATH not set")
 
-_init_app()
-db = firestore.client()
+def get_db():
+    """Firestore client, connected on first use (not at import)."""
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                from firebase_admin import firestore
+                _init_app()
+                _db = firestore.client()
+    return _db
+
+def __getattr__(name):
+    # Keeps `from server.firebase_admin_init import db` working, lazily
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,240 @@
+"""
+Firestore access layer for application documents.
+
+Writes are grouped into one ``WriteBatch`` commit (a single round-trip), or
+streamed through a ``BulkWriter`` for many documents. Reads go through a
+read-through cache with a TTL; a snapshot listener on ``applications``
+primes the cache and drops entries as soon as a document changes anywhere.
+
+The client comes from ``server.firebase_admin_init`` unless one is passed in,
+e.g. ``loadtest.fake_firestore.FakeFirestore()`` for offline runs. The
+Firestore emulator works too: set ``FIRESTORE_EMULATOR_HOST``.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+APP_CACHE_TTL = float(os.getenv("APP_CACHE_TTL_SECONDS", "300"))
+APP_CACHE_MAX_ENTRIES = int(os.getenv("APP_CACHE_MAX_ENTRIES", "1024"))
+APP_CACHE_LISTEN = os.getenv("APP_CACHE_LISTEN", "1").strip().lower() in ("1", "true", "yes", "on")
+BATCH_LIMIT = 500  # Firestore's per-commit write limit
+COLLECTION = "applications"
+
+_MISSING = object()
+
+
+def _server_timestamp():
+    from firebase_admin import firestore
+    return firestore.SERVER_TIMESTAMP
+
+
+class ApplicationStore:
+    def __init__(self, db=None, ttl: float = APP_CACHE_TTL, max_entries: int = APP_CACHE_MAX_ENTRIES,
+                 listen: bool = APP_CACHE_LISTEN):
+        self._db = db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.listen = listen
+        self._cache: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._watch = None
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "reads": 0, "commits": 0, "writes": 0}
+
+    @property
+    def db(self):
+        return self._connect()
+
+    def _connect(self):
+        # Before the first cache lookup, so the listener's snapshot primes the cache
+        if self._db is None:
+            from server.firebase_admin_init import get_db
+            self._db = get_db()
+        if self.listen and self._watch is None:
+            self._start_listener()
+        return self._db
+
+    def _ref(self, app_id: str):
+        return self.db.collection(COLLECTION).document(app_id)
+
+    # --- cache ---
+    def _cached(self, app_id: str) -> Any:
+        with self._lock:
+            entry = self._cache.get(app_id)
+            if entry is None or entry[0] < time.monotonic():
+                return _MISSING
+            self._cache.move_to_end(app_id)
+            return entry[1]
+
+    def _remember(self, app_id: str, doc: Optional[Dict[str, Any]]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._cache[app_id] = (time.monotonic() + self.ttl, doc)
+            self._cache.move_to_end(app_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, app_id: Optional[str] = None):
+        with self._lock:
+            if app_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(app_id, None)
+            self.stats["invalidations"] += 1
+
+    def _start_listener(self):
+        # Set first so a failing listener is not retried on every access
+        self._watch = False
+
+        def on_snapshot(docs, changes, read_time):
+            for change in changes:
+                doc = change.document
+                if getattr(change.type, "name", str(change.type)) == "REMOVED":
+                    self._remember(doc.id, None)
+                else:
+                    self._remember(doc.id, doc.to_dict())
+            self.stats["invalidations"] += len(changes)
+
+        try:
+            self._watch = self._db.collection(COLLECTION).on_snapshot(on_snapshot)
+        except Exception as e:
+            print(f"⚠️  Application cache listener unavailable, relying on TTL: {e}")
+
+    # --- reads ---
+    def get(self, app_id: str) -> Optional[Dict[str, Any]]:
+        """Application document (``None`` if missing), served from cache when fresh."""
+        self._connect()
+        doc = self._cached(app_id)
+        if doc is not _MISSING:
+            self.stats["hits"] += 1
+            return doc
+        self.stats["misses"] += 1
+        self.stats["reads"] += 1
+        snap = self._ref(app_id).get()
+        doc = snap.to_dict() if snap.exists else None
+        self._remember(app_id, doc)
+        return doc
+
+    def exists(self, app_id: str) -> bool:
+        return self.get(app_id) is not None
+
+    # --- writes ---
+    def _commit(self, batch, writes: int):
+        batch.commit()
+        self.stats["commits"] += 1
+        self.stats["writes"] += writes
+
+    def create_application(self, app_id: str, payload: Dict[str, Any], comment: Optional[Dict[str, Any]] = None) -> bool:
+        """Create the document and its first comment in one commit. Returns False
+        if it already existed: known from the cache, or the commit's ``create``
+        precondition fails, so no read round-trip is needed."""
+        self._connect()
+        cached = self._cached(app_id)
+        if cached is not _MISSING and cached is not None:
+            self.stats["hits"] += 1
+            return False
+        from google.api_core.exceptions import AlreadyExists
+
+        ref = self._ref(app_id)
+        batch = self.db.batch()
+        batch.create(ref, payload)
+        if comment is not None:
+            batch.set(ref.collection("comments").document(), comment)
+        try:
+            self._commit(batch, 2 if comment is not None else 1)
+        except AlreadyExists:
+            self.invalidate(app_id)
+            return False
+        self._remember(app_id, payload)
+        return True
+
+    def save_application(self, app_id: str, data: Dict[str, Any], extra: Iterable[Tuple[str, Dict[str, Any]]] = ()):
+        """Replace an application document, plus any ``(subpath, data)`` documents
+        under it (e.g. ``("forms/F1", {...})``), in one commit."""
+        ref = self._ref(app_id)
+        batch = self.db.batch()
+        batch.set(ref, data)
+        writes = 1
+        for subpath, doc in extra:
+            collection, doc_id = subpath.split("/", 1)
+            batch.set(ref.collection(collection).document(doc_id), doc)
+            writes += 1
+        self._commit(batch, writes)
+        self.invalidate(app_id)
+
+    def save_many(self, docs: Dict[str, Dict[str, Any]]) -> int:
+        """Write many application documents with a BulkWriter (batched, parallel,
+        retried); falls back to chunked WriteBatches. Returns the number written."""
+        db = self.db
+        items = list(docs.items())
+        if hasattr(db, "bulk_writer"):
+            writer = db.bulk_writer()
+            for app_id, data in items:
+                writer.set(self._ref(app_id), data)
+            writer.close()
+            self.stats["commits"] += (len(items) + BATCH_LIMIT - 1) // BATCH_LIMIT
+            self.stats["writes"] += len(items)
+        else:
+            for i in range(0, len(items), BATCH_LIMIT):
+                batch = db.batch()
+                chunk = items[i:i + BATCH_LIMIT]
+                for app_id, data in chunk:
+                    batch.set(self._ref(app_id), data)
+                self._commit(batch, len(chunk))
+        for app_id, _ in items:
+            self.invalidate(app_id)
+        return len(items)
+
+    def close(self):
+        if self._watch:
+            self._watch.unsubscribe()
+        self._watch = None
+
+    def cache_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "entries": len(self._cache), "listening": bool(self._watch),
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None}
+
+
+applications = ApplicationStore()
+
+
+def county_document(data: Dict[str, Any]) -> Dict[str, Any]:
+    """The Firestore document written for an uploaded county."""
+    ts = _server_timestamp()
+    return {**data, "createdAt": ts, "updatedAt": ts, "status": "active", "source": "admin-upload"}
+
+
+def new_application(app_id: str, data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Default document and opening comment for ``POST /apps``."""
+    payload = {
+        "id": app_id,
+        "title": data.get("title", app_id.replace("_", " ").title()),
+        "description": data.get("description", ""),
+        "rootDomain": data.get("rootDomain", ""),
+        "supportTools": {"aiEnabled": True, "commentsEnabled": True},
+        "steps": [],
+    }
+    comment = {
+        "displayName": "System",
+        "text": "Comments thread started.",
+        "timestamp": _server_timestamp(),
+        "userId": "system",
+    }
+    return payload, comment
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    if sys.argv[1:] == ["push-catalog"]:
+        # Re-publish every catalog county to Firestore in bulk
+        from server.catalog_store import get_catalog
+        counties = {c["id"]: county_document(c) for c in get_catalog().list()}
+        print(json.dumps({"written": applications.save_many(counties), **applications.cache_stats()}, indent=2))
+    else:
+        print("usage: python -m server.firestore_store push-catalog")
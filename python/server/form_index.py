@@ -0,0 +1,330 @@
+"""
+In-memory index of ``data/applications``: app -> form -> available artifacts.
+
+Built once at startup and shared by all routes, so listing apps or forms is a
+dict lookup instead of a directory walk. Snapshots are immutable and swapped
+atomically, so reads take no lock. The index is kept current by watching the
+tree with inotify (Linux, via libc; no extra dependency), or by polling where
+inotify is unavailable. Routes that write form files also refresh the
+affected app directly, so their own changes are visible immediately. It is
+for listings: a fill that must see another worker's latest save asks the
+template store instead.
+
+``version`` increases on every change in this process. ``digest`` is derived
+from the content, so it is the same in every worker and is what the ETag of
+``GET /apps/index`` uses.
+"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Optional, Set
+
+from server.paths import APPS
+
+FORM_INDEX_WATCH = os.getenv("FORM_INDEX_WATCH", "auto").strip().lower()  # auto | inotify | poll | off
+FORM_INDEX_POLL_SECONDS = float(os.getenv("FORM_INDEX_POLL_SECONDS", "2"))
+
+# Artifact name -> file in the form directory
+ARTIFACTS = {
+    "pdf": "form.pdf",
+    "overlay": "overlay.json",
+    "acroform_definition": "acroform-definition.json",
+    "acroform_pdf": "form_acroform.pdf",
+    "meta": "meta.json",
+}
+_FILES = {f: name for name, f in ARTIFACTS.items()}
+_POINTER = "form.pdf.sha256"
+
+FormMap = Mapping[str, FrozenSet[str]]
+
+
+def _scan_form(path: Path) -> FrozenSet[str]:
+    from server.blob_store import blob_store
+
+    found = set()
+    try:
+        names = {e.name for e in os.scandir(path) if e.is_file()}
+    except OSError:
+        return frozenset()
+    for f in names & _FILES.keys():
+        found.add(_FILES[f])
+    if "pdf" not in found and _POINTER in names:
+        # Form PDF stored only as a blob pointer
+        sha = blob_store._pointer(path / "form.pdf")
+        if sha and blob_store.exists(sha):
+            found.add("pdf")
+    return frozenset(found)
+
+
+def _scan_app(app: str) -> FormMap:
+    forms = {}
+    try:
+        entries = [e for e in os.scandir(APPS / app / "forms") if e.is_dir()]
+    except OSError:
+        entries = []
+    for e in entries:
+        forms[e.name] = _scan_form(Path(e.path))
+    return MappingProxyType(forms)
+
+
+def _scan_apps() -> List[str]:
+    try:
+        return [e.name for e in os.scandir(APPS) if e.is_dir()]
+    except OSError:
+        return []
+
+
+class IndexSnapshot:
+    """One immutable state of the index."""
+
+    def __init__(self, version: int, apps: Dict[str, FormMap]):
+        self.version = version
+        self.apps: Mapping[str, FormMap] = MappingProxyType(apps)
+        self.app_names = tuple(sorted(apps))
+        # Forms with a PDF, sorted; what GET /apps/{app}/forms returns
+        self.form_names = MappingProxyType({
+            app: tuple(sorted(f for f, arts in forms.items() if "pdf" in arts)) for app, forms in apps.items()
+        })
+        body = {app: {f: sorted(a) for f, a in sorted(forms.items())} for app, forms in sorted(apps.items())}
+        self.digest = hashlib.sha1(json.dumps(body).encode()).hexdigest()[:16]
+
+    def to_dict(self) -> Dict[str, Dict[str, List[str]]]:
+        return {app: {f: sorted(a) for f, a in sorted(self.apps[app].items())} for app in self.app_names}
+
+
+class FormIndex:
+    def __init__(self, watch: str = FORM_INDEX_WATCH, poll_seconds: float = FORM_INDEX_POLL_SECONDS):
+        self.watch = watch
+        self.poll_seconds = poll_seconds
+        self._snap: Optional[IndexSnapshot] = None
+        self._lock = threading.Lock()  # serialises writers only
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.mode = "off"
+        self.stats = {"builds": 0, "refreshes": 0, "events": 0, "polls": 0}
+
+    # --- reads (lock-free) ---
+    @property
+    def snapshot(self) -> IndexSnapshot:
+        snap = self._snap
+        if snap is None:
+            self.rebuild()
+            snap = self._snap
+        return snap
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    def apps(self) -> List[str]:
+        return list(self.snapshot.app_names)
+
+    def forms(self, app: str) -> Optional[List[str]]:
+        """Forms of ``app`` that have a PDF, or None if the app does not exist."""
+        forms = self.snapshot.form_names.get(app)
+        return None if forms is None else list(forms)
+
+    def artifacts(self, app: str, form: str) -> FrozenSet[str]:
+        return self.snapshot.apps.get(app, {}).get(form, frozenset())
+
+    def has(self, app: str, form: str, artifact: str) -> bool:
+        return artifact in self.artifacts(app, form)
+
+    # --- updates ---
+    def _publish(self, apps: Dict[str, FormMap]):
+        old = self._snap
+        if old is not None and dict(old.apps) == apps:
+            return
+        self._snap = IndexSnapshot((old.version + 1) if old else 1, apps)
+
+    def rebuild(self):
+        with self._lock:
+            self._publish({app: _scan_app(app) for app in _scan_apps()})
+            self.stats["builds"] += 1
+
+    def refresh(self, app: Optional[str] = None):
+        """Rescan one app (or the app list when ``app`` is None). No-op until built."""
+        if self._snap is None:
+            return
+        with self._lock:
+            apps = dict(self._snap.apps)
+            if app is None:
+                names = set(_scan_apps())
+                for gone in set(apps) - names:
+                    del apps[gone]
+                for new in names - set(apps):
+                    apps[new] = _scan_app(new)
+            elif (APPS / app).is_dir():
+                apps[app] = _scan_app(app)
+            else:
+                apps.pop(app, None)
+            self._publish(apps)
+            self.stats["refreshes"] += 1
+
+    # --- watching ---
+    def start(self):
+        """Build the index and start watching (inotify, else polling)."""
+        self.rebuild()
+        if self._thread is not None or self.watch == "off":
+            return
+        inotify = None
+        if self.watch in ("auto", "inotify"):
+            try:
+                inotify = _Inotify()
+            except OSError as e:
+                if self.watch == "inotify":
+                    raise
+                print(f"⚠️  inotify unavailable, polling {APPS} every {self.poll_seconds}s: {e}")
+        self._stop.clear()
+        if inotify is not None:
+            self.mode = "inotify"
+            target, args = self._watch_loop, (inotify,)
+        else:
+            self.mode = "poll"
+            target, args = self._poll_loop, ()
+        self._thread = threading.Thread(target=target, args=args, name="form-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+        self.mode = "off"
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.rebuild()
+                self.stats["polls"] += 1
+            except Exception as e:
+                print(f"⚠️  Form index poll failed: {e}")
+
+    def _watch_loop(self, inotify: "_Inotify"):
+        try:
+            inotify.watch_tree(APPS)
+            self.rebuild()  # catch changes made while the watches were being added
+            while not self._stop.is_set():
+                dirty = inotify.read(timeout=0.5)
+                if not dirty:
+                    continue
+                # Coalesce bursts (atomic rename = several events)
+                time.sleep(0.02)
+                dirty |= inotify.read(timeout=0)
+                self.stats["events"] += len(dirty)
+                if None in dirty:
+                    self.rebuild()
+                    continue
+                for app in dirty:
+                    self.refresh(app)
+        except Exception as e:
+            print(f"⚠️  Form index watcher stopped, falling back to polling: {e}")
+            self.mode = "poll"
+            self._poll_loop()
+        finally:
+            inotify.close()
+
+    def info(self) -> Dict[str, object]:
+        snap = self.snapshot
+        return {"version": snap.version, "digest": snap.digest, "apps": len(snap.app_names),
+                "forms": sum(len(f) for f in snap.apps.values()), "mode": self.mode, **self.stats}
+
+
+class _Inotify:
+    """Minimal recursive inotify watcher over ``APPS/<app>/forms/<form>``."""
+
+    IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x2, 0x4, 0x8
+    IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x40, 0x80, 0x100, 0x200
+    IN_DELETE_SELF, IN_MOVE_SELF = 0x400, 0x800
+    IN_Q_OVERFLOW, IN_IGNORED, IN_ISDIR = 0x4000, 0x8000, 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    MAX_DEPTH = 3  # APPS / app / forms / form
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        if not hasattr(os, "O_CLOEXEC"):
+            raise OSError("inotify requires Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("libc has no inotify")
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths: Dict[int, Path] = {}
+
+    def _add(self, path: Path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self._paths[wd] = path
+
+    def watch_tree(self, root: Path, depth: int = 0):
+        if depth == 0:
+            root.mkdir(parents=True, exist_ok=True)
+        self._add(root)
+        if depth >= self.MAX_DEPTH:
+            return
+        try:
+            children = [Path(e.path) for e in os.scandir(root) if e.is_dir()]
+        except OSError:
+            return
+        for child in children:
+            if depth == 1 and child.name != "forms":
+                continue
+            self.watch_tree(child, depth + 1)
+
+    def _app_of(self, path: Path) -> Optional[str]:
+        rel = path.relative_to(APPS).parts
+        return rel[0] if rel else None
+
+    def read(self, timeout: float) -> Set[Optional[str]]:
+        """Apps touched by pending events; ``None`` means the app list (or everything, on overflow)."""
+        dirty: Set[Optional[str]] = set()
+        while True:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return dirty
+            timeout = 0
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return dirty
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = self._EVENT.unpack_from(buf, offset)
+                name = buf[offset + self._EVENT.size: offset + self._EVENT.size + length].rstrip(b"\0")
+                offset += self._EVENT.size + length
+                if mask & self.IN_Q_OVERFLOW:
+                    dirty.add(None)
+                    continue
+                if mask & self.IN_IGNORED:
+                    self._paths.pop(wd, None)
+                    continue
+                parent = self._paths.get(wd)
+                if parent is None:
+                    continue
+                path = parent / os.fsdecode(name) if name else parent
+                if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    depth = len(path.relative_to(APPS).parts)
+                    if depth <= self.MAX_DEPTH and not (depth == 2 and path.name != "forms"):
+                        self.watch_tree(path, depth)
+                dirty.add(self._app_of(path))
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+form_index = FormIndex()
@@ -0,0 +1,338 @@
+"""
+County ingestion pipeline: pooled, concurrent PDF downloads with retry and
+parallel field detection in worker processes.
+
+Used by ``POST /apps/process-county``, which queues an ``ingest_county`` job
+(see ``server.jobs``). Every stage is timed so the result can show where the
+time went, and each stage and form is a job step, so a retry only redoes what
+failed.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from server import aio
+from server.blob_store import blob_store, store_form_pdf
+from server.jobs import JobFailed, JobProgress, handler
+from server.paths import DATA, app_dir, form_dir, ensure_dir
+from server.template_store import template_store
+
+DOWNLOAD_CONCURRENCY = int(os.getenv("INGEST_DOWNLOAD_CONCURRENCY", "4"))
+DOWNLOAD_RETRIES = int(os.getenv("INGEST_DOWNLOAD_RETRIES", "3"))
+DOWNLOAD_TIMEOUT = float(os.getenv("INGEST_DOWNLOAD_TIMEOUT_SECONDS", "30"))
+DETECT_WORKERS = int(os.getenv("INGEST_DETECT_WORKERS", str(min(4, os.cpu_count() or 1))))
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class StageTimer:
+    """Accumulates wall time per named stage, in milliseconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+    def report(self) -> Dict[str, float]:
+        out = {k: round(v, 1) for k, v in self.stages.items()}
+        out["total"] = round((time.perf_counter() - self.started) * 1000, 1)
+        return out
+
+
+@dataclass
+class FormResult:
+    step: Dict[str, Any]
+    content: Optional[bytes] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    download_ms: float = 0.0
+    detect_ms: float = 0.0
+    existing_fields: List[Dict[str, Any]] = field(default_factory=list)
+    detect_error: Optional[str] = None
+    sha256: Optional[str] = None
+    detect_cached: bool = False
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "formId": self.step.get("formId"),
+            "ok": self.content is not None,
+            "bytes": len(self.content) if self.content is not None else 0,
+            "attempts": self.attempts,
+            "download_ms": round(self.download_ms, 1),
+            "detect_ms": round(self.detect_ms, 1),
+            "fields": len(self.existing_fields),
+            "sha256": self.sha256,
+            "detect_cached": self.detect_cached,
+            "error": self.error or self.detect_error,
+        }
+
+
+# --- download stage ---
+def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+    if response is not None:
+        try:
+            return min(30.0, float(response.headers.get("retry-after", "")))
+        except ValueError:
+            pass
+    return min(30.0, 0.5 * (2 ** attempt)) * (0.5 + random.random())
+
+
+async def _download_one(client: httpx.AsyncClient, sem: asyncio.Semaphore, result: FormResult, retries: int,
+                        on_done: Optional[Callable[[FormResult], None]]):
+    url = result.step["pdfUrl"]
+    async with sem:
+        t0 = time.perf_counter()
+        for attempt in range(retries + 1):
+            result.attempts = attempt + 1
+            response = None
+            try:
+                response = await client.get(url)
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    result.content = response.content
+                    result.sha256 = hashlib.sha256(result.content).hexdigest()
+                    result.etag = response.headers.get("etag")
+                    result.last_modified = response.headers.get("last-modified")
+                    result.error = None
+                    break
+                result.error = f"HTTP {response.status_code}"
+            except httpx.HTTPStatusError as e:
+                result.error = str(e)
+                break  # 4xx other than the retryable ones will not improve
+            except httpx.TransportError as e:
+                result.error = f"{type(e).__name__}: {e}"
+            if attempt < retries:
+                await asyncio.sleep(_retry_delay(attempt, response))
+        result.download_ms = (time.perf_counter() - t0) * 1000
+    if on_done is not None:
+        on_done(result)
+
+
+async def download_forms(
+    steps: List[Dict[str, Any]],
+    concurrency: int = DOWNLOAD_CONCURRENCY,
+    retries: int = DOWNLOAD_RETRIES,
+    timeout: float = DOWNLOAD_TIMEOUT,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+    on_done: Optional[Callable[[FormResult], None]] = None,
+) -> List[FormResult]:
+    """Download every step's pdfUrl over one pooled client, ``concurrency`` at a time.
+    ``on_done`` is called as each download finishes (successfully or not)."""
+    results = [FormResult(step=s) for s in steps]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, follow_redirects=True, transport=transport) as client:
+        await asyncio.gather(*(_download_one(client, sem, r, retries, on_done) for r in results))
+    return results
+
+
+# --- field detection stage ---
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _detect_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the parent holds gRPC/HTTP threads that must not be forked
+        _pool = ProcessPoolExecutor(max_workers=DETECT_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+def detect_existing_fields(pdf_bytes: bytes) -> List[Dict[str, Any]]:
+    """Runs in a worker process: existing AcroForm fields of one PDF."""
+    from overlay.acroform_handler import AcroFormHandler
+    return AcroFormHandler(pdf_bytes).get_existing_fields()
+
+
+async def detect_forms(results: List[FormResult]):
+    """Run field detection for every downloaded form in parallel worker processes.
+    PDFs already seen (same sha256, any county) reuse the cached fields."""
+    loop = asyncio.get_running_loop()
+    pool = None
+
+    async def one(result: FormResult):
+        nonlocal pool
+        t0 = time.perf_counter()
+        cached = blob_store.derived_dir(result.sha256) / "acroform-fields.json"
+        try:
+            if cached.exists():
+                result.existing_fields = json.loads(await aio.read_bytes(cached))
+                result.detect_cached = True
+            else:
+                if pool is None and DETECT_WORKERS > 0:
+                    pool = _detect_pool()
+                result.existing_fields = await loop.run_in_executor(pool, detect_existing_fields, result.content)
+                await aio.run(blob_store.derived, result.sha256, "acroform-fields.json",
+                              lambda: json.dumps(result.existing_fields).encode())
+        except Exception as e:
+            result.detect_error = f"field detection failed: {e}"
+        result.detect_ms = (time.perf_counter() - t0) * 1000
+
+    await asyncio.gather(*(one(r) for r in results if r.content is not None))
+
+
+# --- write stage ---
+def write_form_files(app_id: str, result: FormResult, server_timestamp: Any) -> bool:
+    """Write form.pdf, meta.json, acroform-definition.json and overlay.json for one form.
+    Returns True when field definitions were created from detection."""
+    step = result.step
+    form_path = form_dir(app_id, step["formId"])
+    ensure_dir(form_path)
+    store_form_pdf(app_id, step["formId"], result.content)
+
+    meta_data = {
+        "id": step["formId"],
+        "title": step["title"],
+        "type": "pdf",
+        "appId": app_id,
+        "stepId": step["id"],
+        "pdfUrl": step["pdfUrl"],
+        "sha256": result.sha256,
+        "etag": result.etag,
+        "lastModified": result.last_modified,
+        "syncedAt": time.time(),
+        "createdAt": server_timestamp,
+    }
+    (form_path / "meta.json").write_text(json.dumps(meta_data, indent=2, default=str))
+
+    base = {
+        "id": step["formId"],
+        "title": step["title"],
+        "appId": app_id,
+        "stepId": step["id"],
+        "createdAt": server_timestamp,
+    }
+    if result.detect_error:
+        acroform_definition = {**base, "type": "template", "fields": [], "source": "fallback_template",
+                               "note": "Field detection failed. Use the Field Mapper to add form fields manually."}
+    elif result.existing_fields:
+        acroform_definition = {**base, "type": "existing_acroform", "fields": result.existing_fields,
+                               "source": "existing_pdf_fields"}
+    else:
+        acroform_definition = {**base, "type": "template", "fields": [], "source": "auto_generated_template",
+                               "note": "This is a basic template. Use the Field Mapper to add form fields."}
+    template_store.save(app_id, step["formId"], "acroform_definition", acroform_definition)
+
+    # Also create a basic overlay.json for backward compatibility
+    overlay_data = {
+        "id": step["formId"],
+        "title": step["title"],
+        "fields": acroform_definition["fields"],
+        "createdAt": server_timestamp,
+    }
+    template_store.save(app_id, step["formId"], "overlay", overlay_data)
+    return not result.detect_error
+
+
+# --- job handler ---
+def valid_pdf_steps(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    steps = [s for s in data.get("steps", []) if isinstance(s, dict) and s.get("type") == "pdf"]
+    for step in steps:
+        if not step.get("pdfUrl") or not step.get("formId"):
+            print(f"⚠️  Skipping PDF step {step.get('id')}: missing pdfUrl or formId")
+    return [s for s in steps if s.get("pdfUrl") and s.get("formId")]
+
+
+@handler("process_county")
+async def ingest_county(data: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    """Save the county config, catalog entry and Firestore document, then
+    download, detect and write every PDF form. Steps already completed by an
+    earlier attempt are skipped. File, catalog and Firestore writes run in
+    threads: ``?wait=true`` runs the job on the app's event loop.
+
+    A run where some steps fail still succeeds, with ``ok`` false and the
+    steps in ``failed_steps``; it fails only when no form could be stored."""
+    from firebase_admin import firestore
+    from server.catalog_store import get_catalog
+
+    app_id = data["id"]
+    timer = StageTimer()
+    county_file = DATA / f"{app_id}.json"
+    pdf_steps = [s for s in data["steps"] if isinstance(s, dict) and s.get("type") == "pdf"]
+    valid_steps = valid_pdf_steps(data)
+    progress.plan(["config", "catalog", "firestore"] + [f"form:{s['formId']}" for s in valid_steps])
+    failures = []
+
+    ensure_dir(app_dir(app_id))
+    if not progress.is_done("config"):
+        with timer.stage("config"):
+            await aio.run(county_file.write_text, json.dumps(data, indent=2))
+        progress.done("config", {"path": str(county_file)})
+
+    catalog = await aio.run(get_catalog)
+    if not progress.is_done("catalog"):
+        with timer.stage("catalog"):
+            progress.done("catalog", {"version": await aio.run(catalog.upsert, data)})
+
+    if not progress.is_done("firestore"):
+        try:
+            with timer.stage("firestore"):
+                from server.firestore_store import applications, county_document
+                await aio.run(applications.save_application, app_id, county_document(data))
+            progress.done("firestore")
+        except Exception as e:
+            failures.append("firestore")
+            progress.failed("firestore", f"{type(e).__name__}: {e}")
+
+    pending = [s for s in valid_steps if not progress.is_done(f"form:{s['formId']}")]
+    progress.event("downloading", {"forms": len(pending)})
+    with timer.stage("download"):
+        results = await download_forms(
+            pending, on_done=lambda r: progress.event("downloaded", {"step": f"form:{r.step['formId']}", "ok": r.content is not None}),
+        )
+    downloaded = [r for r in results if r.content is not None]
+    progress.event("detecting", {"forms": len(downloaded)})
+    with timer.stage("detect"):
+        await detect_forms(downloaded)
+
+    with timer.stage("write"):
+        for r in results:
+            name = f"form:{r.step['formId']}"
+            if r.content is None:
+                failures.append(name)
+                progress.failed(name, r.error or "download failed")
+                continue
+            try:
+                created = await aio.run(write_form_files, app_id, r, firestore.SERVER_TIMESTAMP)
+            except Exception as e:
+                failures.append(name)
+                progress.failed(name, f"failed to write files: {e}")
+                continue
+            progress.done(name, {**r.summary(), "field_definitions_created": created})
+
+    forms = [progress.result(f"form:{s['formId']}") for s in valid_steps if progress.is_done(f"form:{s['formId']}")]
+    result = {
+        "ok": not failures,
+        "app": app_id,
+        "title": data["title"],
+        "pdfs_downloaded": len(forms),
+        "total_pdf_steps": len(pdf_steps),
+        "field_definitions_created": sum(1 for f in forms if f.get("field_definitions_created")),
+        "config_saved": str(county_file),
+        "manifest_updated": str(catalog.manifest_path),
+        "forms": forms + [r.summary() for r in results if r.content is None],
+        "failed_steps": failures,
+        "timings_ms": timer.report(),
+    }
+    if failures and valid_steps and not forms:
+        raise JobFailed(f"{len(failures)} step(s) failed: {', '.join(failures)}", result)
+    return result
@@ -0,0 +1,92 @@
+"""
+Background job status: polling, Server-Sent Events progress stream and retry.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException, Request
+from starlette.responses import StreamingResponse
+
+from server.jobs import TERMINAL, JobQueue, execute, get_queue
+
+router = APIRouter(tags=["jobs"])
+
+EVENT_POLL_SECONDS = 0.5
+KEEPALIVE_SECONDS = 15.0
+
+
+async def wait_for_job(queue: JobQueue, job_id: str) -> Dict[str, Any]:
+    """Run ``job_id`` in this process if no worker has claimed it yet,
+    otherwise wait for the worker to finish it."""
+    job = await asyncio.to_thread(queue.claim, "inline", job_id)
+    if job is not None:
+        return await execute(queue, job)
+    while True:
+        job = await asyncio.to_thread(queue.get, job_id)
+        if job["status"] in TERMINAL:
+            return job
+        await asyncio.sleep(EVENT_POLL_SECONDS)
+
+
+@router.get("/jobs")
+def list_jobs(limit: int = 50):
+    return {"jobs": get_queue().list(limit=min(max(limit, 1), 500))}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = get_queue().get(job_id)
+    if job is None:
+        raise HTTPException(404, f"job '{job_id}' not found")
+    return job
+
+
+@router.post("/jobs/{job_id}/retry")
+def retry_job(job_id: str):
+    """Re-queue a failed job, or a succeeded one with failed steps; steps that
+    already completed are not repeated."""
+    queue = get_queue()
+    job = queue.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"job '{job_id}' not found")
+    if not queue.retry(job_id):
+        raise HTTPException(409, f"job '{job_id}' is {job['status']}, only jobs with failed steps can be retried")
+    return {"ok": True, "job_id": job_id, "status": "queued"}
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Stream job events as SSE until the job finishes. Reconnecting clients
+    resume from ``Last-Event-ID``."""
+    queue = get_queue()
+    if await asyncio.to_thread(queue.get, job_id) is None:
+        raise HTTPException(404, f"job '{job_id}' not found")
+    try:
+        after = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        after = 0
+
+    async def stream():
+        nonlocal after
+        idle = 0.0
+        while True:
+            events = await asyncio.to_thread(queue.events, job_id, after)
+            for ev in events:
+                after = ev["id"]
+                yield f"id: {ev['id']}\nevent: {ev['type']}\ndata: {json.dumps({**ev['data'], 'at': ev['at']})}\n\n"
+                if ev["type"] in TERMINAL and ev is events[-1]:
+                    return  # finished, and not retried since
+            if events:
+                idle = 0.0
+            elif idle >= KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+            idle += EVENT_POLL_SECONDS
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,364 @@
+"""
+Persistent background job queue for long-running work (county ingestion).
+
+Jobs, their completed steps and progress events live in SQLite
+(``data/jobs.db``), so they survive restarts: a job whose worker stopped
+heart-beating is re-queued, and retrying a failed job re-runs only the steps
+that did not complete. Jobs are executed by worker processes started with the
+app (one pool per host, guarded by a file lock) or standalone with
+``python -m server.jobs``.
+"""
+
+import asyncio
+import fcntl
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from server.paths import DATA
+
+JOBS_DB = Path(os.getenv("JOBS_DB_PATH", str(DATA / "jobs.db")))
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "1"))
+POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "1"))
+STALE_SECONDS = float(os.getenv("JOBS_STALE_SECONDS", "60"))
+HEARTBEAT_SECONDS = 10.0
+TERMINAL = ("succeeded", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at);
+CREATE TABLE IF NOT EXISTS job_steps (
+    job_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, name)
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    at REAL NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS job_events_job ON job_events(job_id, id);
+"""
+
+
+class JobFailed(Exception):
+    """Raised by a handler when some steps failed; carries the partial result."""
+
+    def __init__(self, message: str, result: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.result = result
+
+
+class JobQueue:
+    def __init__(self, db_path: Path = JOBS_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    # --- lifecycle ---
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs(id, kind, status, payload, created_at, updated_at) VALUES(?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, json.dumps(payload, default=str), now, now),
+        )
+        self.event(job_id, "queued", {"kind": kind})
+        return job_id
+
+    def claim(self, worker: str, job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest queued job (or ``job_id`` if still queued),
+        re-queueing abandoned ones first."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, updated_at = ? WHERE status = 'running' AND heartbeat_at < ?",
+                (now, now - STALE_SECONDS),
+            )
+            if job_id is None:
+                row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+            else:
+                row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' AND id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, updated_at = ?, heartbeat_at = ? WHERE id = ?",
+                (worker, now, now, row["id"]),
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.event(job["id"], "started", {"worker": worker, "attempt": job["attempts"]})
+        return self._job(job)
+
+    def heartbeat(self, job_id: str):
+        self._conn().execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, json.dumps(result, default=str) if result is not None else None, error, time.time(), job_id),
+        )
+        self.event(job_id, status, {"error": error} if error else {})
+
+    def retry(self, job_id: str) -> bool:
+        """Re-queue a failed job, or a succeeded one with failed steps; completed
+        steps are kept and skipped."""
+        cur = self._conn().execute(
+            """UPDATE jobs SET status = 'queued', error = NULL, worker = NULL, updated_at = ?
+               WHERE id = ? AND (status = 'failed' OR (status = 'succeeded' AND EXISTS (
+                   SELECT 1 FROM job_steps WHERE job_steps.job_id = jobs.id AND job_steps.status = 'failed')))""",
+            (time.time(), job_id),
+        )
+        if cur.rowcount:
+            self.event(job_id, "retried", {})
+        return bool(cur.rowcount)
+
+    # --- steps and events ---
+    def steps(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        rows = self._conn().execute("SELECT name, status, result, error FROM job_steps WHERE job_id = ?", (job_id,))
+        return {r["name"]: {"status": r["status"], "result": json.loads(r["result"]) if r["result"] else None, "error": r["error"]} for r in rows}
+
+    def plan(self, job_id: str, names: List[str]):
+        """Record the steps a job will run so progress can be reported up front."""
+        now = time.time()
+        self._conn().executemany(
+            "INSERT OR IGNORE INTO job_steps(job_id, name, status, updated_at) VALUES(?, ?, 'pending', ?)",
+            [(job_id, name, now) for name in names],
+        )
+
+    def step(self, job_id: str, name: str, status: str, result: Any = None, error: Optional[str] = None):
+        self._conn().execute(
+            """INSERT INTO job_steps(job_id, name, status, result, error, updated_at) VALUES(?, ?, ?, ?, ?, ?)
+               ON CONFLICT(job_id, name) DO UPDATE SET status = excluded.status, result = excluded.result,
+                   error = excluded.error, updated_at = excluded.updated_at""",
+            (job_id, name, status, json.dumps(result, default=str) if result is not None else None, error, time.time()),
+        )
+        self.event(job_id, f"step_{status}", {"step": name, **({"error": error} if error else {})})
+
+    def event(self, job_id: str, type: str, data: Dict[str, Any]):
+        self._conn().execute(
+            "INSERT INTO job_events(job_id, at, type, data) VALUES(?, ?, ?, ?)",
+            (job_id, time.time(), type, json.dumps(data, default=str)),
+        )
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT id, at, type, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id", (job_id, after)
+        )
+        return [{"id": r["id"], "at": r["at"], "type": r["type"], "data": json.loads(r["data"] or "{}")} for r in rows]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._job(row)
+        job["steps"] = self.steps(job_id)
+        done = sum(1 for s in job["steps"].values() if s["status"] == "done")
+        job["progress"] = {"done": done, "total": len(job["steps"])}
+        return job
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT id, kind, status, attempts, error, created_at, updated_at FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+        )
+        return [dict(r) for r in rows]
+
+
+class JobProgress:
+    """Step bookkeeping handed to job handlers."""
+
+    def __init__(self, queue: JobQueue, job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self._done = {name: s for name, s in queue.steps(job_id).items() if s["status"] == "done"}
+
+    def plan(self, names: List[str]):
+        self.queue.plan(self.job_id, names)
+
+    def is_done(self, name: str) -> bool:
+        return name in self._done
+
+    def result(self, name: str) -> Any:
+        return self._done.get(name, {}).get("result")
+
+    def done(self, name: str, result: Any = None):
+        self._done[name] = {"status": "done", "result": result}
+        self.queue.step(self.job_id, name, "done", result=result)
+
+    def failed(self, name: str, error: str):
+        self.queue.step(self.job_id, name, "failed", error=error)
+
+    def event(self, type: str, data: Dict[str, Any]):
+        self.queue.event(self.job_id, type, data)
+
+
+# --- handlers and execution ---
+Handler = Callable[[Dict[str, Any], JobProgress], Awaitable[Dict[str, Any]]]
+HANDLERS: Dict[str, Handler] = {}
+
+
+def handler(kind: str):
+    def register(fn: Handler) -> Handler:
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+async def execute(queue: JobQueue, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one claimed job to a terminal state; returns the stored job."""
+    fn = HANDLERS.get(job["kind"])
+    if fn is None:
+        _load_handlers()
+        fn = HANDLERS.get(job["kind"])
+
+    async def beat():
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            queue.heartbeat(job["id"])
+
+    beater = asyncio.create_task(beat())
+    try:
+        if fn is None:
+            raise RuntimeError(f"no handler for job kind '{job['kind']}'")
+        result = await fn(job["payload"], JobProgress(queue, job["id"]))
+        queue.finish(job["id"], "succeeded", result=result)
+    except JobFailed as e:
+        queue.finish(job["id"], "failed", result=e.result, error=str(e))
+    except Exception as e:
+        queue.finish(job["id"], "failed", error=f"{type(e).__name__}: {e}")
+    finally:
+        beater.cancel()
+    return queue.get(job["id"])
+
+
+def _load_handlers():
+    # Handlers register themselves on import
+    import server.ingest  # noqa: F401
+    import server.resync  # noqa: F401
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        _queue = JobQueue()
+    return _queue
+
+
+# --- worker processes ---
+def worker_main(worker_id: str):
+    _load_handlers()
+    queue = JobQueue()
+
+    async def loop():
+        while True:
+            job = queue.claim(worker_id)
+            if job is None:
+                await asyncio.sleep(POLL_SECONDS)
+                continue
+            await execute(queue, job)
+
+    asyncio.run(loop())
+
+
+_lock_file = None
+_workers: List[multiprocessing.Process] = []
+
+
+def start_workers(count: int = JOBS_WORKERS) -> int:
+    """Start ``count`` worker processes unless another process on this host
+    already owns the pool (e.g. a second uvicorn worker). Returns the number started."""
+    global _lock_file
+    if count <= 0 or _workers:
+        return 0
+    JOBS_DB.parent.mkdir(parents=True, exist_ok=True)
+    _lock_file = open(JOBS_DB.with_suffix(".lock"), "w")
+    try:
+        fcntl.flock(_lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        _lock_file.close()
+        _lock_file = None
+        return 0
+    ctx = multiprocessing.get_context("spawn")
+    for i in range(count):
+        p = ctx.Process(target=worker_main, args=(f"{socket.gethostname()}:{os.getpid()}:{i}",), daemon=True)
+        p.start()
+        _workers.append(p)
+    return count
+
+
+def stop_workers():
+    global _lock_file
+    for p in _workers:
+        p.terminate()
+    for p in _workers:
+        p.join(timeout=5)
+    _workers.clear()
+    if _lock_file is not None:
+        _lock_file.close()
+        _lock_file = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run job worker processes")
+    parser.add_argument("--workers", type=int, default=max(1, JOBS_WORKERS))
+    args = parser.parse_args()
+    if args.workers == 1:
+        worker_main(f"{socket.gethostname()}:{os.getpid()}:0")
+    else:
+        start_workers(args.workers)
+        for p in _workers:
+            p.join()
@@ -0,0 +1,50 @@
+"""
+JSON for the hot paths: ``orjson`` when it is installed, the stdlib otherwise.
+
+Both produce the same documents. ``orjson`` writes non-ASCII characters as
+UTF-8 where the stdlib writes ``\\uXXXX`` escapes (its faster ASCII encoder),
+and encodes NaN as ``null``. Values ``orjson`` cannot encode (integers beyond
+64 bits) fall back to the stdlib.
+
+    body = dumps(doc, indent=True)          # templates on disk
+    doc = loads(body)                        # ValueError if invalid
+    return FastJSONResponse(payload)         # large response bodies
+"""
+
+import json
+from typing import Any, Callable, Optional, Union
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:  # optional: the stdlib encoder is used instead
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def dumps(obj: Any, indent: bool = False, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """``obj`` as UTF-8 JSON: compact, or indented by two spaces."""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(obj, indent=2 if indent else None, separators=None if indent else (",", ":"),
+                      default=default).encode()
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Parse JSON; raises ``ValueError`` (``json.JSONDecodeError``) if invalid."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data.tobytes() if isinstance(data, memoryview) else data)
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` encoded with ``dumps``."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
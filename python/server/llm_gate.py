@@ -0,0 +1,230 @@
+"""
+Admission control in front of the upstream LLM (OpenAI).
+
+Bounds the number of in-flight upstream calls, queues a bounded number of
+waiters with a deadline, pauses admissions when the upstream answers 429
+(honouring Retry-After), and opens a circuit breaker after repeated failures
+so callers fail fast to the canned fallback instead of waiting on a sick
+upstream. Point ``OPENAI_BASE_URL`` at a local fake server to exercise it.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when a call is rejected without reaching the upstream."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for name in ("retry-after-ms", "retry-after"):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            continue
+        return seconds / 1000.0 if name == "retry-after-ms" else seconds
+    return None
+
+
+async def _acquire_within(sem: asyncio.Semaphore, timeout: float) -> bool:
+    """``sem.acquire()`` bounded by ``timeout``; False if it timed out. Unlike
+    ``wait_for`` (before Python 3.12), a permit granted just as the timeout or a
+    cancellation hits is given back instead of leaking."""
+    acquire = asyncio.ensure_future(sem.acquire())
+    try:
+        await asyncio.wait({acquire}, timeout=timeout)
+    except asyncio.CancelledError:
+        _abandon(sem, acquire)
+        raise
+    if acquire.done():
+        return True
+    _abandon(sem, acquire)
+    return False
+
+
+def _abandon(sem: asyncio.Semaphore, acquire: asyncio.Future):
+    acquire.cancel()  # no-op if it already acquired: the callback releases it
+    acquire.add_done_callback(lambda f: None if f.cancelled() else sem.release())
+
+
+class UpstreamGate:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        max_inflight: int = 8,
+        max_queue: int = 32,
+        queue_timeout: float = 10.0,
+        failure_threshold: int = 5,
+        open_seconds: float = 30.0,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._inflight = 0
+        self._waiting = 0  # blocked on the semaphore (bounded by max_queue)
+        self._pausing = 0  # sleeping through a 429 pause
+        self._paused_until = 0.0
+        self._backoff = 0.0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_inflight = False
+        self._consecutive_failures = 0
+        self.counters = {
+            "admitted": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "rate_limited": 0,
+            "rejected_queue_full": 0,
+            "rejected_deadline": 0,
+            "rejected_circuit_open": 0,
+        }
+
+    # --- circuit breaker ---
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def _admit_circuit(self) -> bool:
+        """Returns True when this caller is the half-open probe."""
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._probe_inflight):
+            self.counters["rejected_circuit_open"] += 1
+            raise UpstreamUnavailable("circuit open")
+        if state == self.HALF_OPEN:
+            self._probe_inflight = True
+            return True
+        return False
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+
+    def _record_success(self):
+        self.counters["succeeded"] += 1
+        self._consecutive_failures = 0
+        self._state = self.CLOSED
+        self._backoff = 0.0
+
+    def _record_failure(self, error: BaseException):
+        status = _status_code(error)
+        if status is not None and 400 <= status < 500 and status not in (408, 429):
+            # The request itself was bad; the upstream is healthy.
+            return
+        self.counters["failed"] += 1
+        if status == 429:
+            self.counters["rate_limited"] += 1
+            self._backoff = min(self.max_backoff, max(self.base_backoff, self._backoff * 2))
+            delay = _retry_after(error)
+            self._paused_until = max(self._paused_until, time.monotonic() + (delay if delay is not None else self._backoff))
+        self._consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    # --- admission ---
+    async def _acquire(self, deadline: float):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_inflight)
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            if time.monotonic() + pause > deadline:
+                self.counters["rejected_deadline"] += 1
+                raise UpstreamUnavailable("rate limited")
+            self._pausing += 1
+            try:
+                await asyncio.sleep(pause)
+            finally:
+                self._pausing -= 1
+        if self._sem.locked():
+            # Only callers actually blocked on a slot count against the queue
+            if self._waiting >= self.max_queue:
+                self.counters["rejected_queue_full"] += 1
+                raise UpstreamUnavailable("queue full")
+            self._waiting += 1
+            try:
+                if not await _acquire_within(self._sem, max(0.0, deadline - time.monotonic())):
+                    self.counters["rejected_deadline"] += 1
+                    raise UpstreamUnavailable("queue deadline exceeded")
+            finally:
+                self._waiting -= 1
+        else:
+            # Uncontended: the slot is taken immediately
+            await self._sem.acquire()
+        self._inflight += 1
+        self.counters["admitted"] += 1
+
+    def _release(self):
+        self._inflight -= 1
+        self._sem.release()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Run ``fn`` once admitted; a single rate-limited attempt is retried
+        after the advertised backoff if the deadline still allows it."""
+        deadline = time.monotonic() + (self.queue_timeout if timeout is None else timeout)
+        for attempt in (0, 1):
+            probe = self._admit_circuit()
+            try:
+                await self._acquire(deadline)
+                try:
+                    result = await fn()
+                except Exception as e:
+                    self._record_failure(e)
+                    if attempt == 0 and _status_code(e) == 429 and self._paused_until < deadline:
+                        continue
+                    raise
+                finally:
+                    self._release()
+                self._record_success()
+                return result
+            finally:
+                if probe:
+                    self._probe_inflight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "inflight": self._inflight,
+            "waiting": self._waiting,
+            "pausing": self._pausing,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            "consecutive_failures": self._consecutive_failures,
+            **self.counters,
+        }
+
+
+openai_gate = UpstreamGate(
+    max_inflight=int(os.getenv("OPENAI_MAX_INFLIGHT", "8")),
+    max_queue=int(os.getenv("OPENAI_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("OPENAI_QUEUE_TIMEOUT_SECONDS", "10")),
+    failure_threshold=int(os.getenv("OPENAI_BREAKER_FAILURES", "5")),
+    open_seconds=float(os.getenv("OPENAI_BREAKER_OPEN_SECONDS", "30")),
+)
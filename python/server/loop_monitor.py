@@ -0,0 +1,177 @@
+"""
+Event-loop stall monitor that names the request responsible.
+
+A heartbeat task on the loop wakes every ``LOOP_MONITOR_INTERVAL_MS`` and
+records how late it woke (``event_loop_lag_seconds``). A watchdog thread
+checks the heartbeat: once it is ``LOOP_LAG_THRESHOLD_MS`` overdue the loop
+is blocked, and the watchdog captures, while the stall is still in
+progress, which request task is running on the loop
+(``LoopMonitorMiddleware`` registers each request's task) and the loop
+thread's stack. When the loop comes back the stall is recorded with its
+duration, route and code location, counted in ``event_loop_stalls_total``,
+logged, and listed in ``/admin/status``.
+
+A stall outside any request task (a protocol callback, a background task)
+is reported with route ``<loop>``.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from server import metrics
+from server.paths import ROOT
+
+LOOP_MONITOR = os.getenv("LOOP_MONITOR", "1").strip().lower() in ("1", "true", "yes", "on")
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "20"))
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+LOOP_STALL_HISTORY = int(os.getenv("LOOP_STALL_HISTORY", "50"))
+
+_WATCHDOG_NAME = "loop-watchdog"
+
+
+def _where(frame, limit: int = 5) -> List[str]:
+    """Innermost frames, ours first: where the loop thread was blocked."""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    ours = [f for f in frames if f.f_code.co_filename.startswith(str(ROOT))] or frames
+    out = []
+    for f in ours[:limit]:
+        path = f.f_code.co_filename
+        if path.startswith(str(ROOT)):
+            path = path[len(str(ROOT)) + 1:]
+        out.append(f"{f.f_code.co_name} ({path}:{f.f_lineno})")
+    return out
+
+
+def _route(scope: Optional[Dict[str, Any]]) -> str:
+    if scope is None:
+        return "<loop>"
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', None) or scope['path']}"
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL_MS / 1000,
+                 threshold: float = LOOP_LAG_THRESHOLD_MS / 1000, history: int = LOOP_STALL_HISTORY):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self.stats = {"stalls": 0, "stalled_ms": 0.0, "max_lag_ms": 0.0}
+        self.requests: Dict[asyncio.Task, Dict[str, Any]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._beat = 0.0
+        self._suspect: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        """Start monitoring the running loop (call from a coroutine on it)."""
+        if self._task is not None or not LOOP_MONITOR:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._task = self._loop.create_task(self._heartbeat())
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name=_WATCHDOG_NAME, daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            before = self._beat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - before - self.interval)
+            suspect, self._suspect = self._suspect, None
+            metrics.LOOP_LAG.observe(lag)
+            if lag >= self.threshold:
+                self._record(lag, suspect if suspect and suspect["beat"] == before else None)
+
+    def _watch(self):
+        period = min(self.interval, self.threshold / 2)
+        while not self._stop.wait(period):
+            beat = self._beat
+            if self._suspect is not None or time.perf_counter() - beat < self.interval + self.threshold:
+                continue
+            # The loop is blocked right now: see what it is running
+            task = asyncio.current_task(self._loop)
+            frame = sys._current_frames().get(self._loop_thread)
+            self._suspect = {
+                "beat": beat,
+                "route": _route(self.requests.get(task)),
+                "where": _where(frame) if frame is not None else [],
+            }
+
+    def _record(self, lag: float, suspect: Optional[Dict[str, Any]]):
+        route = suspect["route"] if suspect else "<unknown>"
+        lag_ms = round(lag * 1000, 1)
+        stall = {
+            "at": time.time(),
+            "lag_ms": lag_ms,
+            "route": route,
+            "where": suspect["where"] if suspect else [],
+            "in_flight": len(self.requests),
+        }
+        self.stalls.append(stall)
+        self.stats["stalls"] += 1
+        self.stats["stalled_ms"] = round(self.stats["stalled_ms"] + lag_ms, 1)
+        self.stats["max_lag_ms"] = max(self.stats["max_lag_ms"], lag_ms)
+        metrics.LOOP_STALLS.inc(route)
+        metrics.LOOP_STALL_SECONDS.inc(route, value=lag)
+        at = f" at {stall['where'][0]}" if stall["where"] else ""
+        print(f"⚠️  Event loop blocked {lag_ms} ms by {route}{at}")
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "threshold_ms": self.threshold * 1000,
+            **self.stats,
+            "recent": list(self.stalls)[-10:],
+        }
+
+
+loop_monitor = LoopMonitor()
+
+
+class LoopMonitorMiddleware:
+    """Pure ASGI middleware: maps each request's task to its scope for stall reports."""
+
+    def __init__(self, app, monitor: LoopMonitor = loop_monitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.monitor.running:
+            return await self.app(scope, receive, send)
+        task = asyncio.current_task()
+        self.monitor.requests[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.requests.pop(task, None)
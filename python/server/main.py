@@ -1,17 +1,32 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from server.overlay_routes import router as overlay_router
 from server.apps_routes import router as apps_router
 from server.pdf_routes import router as pdf_router
 from server.ai_routes import router as ai_router
 from server.admin_routes import router as admin_router
+from server.job_routes import router as job_router
+from server.blob_routes import router as blob_router
+from server.jobs import start_workers, stop_workers
+from server.warmup import start_background_warmup
+from server.form_index import form_index
+from server import metrics
+from server.profiling import ProfilingMiddleware
+from server.loop_monitor import LoopMonitorMiddleware, loop_monitor
+from server.uploads import UploadLimitMiddleware
+from server.json_codec import FastJSONResponse
 from dotenv import load_dotenv
 import os
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="MEHKO AI Unified Backend", version="2.0")
+app = FastAPI(title="MEHKO AI Unified Backend", version="2.0", default_response_class=FastJSONResponse)
+
+# Refuse oversized uploads (UPLOAD_MAX_BYTES); added before CORS so its 413 carries CORS headers
+app.add_middleware(UploadLimitMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,15 +39,75 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # the Field Mapper sends it back as If-Match
 )
 
+# Maps request tasks to routes, so event-loop stalls name the route that caused them
+app.add_middleware(LoopMonitorMiddleware)
+
+# Opt-in request profiling (X-Profile / ?profile= with PROFILE_TOKEN, or slow-request sampling)
+app.add_middleware(ProfilingMiddleware)
+
+# Outermost, so latency and sizes cover the whole stack
+app.add_middleware(metrics.MetricsMiddleware, routes=app.router.routes)
+
 # Unified routers for all services (Caddy strips /api prefix)
 app.include_router(apps_router, prefix="/apps")          # /apps/... (after Caddy strips /api)
 app.include_router(overlay_router, prefix="")            # /fill-pdf, etc. (after Caddy strips /api)
 app.include_router(pdf_router, prefix="")                # /extract-pdf-content (after Caddy strips /api)
 app.include_router(ai_router, prefix="")                 # /ai-chat, /ai-analyze-pdf, etc. (after Caddy strips /api)
 app.include_router(admin_router, prefix="")              # /admin/process-county, etc. (after Caddy strips /api)
+app.include_router(job_router, prefix="")                # /jobs/{id}, /jobs/{id}/events (after Caddy strips /api)
+app.include_router(blob_router, prefix="")               # /blobs, /blobs/{sha} (after Caddy strips /api)
+
+@app.on_event("startup")
+def start_job_workers():
+    # Only one uvicorn worker per host gets the pool (file lock in server.jobs)
+    start_workers()
+
+@app.on_event("startup")
+def warm_up_dependencies():
+    # Heavy imports and clients are lazy; load them in the background (STARTUP_WARMUP=0 to skip)
+    start_background_warmup()
+
+@app.on_event("startup")
+def build_form_index():
+    # App/form/artifact index shared by all routes, kept current by a watcher thread
+    form_index.start()
+
+@app.on_event("startup")
+def start_metrics():
+    from server.ai_cache import answer_cache
+    from server.blob_store import blob_store
+    from server.firestore_store import applications
+
+    metrics.register_cache("pdf_derived", lambda: (blob_store.stats["derived_hits"], blob_store.stats["derived_misses"]))
+    metrics.register_cache("application", lambda: (applications.stats["hits"], applications.stats["misses"]))
+    metrics.register_cache("ai_answer", lambda: (answer_cache.hits + answer_cache.coalesced, answer_cache.misses))
+    metrics.start_flusher()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    # Heartbeat on this worker's loop plus a watchdog thread (LOOP_MONITOR=0 to disable)
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    from server import aio
+    stop_workers()
+    form_index.stop()
+    aio.shutdown()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    await loop_monitor.stop()
 
 @app.get("/health")
 def health():
     return {"ok": True}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Prometheus text format, merged across uvicorn workers
+    body = await asyncio.to_thread(metrics.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,342 @@
+"""
+Prometheus metrics, aggregated across uvicorn workers.
+
+Each process records into an in-memory registry and flushes a snapshot to
+``METRICS_DIR/<ppid>-<pid>.json`` every ``METRICS_FLUSH_SECONDS`` (and on
+exit). ``GET /metrics`` flushes the serving worker, then merges the
+snapshots of every worker of the same uvicorn master (same parent pid):
+counters and histograms are summed, including those of workers that have
+since exited, and gauges are summed over live workers only. Snapshots left by
+a previous master are deleted, so a restart starts from zero, which
+Prometheus treats as a counter reset.
+
+Recorded:
+
+- ``http_*``: per-route latency, request/response size, in-flight requests
+  and status counts (``MetricsMiddleware``; routes are labelled by template).
+- ``pdf_stage_duration_seconds``: PDF pipeline stages (``overlay.timing``).
+- ``cache_lookups_total`` / ``cache_hit_ratio``: from ``register_cache``.
+- ``event_loop_*``: loop lag and stalls by route (``server.loop_monitor``).
+"""
+
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+from overlay import timing
+from server.paths import DATA
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").strip().lower() in ("1", "true", "yes", "on")
+METRICS_DIR = Path(os.getenv("METRICS_DIR", str(DATA / "metrics")))
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+Labels = Tuple[str, ...]
+
+
+class Metric:
+    def __init__(self, name: str, kind: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = ()):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values: Dict[Labels, object] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, value: float = 1.0):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0.0) + value
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self.values[labels] = value
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            h = self.values.get(labels)
+            if h is None:
+                # Per-bucket (non-cumulative) counts, +Inf last, then sum
+                h = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    h[i] += 1
+                    break
+            else:
+                h[len(self.buckets)] += 1
+            h[-1] += value
+
+    def dump(self) -> List[list]:
+        with self._lock:
+            return [[list(k), list(v) if isinstance(v, list) else v] for k, v in self.values.items()]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.caches: Dict[str, Callable[[], Tuple[int, int]]] = {}
+
+    def add(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Metric:
+        return self.add(Metric(name, "counter", help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Metric:
+        return self.add(Metric(name, "gauge", help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]) -> Metric:
+        return self.add(Metric(name, "histogram", help, labels, buckets))
+
+    def snapshot(self) -> Dict[str, object]:
+        for cache, stats in list(self.caches.items()):
+            try:
+                hits, misses = stats()
+            except Exception:
+                continue
+            CACHE_LOOKUPS.set(float(hits), cache, "hit")
+            CACHE_LOOKUPS.set(float(misses), cache, "miss")
+        return {"pid": os.getpid(), "written": time.time(),
+                "metrics": {name: m.dump() for name, m in self.metrics.items()}}
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter("http_requests_total", "HTTP requests", ("method", "route", "status"))
+HTTP_LATENCY = registry.histogram("http_request_duration_seconds", "HTTP request latency",
+                                  ("method", "route"), LATENCY_BUCKETS)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests being served", ("method", "route"))
+HTTP_REQUEST_SIZE = registry.histogram("http_request_size_bytes", "HTTP request body size",
+                                       ("method", "route"), SIZE_BUCKETS)
+HTTP_RESPONSE_SIZE = registry.histogram("http_response_size_bytes", "HTTP response body size",
+                                        ("method", "route"), SIZE_BUCKETS)
+PDF_STAGE = registry.histogram("pdf_stage_duration_seconds", "PDF pipeline stage duration",
+                               ("stage", "field_type"), STAGE_BUCKETS)
+CACHE_LOOKUPS = registry.counter("cache_lookups_total", "Cache lookups by result", ("cache", "result"))
+LOOP_LAG = registry.histogram("event_loop_lag_seconds", "Event loop scheduling delay", (), LAG_BUCKETS)
+LOOP_STALLS = registry.counter("event_loop_stalls_total", "Event loop stalls over the threshold", ("route",))
+LOOP_STALL_SECONDS = registry.counter("event_loop_stall_seconds_total", "Time the event loop was stalled", ("route",))
+
+
+def register_cache(name: str, stats: Callable[[], Tuple[int, int]]):
+    """Export a cache's ``(hits, misses)`` as ``cache_lookups_total`` and ``cache_hit_ratio``."""
+    registry.caches[name] = stats
+
+
+def _record_stage(stage: str, seconds: float, field_type: str):
+    PDF_STAGE.observe(seconds, stage, field_type)
+
+
+def timer(stage: str):
+    """Time a PDF stage from server code, e.g. ``with metrics.timer("preview.render")``."""
+    return timing.timed(stage)
+
+
+# --- multiprocess snapshots ---
+def _snapshot_path(pid: int = None) -> Path:
+    return METRICS_DIR / f"{os.getppid()}-{pid or os.getpid()}.json"
+
+
+def flush():
+    if not METRICS_ENABLED:
+        return
+    METRICS_DIR.mkdir(parents=True, exist_ok=True)
+    path = _snapshot_path()
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(registry.snapshot()))
+    os.replace(tmp, path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _load_snapshots() -> List[Tuple[bool, Dict[str, object]]]:
+    """(alive, snapshot) for every worker of this master; removes other masters' files."""
+    generation = f"{os.getppid()}-"
+    found = []
+    for path in METRICS_DIR.glob("*.json"):
+        try:
+            snap = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        alive = _alive(int(snap.get("pid", 0)))
+        if not path.name.startswith(generation):
+            if not alive:
+                path.unlink(missing_ok=True)
+            continue
+        found.append((alive, snap))
+    return found
+
+
+def _merge(snapshots: List[Tuple[bool, Dict[str, object]]]) -> Dict[str, Dict[Labels, object]]:
+    merged: Dict[str, Dict[Labels, object]] = {name: {} for name in registry.metrics}
+    for alive, snap in snapshots:
+        for name, rows in snap.get("metrics", {}).items():
+            metric = registry.metrics.get(name)
+            if metric is None or (metric.kind == "gauge" and not alive):
+                continue
+            into = merged[name]
+            for labels, value in rows:
+                key = tuple(labels)
+                if isinstance(value, list):
+                    prev = into.get(key)
+                    into[key] = value if prev is None or len(prev) != len(value) else [a + b for a, b in zip(prev, value)]
+                else:
+                    into[key] = into.get(key, 0.0) + value
+    return merged
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not float(v).is_integer() else str(int(v))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render() -> str:
+    """Prometheus text exposition of all workers' metrics."""
+    flush()
+    merged = _merge(_load_snapshots() if METRICS_ENABLED else [(True, registry.snapshot())])
+    lines = []
+    for name, metric in registry.metrics.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(merged[name].items()):
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_labels(metric.labels, key)} {_fmt(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, math.inf), value[:-1]):
+                cumulative += count
+                le = 'le="%s"' % _fmt(bound)
+                lines.append(f"{name}_bucket{_labels(metric.labels, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labels, key)} {_fmt(value[-1])}")
+            lines.append(f"{name}_count{_labels(metric.labels, key)} {cumulative}")
+    # Derived: hit ratio per cache, from the summed lookups
+    lines.append("# HELP cache_hit_ratio Cache hits / lookups")
+    lines.append("# TYPE cache_hit_ratio gauge")
+    lookups: Dict[str, Dict[str, float]] = {}
+    for (cache, result), value in merged["cache_lookups_total"].items():
+        lookups.setdefault(cache, {})[result] = value
+    for cache, counts in sorted(lookups.items()):
+        total = counts.get("hit", 0) + counts.get("miss", 0)
+        if total:
+            lines.append(f'cache_hit_ratio{{cache="{cache}"}} {counts.get("hit", 0) / total:.4f}')
+    return "\n".join(lines) + "\n"
+
+
+_flusher: Optional[threading.Thread] = None
+
+
+def start_flusher():
+    """Flush this process's snapshot periodically and at exit."""
+    global _flusher
+    if not METRICS_ENABLED or _flusher is not None:
+        return
+
+    def loop():
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            try:
+                flush()
+            except OSError as e:
+                print(f"⚠️  Metrics flush failed: {e}")
+
+    _flusher = threading.Thread(target=loop, name="metrics-flush", daemon=True)
+    _flusher.start()
+    atexit.register(flush)
+
+
+# --- HTTP middleware ---
+class MetricsMiddleware:
+    """Pure ASGI middleware (does not buffer streaming responses)."""
+
+    MAX_ROUTE_CACHE = 4096
+
+    def __init__(self, app, routes: Sequence = ()):
+        self.app = app
+        self.routes = routes
+        self._route_cache: Dict[Tuple[str, str], str] = {}
+
+    def _route(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        route = self._route_cache.get(key)
+        if route is None:
+            route = "<unmatched>"
+            for r in self.routes:
+                match, _ = r.matches(scope)
+                if match == Match.FULL:
+                    route = r.path
+                    break
+                if match == Match.PARTIAL and route == "<unmatched>":
+                    route = r.path
+            if len(self._route_cache) >= self.MAX_ROUTE_CACHE:
+                self._route_cache.clear()
+            self._route_cache[key] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        route = self._route(scope)
+        sizes = {"in": 0, "out": 0}
+        status = {"code": 500}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["in"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["out"] += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method, route)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            HTTP_IN_FLIGHT.inc(method, route, value=-1.0)
+            HTTP_LATENCY.observe(time.perf_counter() - t0, method, route)
+            HTTP_REQUESTS.inc(method, route, str(status["code"]))
+            HTTP_REQUEST_SIZE.observe(sizes["in"], method, route)
+            HTTP_RESPONSE_SIZE.observe(sizes["out"], method, route)
+
+
+if METRICS_ENABLED:
+    timing.set_recorder(_record_stage)
@@ -1,22 +1,75 @@
-import io, json
-from fastapi import APIRouter, UploadFile, File, Form
-from starlette.responses import StreamingResponse
-from overlay.fill_overlay import fill_pdf_overlay_bytes
+import tempfile
+from pathlib import Path
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from starlette.responses import Response
+
+from server import aio
+from server.blob_routes import check_sha
+from server.blob_store import blob_store
+from server.json_codec import loads
+from server.uploads import UploadRejected, signature_answers, spool_pdf
 
 router = APIRouter(tags=["overlay"])
 
+
+def _use_blob(sha: str) -> bool:
+    if not blob_store.exists(sha):
+        return False
+    blob_store.touch(sha)
+    return True
+
+
 @router.post("/fill-overlay")
 async def fill_overlay(
-    file: UploadFile = File(...),
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    pdf_sha: Optional[str] = Form(None),
     overlay_json: str = Form(...),
     answers_json: str = Form("{}"),
 ):
-    pdf_bytes = await file.read()
-    overlay = json.loads(overlay_json)
-    answers = json.loads(answers_json)
-    out = fill_pdf_overlay_bytes(pdf_bytes, overlay, answers)
-    return StreamingResponse(
-        io.BytesIO(out),
+    """Fill an uploaded PDF (``file``) or a stored one by hash (``pdf_sha``, see ``/blobs``).
+    Signature images may be sent as ``signature:<field id>`` parts."""
+    from overlay.fill_overlay import fill_pdf_overlay_file
+    from overlay.models import Overlay
+    from server.fill_plans import fill_blob
+
+    if (file is None) == (pdf_sha is None):
+        raise HTTPException(400, "send exactly one of file or pdf_sha")
+    try:
+        overlay = Overlay.from_dict(loads(overlay_json))
+        answers = loads(answers_json)
+    except ValueError as e:
+        raise HTTPException(400, f"invalid overlay_json or answers_json: {e}")
+    if not isinstance(answers, dict):
+        raise HTTPException(400, "answers_json must be a JSON object")
+    answers.update(await signature_answers(request))
+
+    spooled = None
+    if pdf_sha is not None:
+        sha = check_sha(pdf_sha)
+        if not await aio.run(_use_blob, sha):
+            raise HTTPException(404, f"unknown pdf_sha {sha}; upload it with POST /blobs")
+        known = True
+    else:
+        # Stream the upload to disk and hand the worker a path, not the bytes
+        try:
+            spooled = await aio.run(spool_pdf, file.file, Path(tempfile.gettempdir()))
+        except UploadRejected as e:
+            raise HTTPException(e.status, str(e))
+        sha = spooled.sha256
+        known = await aio.run(_use_blob, sha)
+    try:
+        if known:
+            # Prepared once per host by hash: a repeated PDF skips the widget pass
+            out = await aio.run_cpu(fill_blob, sha, str(blob_store.path(sha)), overlay, answers)
+        else:
+            out = await aio.run_cpu(fill_pdf_overlay_file, str(spooled.path), overlay, answers)
+    finally:
+        if spooled is not None:
+            await aio.run(spooled.discard)
+    return Response(
+        out,
         media_type="application/pdf",
         headers={"Content-Disposition": "attachment; filename=filled.pdf"},
     )
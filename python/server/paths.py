@@ -0,0 +1,16 @@
+# python/server/paths.py
+from pathlib import Path
+
+# --- Paths ---
+ROOT = Path(__file__).resolve().parents[2]        # repo root
+DATA = ROOT / "data"
+APPS = DATA / "applications"                      # data/applications/<app>/<form>/
+
+def app_dir(app: str) -> Path:
+    return APPS / app
+
+def form_dir(app: str, form: str) -> Path:
+    return app_dir(app) / "forms" / form
+
+def ensure_dir(p: Path):
+    p.mkdir(parents=True, exist_ok=True)
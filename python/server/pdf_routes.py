@@ -1,12 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import requests
-import fitz  # PyMuPDF
-import tempfile
-import os
 import re
 from typing import Optional, Dict, List
 
+from server import aio
+
 router = APIRouter(prefix="/extract-pdf-content", tags=["pdf"])
 
 class PDFExtractionRequest(BaseModel):
@@ -19,62 +17,49 @@ class PDFExtractionResponse(BaseModel):
     key_info: Optional[Dict[str, List[str]]] = None
     error: Optional[str] = None
 
+def _extract_text(pdf_bytes: bytes) -> str:
+    import fitz  # PyMuPDF, deferred to first use
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        extracted_text = ""
+        for page in pdf_document:
+            extracted_text += page.get_text() + "\n"
+    return clean_extracted_text(extracted_text)
+
 @router.post("", response_model=PDFExtractionResponse)
 async def extract_pdf_content(request: PDFExtractionRequest):
+    import httpx
+
     try:
-        # Download the PDF
-        response = requests.get(request.pdf_url, timeout=30)
-        response.raise_for_status()
+        # Download the PDF (async, with a timeout); ValueError here is an oversized body
+        try:
+            content, _ = await aio.fetch(request.pdf_url, timeout=30)
+        except (httpx.HTTPError, ValueError) as e:
+            return PDFExtractionResponse(
+                success=False,
+                error=f"Failed to download PDF: {str(e)}"
+            )
         
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            temp_file.write(response.content)
-            temp_file_path = temp_file.name
+        # Extract and clean the text off the event loop
+        extracted_text = await aio.run(_extract_text, content)
         
-        try:
-            # Extract text using PyMuPDF
-            pdf_document = fitz.open(temp_file_path)
-            extracted_text = ""
-            
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
-                text = page.get_text()
-                extracted_text += text + "\n"
-            
-            pdf_document.close()
-            
-            # Clean up the text
-            extracted_text = clean_extracted_text(extracted_text)
-            
-            if len(extracted_text) < 50:
-                return PDFExtractionResponse(
-                    success=False,
-                    error="Insufficient text extracted from PDF"
-                )
-            
-            # Extract key information if requested
-            key_info = None
-            if request.extract_key_info:
-                key_info = extract_key_information(extracted_text)
-            
+        if len(extracted_text) < 50:
             return PDFExtractionResponse(
-                success=True,
-                text=extracted_text,
-                key_info=key_info
+                success=False,
+                error="Insufficient text extracted from PDF"
             )
-            
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
-    
-    except requests.RequestException as e:
+        
+        # Extract key information if requested
+        key_info = None
+        if request.extract_key_info:
+            key_info = await aio.run(extract_key_information, extracted_text)
+        
         return PDFExtractionResponse(
-            success=False,
-            error=f"Failed to download PDF: {str(e)}"
+            success=True,
+            text=extracted_text,
+            key_info=key_info
         )
+    
     except Exception as e:
         return PDFExtractionResponse(
             success=False,
@@ -0,0 +1,282 @@
+"""
+On-demand sampling profiles of single requests.
+
+A request is profiled when it carries ``X-Profile: <PROFILE_TOKEN>`` or
+``?profile=<PROFILE_TOKEN>`` (disabled while the token is unset), or
+automatically: a ``PROFILE_SLOW_RATE`` fraction of requests are armed, and
+sampling starts once one of them has run ``PROFILE_SLOW_MS`` without
+finishing, so fast requests cost nothing. Slow captures are kept only if
+the request ends up over the threshold.
+
+A single sampler thread walks ``sys._current_frames()`` every
+``PROFILE_INTERVAL_MS``:
+
+- wall: stacks of every thread that is not parked in a selector, lock or
+  queue wait (event loop and threadpool alike);
+- cpu: stacks of threads whose on-CPU time moved since the previous sample
+  (``/proc/self/task/<tid>/schedstat``, Linux only).
+
+Sampling is process-wide, so work from concurrent requests on the same
+worker can appear; ``concurrent`` in the metadata says how many there were.
+Profiles are written to ``PROFILE_DIR/<id>.json`` with folded stacks
+(flamegraph.pl / speedscope compatible) and listed by ``/admin/profiles``.
+"""
+
+import json
+import os
+import random
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from server.paths import DATA, ROOT
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(DATA / "profiles")))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "2000"))
+PROFILE_SLOW_RATE = float(os.getenv("PROFILE_SLOW_RATE", "0"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+# Innermost frames of a parked thread
+_IDLE = {
+    ("selectors.py", "select"), ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("socket.py", "accept"), ("selectors.py", "poll"),
+}
+_SAMPLER_NAME = "profile-sampler"
+# Background service threads: recorded in the cpu profile if they run, never in wall
+_BACKGROUND = {"form-index", "metrics-flush", "warmup", "loop-watchdog"}
+_STDLIB = sysconfig.get_paths()["stdlib"]
+
+
+def _label(code) -> str:
+    path = code.co_filename
+    marker = path.rfind("site-packages/")
+    if marker >= 0:
+        path = path[marker + len("site-packages/"):]
+    elif path.startswith(str(ROOT)):
+        path = path[len(str(ROOT)) + 1:]
+    elif path.startswith(_STDLIB):
+        path = path[len(_STDLIB) + 1:]
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def _stack(frame) -> List[str]:
+    names = []
+    while frame is not None:
+        names.append(_label(frame.f_code))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+def _idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE
+
+
+def _cpu_ns(native_id: int) -> Optional[int]:
+    try:
+        with open(f"/proc/self/task/{native_id}/schedstat") as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Capture:
+    def __init__(self, trigger: str, start_after: float = 0.0):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.trigger = trigger
+        self.started = time.perf_counter()
+        self.start_after = self.started + start_after
+        self.wall: Counter = Counter()
+        self.cpu: Counter = Counter()
+        self.samples = 0
+
+    @property
+    def active(self) -> bool:
+        return time.perf_counter() >= self.start_after
+
+
+class Sampler:
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self._captures: Dict[str, Capture] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._cpu: Dict[int, int] = {}
+
+    def add(self, capture: Capture):
+        with self._lock:
+            self._captures[capture.id] = capture
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=_SAMPLER_NAME, daemon=True)
+                self._thread.start()
+
+    def remove(self, capture: Capture):
+        with self._lock:
+            self._captures.pop(capture.id, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                captures = [c for c in self._captures.values() if c.active]
+                if not self._captures:
+                    self._thread = None
+                    self._cpu.clear()
+                    return
+            if captures:
+                self._sample(captures)
+            time.sleep(self.interval)
+
+    def _sample(self, captures: List[Capture]):
+        threads = {t.ident: t for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            thread = threads.get(ident)
+            if thread is None or thread.name == _SAMPLER_NAME:
+                continue
+            cpu = _cpu_ns(thread.native_id) if thread.native_id else None
+            idle = _idle(frame)
+            # On CPU since the last sample and still running (a parked stack is not what ran)
+            ran = not idle and cpu is not None and cpu > self._cpu.get(ident, cpu)
+            if cpu is not None:
+                self._cpu[ident] = cpu
+            busy = not idle and thread.name not in _BACKGROUND
+            if not (busy or ran):
+                continue
+            stack = ";".join([f"thread:{thread.name}", *_stack(frame)])
+            for c in captures:
+                if busy:
+                    c.wall[stack] += 1
+                if ran:
+                    c.cpu[stack] += 1
+        for c in captures:
+            c.samples += 1
+
+
+sampler = Sampler()
+
+
+def has_token(scope) -> bool:
+    """True when the request carries ``PROFILE_TOKEN`` (``X-Profile`` or ``?profile=``).
+    Also guards ``/admin/profiles``."""
+    if not PROFILE_TOKEN:
+        return False
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile" and value.decode("latin-1") == PROFILE_TOKEN:
+            return True
+    query = scope.get("query_string", b"").decode("latin-1")
+    return f"profile={PROFILE_TOKEN}" in query.split("&")
+
+
+def _save(capture: Capture, meta: Dict[str, Any]) -> Path:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / f"{capture.id}.json"
+    doc = {
+        "meta": meta,
+        "wall": dict(capture.wall.most_common()),
+        "cpu": dict(capture.cpu.most_common()),
+    }
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(doc))
+    os.replace(tmp, path)
+    old = sorted(PROFILE_DIR.glob("*.json"))[:-PROFILE_MAX_FILES] if PROFILE_MAX_FILES > 0 else []
+    for p in old:
+        p.unlink(missing_ok=True)
+    return path
+
+
+def list_profiles(limit: int = 100) -> List[Dict[str, Any]]:
+    """Metadata of stored profiles, newest first."""
+    out = []
+    for path in sorted(PROFILE_DIR.glob("*.json"), reverse=True)[:limit]:
+        try:
+            out.append(json.loads(path.read_text())["meta"])
+        except (OSError, ValueError, KeyError):
+            continue
+    return out
+
+
+def load_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    path = PROFILE_DIR / f"{Path(profile_id).name}.json"
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def folded(profile: Dict[str, Any], kind: str = "wall") -> str:
+    """Brendan Gregg's folded-stack format: ``frame;frame;frame count``."""
+    return "".join(f"{stack} {count}\n" for stack, count in profile.get(kind, {}).items())
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware; adds ``X-Profile-Id`` to profiled responses."""
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if has_token(scope) and not scope["path"].startswith("/admin/profiles"):  # there it is the credential
+            capture = Capture("request")
+        elif PROFILE_SLOW_RATE > 0 and random.random() < PROFILE_SLOW_RATE:
+            capture = Capture("slow", start_after=PROFILE_SLOW_MS / 1000)
+        else:
+            self.in_flight += 1
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                self.in_flight -= 1
+
+        status = {"code": 500}
+
+        async def tagging_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if capture.trigger == "request":
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"x-profile-id", capture.id.encode())]}
+            await send(message)
+
+        concurrent = self.in_flight
+        self.in_flight += 1
+        sampler.add(capture)
+        cpu0 = time.process_time()
+        try:
+            await self.app(scope, receive, tagging_send)
+        finally:
+            self.in_flight -= 1
+            sampler.remove(capture)
+            duration_ms = (time.perf_counter() - capture.started) * 1000
+            if capture.trigger == "request" or duration_ms >= PROFILE_SLOW_MS:
+                route = scope.get("route")
+                params = scope.get("path_params", {})
+                meta = {
+                    "id": capture.id,
+                    "trigger": capture.trigger,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "app": params.get("app"),
+                    "form": params.get("form"),
+                    "status": status["code"],
+                    "duration_ms": round(duration_ms, 1),
+                    "process_cpu_ms": round((time.process_time() - cpu0) * 1000, 1),
+                    "samples": capture.samples,
+                    "interval_ms": sampler.interval * 1000,
+                    "concurrent": concurrent,
+                    "pid": os.getpid(),
+                    "at": time.time(),
+                }
+                try:
+                    _save(capture, meta)
+                except OSError as e:
+                    print(f"⚠️  Could not save profile {capture.id}: {e}")
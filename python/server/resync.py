@@ -0,0 +1,258 @@
+"""
+Incremental re-sync of county PDFs.
+
+Every form's ``meta.json`` records the ``etag``, ``lastModified`` and
+``sha256`` of the PDF it was built from. Re-sync revalidates every PDF step
+with a conditional GET (``If-None-Match`` / ``If-Modified-Since``) at bounded
+concurrency. A 304, or a 200 with the same sha256, leaves the form untouched.
+A changed PDF is stored under its new hash (so caches derived from it start
+fresh), fields are re-detected, and templates are regenerated unless they
+were edited in the mapper. The result is a change report.
+
+    cd python && python -m server.resync [--app ID] [--dry-run] [--origin http://127.0.0.1:8090]
+
+``--origin`` sends every request to a local stand-in (see
+``loadtest.pdf_origin``) instead of the county hosts.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from server import aio
+from server.blob_store import blob_store, form_pdf_hash, store_form_pdf
+from server.ingest import (
+    DOWNLOAD_CONCURRENCY, DOWNLOAD_RETRIES, DOWNLOAD_TIMEOUT, RETRY_STATUS,
+    FormResult, _retry_delay, detect_forms, valid_pdf_steps, write_form_files,
+)
+from server.jobs import JobProgress, handler
+from server.paths import form_dir
+
+AUTO_SOURCES = {"existing_pdf_fields", "auto_generated_template", "fallback_template"}
+
+
+@dataclass
+class SyncItem:
+    app_id: str
+    step: Dict[str, Any]
+    meta: Dict[str, Any]
+    url: str
+    status: str = "pending"  # unchanged | not_modified | changed | new | failed
+    error: Optional[str] = None
+    result: Optional[FormResult] = None
+    old_sha: Optional[str] = None
+    templates: Optional[str] = None  # regenerated | kept
+    elapsed_ms: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        out = {"app": self.app_id, "formId": self.step["formId"], "status": self.status,
+               "elapsed_ms": round(self.elapsed_ms, 1)}
+        if self.status in ("changed", "new"):
+            out.update(old_sha256=self.old_sha, sha256=self.result.sha256, bytes=len(self.result.content),
+                       templates=self.templates)
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+def _read_meta(app_id: str, form_id: str) -> Dict[str, Any]:
+    try:
+        return json.loads((form_dir(app_id, form_id) / "meta.json").read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _rewrite(url: str, origin: Optional[str]) -> str:
+    if not origin:
+        return url
+    o, u = urlsplit(origin), urlsplit(url)
+    return urlunsplit((o.scheme, o.netloc, u.path, u.query, ""))
+
+
+def plan(counties: List[Dict[str, Any]], origin: Optional[str] = None) -> List[SyncItem]:
+    items = []
+    for county in counties:
+        for step in valid_pdf_steps(county):
+            meta = _read_meta(county["id"], step["formId"])
+            # A changed pdfUrl invalidates the stored validators
+            if meta.get("pdfUrl") != step["pdfUrl"]:
+                meta = {k: v for k, v in meta.items() if k not in ("etag", "lastModified")}
+            items.append(SyncItem(county["id"], step, meta, _rewrite(step["pdfUrl"], origin)))
+    return items
+
+
+async def _revalidate(client: httpx.AsyncClient, sem: asyncio.Semaphore, item: SyncItem, retries: int):
+    headers = {}
+    if item.meta.get("etag"):
+        headers["If-None-Match"] = item.meta["etag"]
+    if item.meta.get("lastModified"):
+        headers["If-Modified-Since"] = item.meta["lastModified"]
+    item.old_sha = await aio.run(form_pdf_hash, item.app_id, item.step["formId"]) or item.meta.get("sha256")
+
+    async with sem:
+        t0 = time.perf_counter()
+        for attempt in range(retries + 1):
+            response = None
+            try:
+                response = await client.get(item.url, headers=headers)
+                if response.status_code == 304:
+                    item.status, item.error = "not_modified", None
+                    break
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    result = FormResult(step=item.step, content=response.content, attempts=attempt + 1)
+                    result.sha256 = hashlib.sha256(result.content).hexdigest()
+                    result.etag = response.headers.get("etag")
+                    result.last_modified = response.headers.get("last-modified")
+                    item.result, item.error = result, None
+                    if item.old_sha is None:
+                        item.status = "new"
+                    else:
+                        item.status = "unchanged" if result.sha256 == item.old_sha else "changed"
+                    break
+                item.status, item.error = "failed", f"HTTP {response.status_code}"
+            except httpx.HTTPStatusError as e:
+                item.status, item.error = "failed", str(e)
+                break
+            except httpx.TransportError as e:
+                item.status, item.error = "failed", f"{type(e).__name__}: {e}"
+            if attempt < retries:
+                await asyncio.sleep(_retry_delay(attempt, response))
+        item.elapsed_ms = (time.perf_counter() - t0) * 1000
+
+
+def _templates_edited(app_id: str, form_id: str) -> bool:
+    """True when the mapper changed the templates since they were generated."""
+    path = form_dir(app_id, form_id)
+    try:
+        definition = json.loads((path / "acroform-definition.json").read_text())
+        overlay = json.loads((path / "overlay.json").read_text())
+    except (OSError, ValueError):
+        return False
+    return definition.get("source") not in AUTO_SOURCES or overlay.get("fields") != definition.get("fields")
+
+
+def _update_meta(item: SyncItem):
+    """Record fresh validators for a form whose content did not change."""
+    meta = dict(item.meta)
+    if item.result is not None:
+        meta.update(etag=item.result.etag, lastModified=item.result.last_modified, sha256=item.result.sha256)
+    elif item.old_sha:
+        meta["sha256"] = item.old_sha
+    for key, value in (("id", item.step["formId"]), ("title", item.step.get("title")), ("type", "pdf"),
+                       ("appId", item.app_id), ("stepId", item.step.get("id"))):
+        meta.setdefault(key, value)
+    meta.update(pdfUrl=item.step["pdfUrl"], syncedAt=time.time())
+    (form_dir(item.app_id, item.step["formId"]) / "meta.json").write_text(json.dumps(meta, indent=2, default=str))
+
+
+def _apply(item: SyncItem):
+    app_id, form_id = item.app_id, item.step["formId"]
+    if item.status == "new" or not _templates_edited(app_id, form_id):
+        # meta.json keeps its original createdAt
+        write_form_files(app_id, item.result, item.meta.get("createdAt", time.time()))
+        item.templates = "regenerated"
+    else:
+        store_form_pdf(app_id, form_id, item.result.content)
+        item.templates = "kept"
+        _update_meta(item)
+
+
+def apply_changes(items: List[SyncItem], progress: Optional[JobProgress] = None):
+    """Write changed forms and fresh validators (blocking: run it in a thread),
+    then release the blobs the changed forms no longer use."""
+    replaced = set()
+    for item in items:
+        try:
+            if item.status in ("changed", "new"):
+                _apply(item)
+                if item.old_sha and item.old_sha != item.result.sha256:
+                    replaced.add(item.old_sha)
+            elif item.status in ("unchanged", "not_modified"):
+                _update_meta(item)
+        except Exception as e:
+            item.status, item.error = "failed", f"failed to apply: {e}"
+        if progress is not None:
+            progress.event("synced", {"app": item.app_id, "formId": item.step["formId"], "status": item.status})
+    if replaced:
+        referenced = blob_store.referenced()
+        for sha in replaced:
+            blob_store.release(sha, referenced)
+
+
+async def resync(
+    counties: List[Dict[str, Any]],
+    concurrency: int = DOWNLOAD_CONCURRENCY,
+    retries: int = DOWNLOAD_RETRIES,
+    timeout: float = DOWNLOAD_TIMEOUT,
+    dry_run: bool = False,
+    origin: Optional[str] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+    progress: Optional[JobProgress] = None,
+) -> Dict[str, Any]:
+    """Revalidate every PDF step of ``counties`` and apply the changes; returns the report."""
+    started = time.perf_counter()
+    items = await aio.run(plan, counties, origin)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, follow_redirects=True, transport=transport) as client:
+        await asyncio.gather(*(_revalidate(client, sem, item, retries) for item in items))
+
+    changed = [i for i in items if i.status in ("changed", "new")]
+    if not dry_run:
+        await detect_forms([i.result for i in changed])
+        await aio.run(apply_changes, items, progress)
+
+    counts: Dict[str, int] = {}
+    for item in items:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    return {
+        "dry_run": dry_run,
+        "checked": len(items),
+        "counts": counts,
+        "bytes_downloaded": sum(len(i.result.content) for i in items if i.result is not None),
+        "changes": [i.summary() for i in items if i.status in ("changed", "new", "failed")],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _counties(app_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    from server.catalog_store import get_catalog
+    catalog = get_catalog()
+    if app_id:
+        county = catalog.get(app_id)
+        return [county] if county else []
+    return catalog.list()
+
+
+@handler("resync")
+async def resync_job(payload: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    report = await resync(await aio.run(_counties, payload.get("app")), dry_run=bool(payload.get("dry_run")),
+                          origin=payload.get("origin"), progress=progress)
+    progress.done("resync", {"counts": report["counts"]})
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Revalidate county PDFs and re-process changed forms")
+    parser.add_argument("--app", help="only this county id")
+    parser.add_argument("--dry-run", action="store_true", help="report changes without writing")
+    parser.add_argument("--origin", help="send all requests to this base URL (local stand-in)")
+    parser.add_argument("--concurrency", type=int, default=DOWNLOAD_CONCURRENCY)
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(resync(_counties(args.app), concurrency=args.concurrency,
+                                dry_run=args.dry_run, origin=args.origin))
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,157 @@
+"""
+Zero-copy reads of cached artifacts, shared by every process on the host.
+
+Derived artifacts (page renders, text, page sizes, prepared fill PDFs) are
+files, content-addressed by their PDF's sha256. A process maps each file it
+reads once, read-only, and hands out ``memoryview``s of the mapping: no
+``read()`` copy, and no private copy per process. All uvicorn workers and PDF
+worker processes map the same page-cache pages, so an artifact is in memory
+once per host however many processes use it. Starlette sends a
+``memoryview`` body as it is, and PyMuPDF opens one without copying it.
+
+A cached file is never rewritten in place, since a changed PDF has a new hash.
+It is only removed (``invalidate_derived``, ``gc``). Removal bumps a counter
+in a small file that every process maps (``.epoch``). Before each lookup a
+reader compares that counter with the epoch its mappings were made in. This is
+one memory read, no syscall. When the counter has moved, the reader drops
+its mappings, so deleted files are released and re-read from disk. No
+messages pass between processes.
+
+    view = cache.get(path, compute)      # memoryview; compute() -> bytes on a miss
+    cache.invalidate()                   # after removing files, in any process
+    with open_mapped(path) as f: ...     # file object over a private mapping (PyPDF2)
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+# Mappings kept open per process. Bytes are address space only (the pages are the shared
+# page cache); entries bound open descriptors, as each mapping holds a dup of its file's
+SHARED_CACHE_MAX_BYTES = int(float(os.getenv("SHARED_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "256"))
+
+_EPOCH = struct.Struct("<Q")
+_EMPTY = memoryview(b"")
+
+
+def atomic_write(path: Path, data: bytes):
+    """Write ``data`` to ``path`` by rename, so readers see all of it or none."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def open_mapped(path: Path) -> mmap.mmap:
+    """``path`` as a read-only file object (``read``/``seek``/``tell``) over a
+    mapping of its own, for readers that want a stream rather than a buffer.
+    Reads come from the page cache, with no copy of the whole file."""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class SharedCache:
+    def __init__(self, epoch_path: Path, max_bytes: int = SHARED_CACHE_MAX_BYTES,
+                 max_entries: int = SHARED_CACHE_MAX_ENTRIES):
+        self.epoch_path = Path(epoch_path)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._maps: "OrderedDict[str, memoryview]" = OrderedDict()
+        self._mapped = 0
+        self._epoch_map: Optional[mmap.mmap] = None
+        self._seen = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "maps": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    # --- shared epoch ---
+    def _epoch(self) -> mmap.mmap:
+        if self._epoch_map is None:
+            self.epoch_path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.epoch_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.fstat(fd).st_size < _EPOCH.size:
+                    os.ftruncate(fd, _EPOCH.size)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                epoch_map = mmap.mmap(fd, _EPOCH.size, access=mmap.ACCESS_WRITE)
+            finally:
+                os.close(fd)
+            self._seen = _EPOCH.unpack_from(epoch_map)[0]
+            self._epoch_map = epoch_map
+        return self._epoch_map
+
+    @property
+    def epoch(self) -> int:
+        return _EPOCH.unpack_from(self._epoch())[0]
+
+    def _sync(self):
+        current = self.epoch
+        if current != self._seen:
+            self._drop()
+            self._seen = current
+
+    def invalidate(self):
+        """Make every process drop its mappings (call after removing cached files)."""
+        epoch_map = self._epoch()
+        with open(self.epoch_path, "rb") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            _EPOCH.pack_into(epoch_map, 0, _EPOCH.unpack_from(epoch_map)[0] + 1)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+        with self._lock:
+            self._drop()
+            self.stats["invalidations"] += 1
+
+    def _drop(self):
+        # Views already handed out stay valid: a mapping is unmapped when its last view goes
+        self._maps.clear()
+        self._mapped = 0
+
+    # --- reads ---
+    def view(self, path: Path) -> Optional[memoryview]:
+        """The file at ``path``, mapped; None if it does not exist."""
+        key = str(path)
+        with self._lock:
+            self._sync()
+            view = self._maps.get(key)
+            if view is not None:
+                self._maps.move_to_end(key)
+                self.stats["hits"] += 1
+                return view
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)) if size else _EMPTY
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self.stats["maps"] += 1
+            if len(view) <= self.max_bytes and key not in self._maps:
+                self._maps[key] = view
+                self._mapped += len(view)
+                while self._mapped > self.max_bytes or len(self._maps) > self.max_entries:
+                    _, evicted = self._maps.popitem(last=False)
+                    self._mapped -= len(evicted)
+                    self.stats["evictions"] += 1
+        return view
+
+    def get(self, path: Path, compute: Callable[[], bytes]) -> memoryview:
+        """The file at ``path``, mapped; written from ``compute()`` first if missing."""
+        view = self.view(path)
+        if view is not None:
+            return view
+        with self._lock:
+            self.stats["misses"] += 1
+        data = compute()
+        atomic_write(path, data)
+        view = self.view(path)
+        return view if view is not None else memoryview(data)  # removed meanwhile
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._maps), "mapped_bytes": self._mapped, "epoch": self.epoch, **self.stats}
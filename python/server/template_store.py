@@ -0,0 +1,203 @@
+"""
+Versioned store for a form's templates (``overlay.json`` and
+``acroform-definition.json``).
+
+Each template is kept in memory as an immutable ``TemplateSnapshot``: the
+validated model, its serialised body and its ETag. A save never modifies a
+snapshot. It writes a new file and publishes a new snapshot in its place, so
+a reader takes no lock. It gets the current snapshot or the previous one,
+never a mix.
+
+The files stay the source of truth, and the snapshot remembers which file it
+was built from (inode, mtime, size). A save replaces the file by rename,
+which always gives it a new inode, so one ``stat`` per read tells whether
+another worker, an ingestion job or a hand edit replaced the template. Only
+then is it re-read. No messages pass between workers.
+
+Saves are serialised per form with an ``flock`` that every worker shares.
+Each save writes ``version`` = previous + 1 into the document. The ETag is
+``"<version>-<content digest>"``: the digest stays correct for files written
+without a version (ingestion), and the version says how many saves a
+template has had. A save with ``If-Match`` fails with ``TemplateConflict``
+(412) unless the template is still the one the client read.
+
+    snap = template_store.get(app, form, "overlay")           # None if missing
+    snap = template_store.save(app, form, "overlay", doc, if_match='"3-1a2b..."')
+"""
+
+import fcntl
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from overlay.models import AcroFormDefinition, Overlay
+from server import json_codec
+from server.paths import ensure_dir, form_dir
+
+# Refuse saves without If-Match (once every client sends it)
+TEMPLATE_REQUIRE_IF_MATCH = os.getenv("TEMPLATE_REQUIRE_IF_MATCH", "0").strip().lower() in ("1", "true", "yes", "on")
+
+TEMPLATES = {
+    "overlay": "overlay.json",
+    "acroform_definition": "acroform-definition.json",
+}
+MODELS: Dict[str, Callable[[Dict[str, Any]], Overlay]] = {
+    "overlay": Overlay.from_dict,
+    "acroform_definition": AcroFormDefinition.from_dict,
+}
+LOCK_NAME = ".templates.lock"
+
+Key = Tuple[str, str, str]
+
+
+class TemplateConflict(Exception):
+    """``If-Match`` did not match the current template."""
+
+    def __init__(self, current: Optional["TemplateSnapshot"]):
+        super().__init__("template changed since it was read" if current else "template does not exist")
+        self.current = current
+
+
+class TemplateSnapshot:
+    """One immutable version of a template: its stored ``body`` and validated
+    ``model``, shared by all readers (do not mutate the model)."""
+
+    __slots__ = ("model", "body", "version", "etag", "_stamp")
+
+    def __init__(self, data: Dict[str, Any], model: Overlay, body: bytes, stamp: Tuple[int, int, int]):
+        self.model = model
+        self.body = body
+        version = data.get("version")
+        self.version = version if isinstance(version, int) else 0
+        self.etag = f'"{self.version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+        self._stamp = stamp
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """The document as stored: a fresh copy parsed from ``body`` (fills use ``model``)."""
+        return json_codec.loads(self.body)
+
+    @property
+    def fields(self) -> int:
+        return len(self.model.fields)
+
+
+def _stamp(st: os.stat_result) -> Tuple[int, int, int]:
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def etag_matches(header: Optional[str], etag: Optional[str]) -> bool:
+    """``If-Match`` / ``If-None-Match`` semantics: ``*`` matches any existing template."""
+    if not header or etag is None:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class TemplateStore:
+    def __init__(self):
+        self._snaps: Dict[Key, TemplateSnapshot] = {}
+        self.stats = {"hits": 0, "loads": 0, "saves": 0, "conflicts": 0}
+
+    @staticmethod
+    def path(app: str, form: str, kind: str) -> Path:
+        return form_dir(app, form) / TEMPLATES[kind]
+
+    # --- reads (lock-free) ---
+    def get(self, app: str, form: str, kind: str) -> Optional[TemplateSnapshot]:
+        """The current snapshot, or None if the template does not exist.
+        Raises ``ValueError`` if the file is not a valid template."""
+        key = (app, form, kind)
+        path = self.path(app, form, kind)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._snaps.pop(key, None)
+            return None
+        snap = self._snaps.get(key)
+        if snap is not None and snap._stamp == _stamp(st):
+            self.stats["hits"] += 1
+            return snap
+        return self._load(key, path)
+
+    def _load(self, key: Key, path: Path) -> Optional[TemplateSnapshot]:
+        try:
+            with open(path, "rb") as f:
+                st = os.fstat(f.fileno())
+                body = f.read()
+        except FileNotFoundError:
+            self._snaps.pop(key, None)
+            return None
+        data = json_codec.loads(body)
+        snap = TemplateSnapshot(data, MODELS[key[2]](data), body, _stamp(st))
+        self._snaps[key] = snap
+        self.stats["loads"] += 1
+        return snap
+
+    # --- writes ---
+    @contextmanager
+    def _locked(self, app: str, form: str):
+        directory = form_dir(app, form)
+        ensure_dir(directory)
+        with open(directory / LOCK_NAME, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def save(self, app: str, form: str, kind: str, data: Dict[str, Any],
+             if_match: Optional[str] = None) -> TemplateSnapshot:
+        """Write ``data`` as the next version. With ``if_match``, only if the
+        current ETag matches (``*``: if it exists); raises ``TemplateConflict``.
+        Raises ``ValueError`` if ``data`` is not a valid template."""
+        key = (app, form, kind)
+        path = self.path(app, form, kind)
+        model = MODELS[kind](data)
+        with self._locked(app, form):
+            try:
+                current = self._load(key, path)
+            except ValueError:
+                current = None  # unreadable: only an unconditional save replaces it
+            if if_match is not None and not etag_matches(if_match, current.etag if current else None):
+                self.stats["conflicts"] += 1
+                raise TemplateConflict(current)
+            data = {**data, "version": (current.version if current else 0) + 1}
+            body = json_codec.dumps(data, indent=True, default=str)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(body)
+                f.flush()
+                st = os.fstat(f.fileno())
+            os.replace(tmp, path)
+            snap = TemplateSnapshot(data, model, body, _stamp(st))
+            self._snaps[key] = snap
+            self.stats["saves"] += 1
+            return snap
+
+    def delete(self, app: str, form: str, kind: str, if_match: Optional[str] = None) -> bool:
+        """Remove the template; False if it did not exist."""
+        key = (app, form, kind)
+        path = self.path(app, form, kind)
+        with self._locked(app, form):
+            try:
+                current = self._load(key, path)
+            except ValueError:
+                current = None  # unreadable: only an unconditional delete removes it
+            if if_match is not None and not etag_matches(if_match, current.etag if current else None):
+                self.stats["conflicts"] += 1
+                raise TemplateConflict(current)
+            self._snaps.pop(key, None)
+            if current is None and not path.exists():
+                return False
+            path.unlink(missing_ok=True)
+            return True
+
+    def info(self) -> Dict[str, int]:
+        return {"cached": len(self._snaps), **self.stats}
+
+
+template_store = TemplateStore()
@@ -0,0 +1,317 @@
+"""
+Streaming PDF uploads.
+
+Starlette spools a multipart file part to a ``SpooledTemporaryFile`` (on disk
+past 1 MB). ``spool_pdf`` copies it in ``CHUNK`` pieces to a temporary file
+next to its destination and hashes it along the way, so an upload is never
+held in memory. It enforces ``UPLOAD_MAX_BYTES`` and checks the PDF header,
+the trailer and that PyMuPDF opens it with at least one page. Then
+``store_upload`` adopts the file into the blob store (a hardlink, no copy)
+and atomically replaces ``form.pdf`` with a clone of the blob: concurrent
+fills see the old PDF or the new one, never a partial write.
+
+A hash the store has not seen before has no derived caches yet, so
+``warm_derived`` computes the cheap ones (page sizes, text) in the
+background right after the upload instead of on the first preview.
+
+Fill requests may carry signature images as their own binary parts named
+``signature:<field id>`` (or ``signature:<id>,<id>`` for one image signing
+several fields) instead of base64 data URLs inside ``answers_json``.
+``read_signature_parts`` reads each one in chunks, checks the PNG/JPEG
+header, the PNG dimensions and ``SIGNATURE_MAX_BYTES`` as the bytes arrive,
+and hashes it; the PDF workers cache the placed image by that hash.
+
+``UploadLimitMiddleware`` rejects an upload whose ``Content-Length`` is
+over the cap before the body is read at all.
+"""
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, List
+
+from overlay.signature_utils import SignatureImage, image_kind, png_size
+from server.blob_store import CHUNK, blob_store
+from server.paths import ensure_dir, form_dir
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+# Multipart boundaries and the other form fields on top of the file itself
+_FORM_OVERHEAD = 1024 * 1024
+
+SIGNATURE_PART_PREFIX = "signature:"
+SIGNATURE_MAX_BYTES = int(os.getenv("SIGNATURE_MAX_BYTES", str(2 * 1024 * 1024)))
+SIGNATURE_MAX_PIXELS = int(os.getenv("SIGNATURE_MAX_PIXELS", str(4000 * 1000)))
+_SIGNATURE_CHUNK = 64 * 1024
+
+_PDF_MAGIC = b"%PDF-"
+_EOF_MARKER = b"%%EOF"
+_HEAD = 1024   # the header may follow a few bytes of junk
+_TAIL = 2048   # and the trailer may be followed by some
+
+
+class UploadRejected(ValueError):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class SpooledPdf:
+    path: Path
+    sha256: str
+    size: int
+    pages: int
+
+    def discard(self):
+        self.path.unlink(missing_ok=True)
+
+
+def _tmp_path(directory: Path) -> Path:
+    return directory / f".upload.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _check_pdf(path: Path, head: bytes, tail: bytes) -> int:
+    if _PDF_MAGIC not in head[:_HEAD]:
+        raise UploadRejected("not a PDF (missing %PDF- header)", 415)
+    if _EOF_MARKER not in tail:
+        raise UploadRejected("truncated PDF (missing %%EOF trailer)")
+    import fitz
+
+    try:
+        with fitz.open(path, filetype="pdf") as doc:
+            if doc.needs_pass:
+                raise UploadRejected("PDF is password protected")
+            if doc.page_count < 1:
+                raise UploadRejected("PDF has no pages")
+            return doc.page_count
+    except UploadRejected:
+        raise
+    except Exception:
+        raise UploadRejected("unreadable PDF: PyMuPDF could not open it")
+
+
+def spool_pdf(src: BinaryIO, directory: Path, max_bytes: int = UPLOAD_MAX_BYTES) -> SpooledPdf:
+    """Copy ``src`` to a temporary file in ``directory``, hashing and
+    validating it. Raises ``UploadRejected`` (and leaves nothing behind)."""
+    ensure_dir(directory)
+    tmp = _tmp_path(directory)
+    h = hashlib.sha256()
+    size = 0
+    head = tail = b""
+    try:
+        with open(tmp, "wb") as out:
+            for chunk in iter(lambda: src.read(CHUNK), b""):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(f"upload exceeds {max_bytes} bytes", 413)
+                if len(head) < _HEAD:
+                    head += chunk[:_HEAD - len(head)]
+                tail = (tail + chunk)[-_TAIL:]
+                h.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise UploadRejected("empty upload")
+        pages = _check_pdf(tmp, head, tail)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return SpooledPdf(tmp, h.hexdigest(), size, pages)
+
+
+def store_upload(app: str, form: str, src: BinaryIO, max_bytes: int = UPLOAD_MAX_BYTES):
+    """Stream ``src`` into the blob store as the form's PDF.
+    Returns ``(spooled, new)``: ``new`` if no stored PDF had this hash yet."""
+    dest = form_dir(app, form) / "form.pdf"
+    spooled = spool_pdf(src, dest.parent, max_bytes)
+    try:
+        new = not blob_store.exists(spooled.sha256)
+        blob_store.put_file(spooled.path, spooled.sha256, link=True)
+        blob_store.link(spooled.sha256, dest)
+    finally:
+        spooled.discard()
+    return spooled, new
+
+
+def store_blob(src: BinaryIO, max_bytes: int = UPLOAD_MAX_BYTES):
+    """Stream ``src`` into the blob store without attaching it to a form
+    (``POST /blobs``). Returns ``(spooled, new)`` like ``store_upload``."""
+    spooled = spool_pdf(src, blob_store.root, max_bytes)
+    try:
+        new = not blob_store.exists(spooled.sha256)
+        blob_store.put_file(spooled.path, spooled.sha256, link=True)
+        if not new:
+            blob_store.touch(spooled.sha256)
+    finally:
+        spooled.discard()
+    if new:
+        blob_store.trim(keep={spooled.sha256})
+    return spooled, new
+
+
+# --- signature parts ---
+def read_signature(src: BinaryIO, max_bytes: int = SIGNATURE_MAX_BYTES,
+                   max_pixels: int = SIGNATURE_MAX_PIXELS) -> SignatureImage:
+    """Read one signature part in chunks, rejecting it as soon as its header
+    or size is wrong. Raises ``UploadRejected``."""
+    h = hashlib.sha256()
+    chunks: List[bytes] = []
+    size = 0
+    head = b""
+    for chunk in iter(lambda: src.read(_SIGNATURE_CHUNK), b""):
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadRejected(f"signature exceeds {max_bytes} bytes", 413)
+        if len(head) < 24:
+            head += chunk[:24 - len(head)]
+            kind = image_kind(head) if len(head) >= 8 else None
+            if len(head) >= 8 and kind is None:
+                raise UploadRejected("signature must be a PNG or JPEG image", 415)
+            if kind == "png" and len(head) >= 24:
+                dims = png_size(head)
+                if dims is None:
+                    raise UploadRejected("signature PNG has no IHDR header")
+                if dims[0] * dims[1] > max_pixels:
+                    raise UploadRejected(f"signature is {dims[0]}x{dims[1]}, over {max_pixels} pixels", 413)
+        h.update(chunk)
+        chunks.append(chunk)
+    if size < 24:
+        raise UploadRejected("signature image is empty or truncated")
+    return SignatureImage(h.hexdigest(), b"".join(chunks))
+
+
+def has_signature_parts(form) -> bool:
+    return any(key.startswith(SIGNATURE_PART_PREFIX) for key in form.keys())
+
+
+def read_signature_parts(form) -> Dict[str, SignatureImage]:
+    """``{field_id: image}`` for every ``signature:<field id>[,<field id>...]``
+    file part of a parsed form (one part can sign several fields)."""
+    signatures = {}
+    for key, value in form.multi_items():
+        if not key.startswith(SIGNATURE_PART_PREFIX) or isinstance(value, str):
+            continue
+        field_ids = [f for f in key[len(SIGNATURE_PART_PREFIX):].split(",") if f]
+        if not field_ids:
+            raise UploadRejected(f"signature part needs a field id: {SIGNATURE_PART_PREFIX}<field id>")
+        try:
+            image = read_signature(value.file)
+        except UploadRejected as e:
+            raise UploadRejected(f"{key}: {e}", e.status)
+        signatures.update(dict.fromkeys(field_ids, image))
+    return signatures
+
+
+async def signature_answers(request) -> Dict[str, SignatureImage]:
+    """Signature parts of a fill request, for its answers (the form is already parsed)."""
+    from fastapi import HTTPException
+    from server import aio
+
+    parsed = await request.form()
+    if not has_signature_parts(parsed):
+        return {}
+    try:
+        return await aio.run(read_signature_parts, parsed)
+    except UploadRejected as e:
+        raise HTTPException(e.status, str(e))
+
+
+# --- derived caches for a new hash ---
+def _open_pdf(sha: str, pdf_path: Path):
+    """Blob ``sha`` from its shared mapping; the file itself if it is not stored."""
+    import fitz
+    view = blob_store.view(sha)
+    return fitz.open(stream=view, filetype="pdf") if view is not None else fitz.open(pdf_path)
+
+
+def _page_sizes(sha: str, pdf_path: Path) -> List[List[float]]:
+    with _open_pdf(sha, pdf_path) as doc:
+        return [[pg.rect.width, pg.rect.height] for pg in doc]
+
+
+def _page_texts(sha: str, pdf_path: Path) -> List[str]:
+    with _open_pdf(sha, pdf_path) as doc:
+        return [doc[i].get_text("text") for i in range(len(doc))]
+
+
+DERIVED_JSON = {
+    "page-sizes.json": _page_sizes,
+    "text.json": _page_texts,
+}
+
+
+def derived_json(sha: str, name: str, pdf_path: Path):
+    """Cached ``name`` (a key of ``DERIVED_JSON``) for the PDF at ``pdf_path``."""
+    return blob_store.derived_json(sha, name, lambda: DERIVED_JSON[name](sha, pdf_path))
+
+
+def warm_derived(sha: str):
+    """Compute the derived caches for blob ``sha`` (no-op where present)."""
+    path = blob_store.path(sha)
+    for name in DERIVED_JSON:
+        try:
+            derived_json(sha, name, path)
+        except Exception as e:
+            print(f"⚠️  Could not derive {name} for {sha[:12]}: {e}")
+
+
+class UploadLimitMiddleware:
+    """Pure ASGI middleware: 413 for multipart bodies over the cap. A declared
+    ``Content-Length`` is refused before the body is read; otherwise (chunked,
+    or a wrong length) the bytes are counted as they arrive and reading stops
+    at the cap: the app sees a disconnect and its response is dropped."""
+
+    def __init__(self, app, max_bytes: int = UPLOAD_MAX_BYTES):
+        self.app = app
+        self.limit = max_bytes + _FORM_OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/"):
+            return await self.app(scope, receive, send)
+        length = headers.get(b"content-length")
+        if length and length.isdigit() and int(length) > self.limit:
+            return await self._reject(send)
+
+        received = 0
+        started = rejected = False
+
+        async def counting_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    rejected = True
+                    if not started:
+                        await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, guarded_send)
+        except Exception:
+            if not rejected:  # the app failed on the disconnect; the 413 is already sent
+                raise
+
+    async def _reject(self, send):
+        body = f'{{"detail":"upload exceeds {self.limit - _FORM_OVERHEAD} bytes"}}'.encode()
+        await send({"type": "http.response.start", "status": 413, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"connection", b"close"),
+        ]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,72 @@
+"""
+Optional background warm-up.
+
+Heavy libraries (PyMuPDF, PyPDF2/ReportLab, OpenAI, NumPy) and clients
+(Firestore, OpenAI) are loaded on first use so workers boot fast. With
+``STARTUP_WARMUP`` on, a daemon thread loads them right after startup
+instead, so the first real request does not pay for them. ``/health``
+answers immediately either way.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1").strip().lower() in ("1", "true", "yes", "on")
+
+report: Dict[str, object] = {"state": "idle", "steps_ms": {}, "errors": {}}
+
+
+def _firestore():
+    from server.firestore_store import applications
+    applications.db  # connects and starts the cache listener
+
+
+def _pdf_workers():
+    from concurrent.futures import wait
+    from server import aio
+    pool = aio.cpu_pool()
+    if pool is not None:
+        wait([pool.submit(aio.preload) for _ in range(aio.PDF_CPU_WORKERS)])
+
+
+def _openai():
+    from server.ai_routes import get_openai_client
+    get_openai_client()
+
+
+STEPS: List[Tuple[str, Callable[[], object]]] = [
+    ("fitz", lambda: __import__("fitz")),
+    ("fill_overlay", lambda: __import__("overlay.fill_overlay")),
+    ("acroform_handler", lambda: __import__("overlay.acroform_handler")),
+    ("field_detector", lambda: __import__("overlay.field_detector")),
+    ("pdf_workers", _pdf_workers),
+    ("openai", _openai),
+    ("firestore", _firestore),
+]
+
+
+def warm_up():
+    report["state"] = "running"
+    started = time.perf_counter()
+    for name, step in STEPS:
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            report["errors"][name] = f"{type(e).__name__}: {e}"
+            logger.warning(f"Warm-up step {name} failed: {e}")
+        report["steps_ms"][name] = round((time.perf_counter() - t0) * 1000, 1)
+    report["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    report["state"] = "done"
+
+
+def start_background_warmup() -> bool:
+    if not STARTUP_WARMUP or report["state"] != "idle":
+        return False
+    threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+    return True
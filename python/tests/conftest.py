@@ -0,0 +1,32 @@
+"""
+Tests run offline against in-process fakes (``loadtest/fake_*.py``).
+
+    cd python && python -m pytest -q
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+PYTHON_ROOT = Path(__file__).resolve().parents[1]
+if str(PYTHON_ROOT) not in sys.path:
+    sys.path.insert(0, str(PYTHON_ROOT))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Forms, blobs and derived caches under ``tmp_path``; detection in threads."""
+    import server.blob_store as blob_module
+    import server.paths as paths
+    from server import ingest
+    from server.blob_store import BlobStore, blob_store
+
+    apps = tmp_path / "applications"
+    monkeypatch.setattr(paths, "APPS", apps)
+    monkeypatch.setattr(blob_module, "APPS", apps)
+    fresh = BlobStore(tmp_path / "blobs", tmp_path / "derived")
+    for name in ("root", "derived_root", "cache", "stats", "_hashed"):
+        monkeypatch.setattr(blob_store, name, getattr(fresh, name))
+    monkeypatch.setattr(ingest, "DETECT_WORKERS", 0)
+    return apps
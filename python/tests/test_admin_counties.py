@@ -0,0 +1,69 @@
+"""``GET /admin/counties``: pages, projections and ETags from the catalog snapshot."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from server import catalog_store
+from server.admin_routes import router as admin_router
+from server.catalog_store import SUMMARY_COLUMNS, CatalogStore
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    store = CatalogStore(tmp_path / "catalog.db", tmp_path / "manifest.json")
+    for i in range(5):
+        store.upsert({"id": f"c{i}", "title": f"County {i}", "rootDomain": f"c{i}.gov", "steps": []})
+    monkeypatch.setattr(catalog_store, "_store", store)
+    return store
+
+
+@pytest.fixture
+def client(catalog):
+    app = FastAPI()
+    app.include_router(admin_router)
+    return TestClient(app)
+
+
+def test_pages_up_to_the_boundary(client):
+    ids = []
+    offset = 0
+    while offset is not None:
+        body = client.get(f"/admin/counties?limit=2&offset={offset}").json()
+        assert body["total"] == 5 and body["limit"] == 2 and body["offset"] == offset
+        ids += [c["id"] for c in body["counties"]]
+        offset = body["next_offset"]
+    assert ids == [f"c{i}" for i in range(5)]
+
+    last = client.get("/admin/counties?limit=1&offset=4").json()  # the page ends with the catalog
+    assert last["count"] == 1 and last["next_offset"] is None
+    past = client.get("/admin/counties?limit=2&offset=5").json()
+    assert past["counties"] == [] and past["next_offset"] is None
+
+
+def test_fields_projection(client):
+    body = client.get("/admin/counties?fields=id,title&limit=1").json()
+    assert body["counties"] == [{"id": "c0", "title": "County 0"}]
+
+    # A name that is not a summary column is read from the documents; missing keys are null
+    body = client.get("/admin/counties?fields=id,rootDomain,nope&limit=1").json()
+    assert body["counties"] == [{"id": "c0", "rootDomain": "c0.gov", "nope": None}]
+
+
+def test_summary(client):
+    counties = client.get("/admin/counties?summary=true").json()["counties"]
+    assert len(counties) == 5
+    assert all(set(c) == set(SUMMARY_COLUMNS) for c in counties)
+    assert counties[0]["stepCount"] == 0 and counties[0]["version"] == 1
+
+
+def test_etag_304_and_change(client, catalog):
+    r = client.get("/admin/counties?limit=2")
+    etag = r.headers["etag"]
+    assert client.get("/admin/counties?limit=2", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/admin/counties?limit=3", headers={"If-None-Match": etag}).status_code == 200
+
+    catalog.upsert({"id": "c1", "title": "Renamed", "steps": []})
+    r = client.get("/admin/counties?limit=2", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+    assert r.json()["counties"][1]["title"] == "Renamed"
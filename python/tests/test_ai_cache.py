@@ -0,0 +1,100 @@
+import asyncio
+
+from server.ai_cache import AnswerCache
+
+KEY = AnswerCache.make_key("app", "How much is the fee?", "ctx")
+
+
+def test_identical_requests_share_one_call():
+    async def main():
+        cache, calls = AnswerCache(), []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer", True
+
+        results = await asyncio.gather(*(cache.get_or_compute(KEY, compute) for _ in range(5)))
+        assert [a for a, _ in results] == ["answer"] * 5
+        assert sorted(s for _, s in results) == ["coalesced"] * 4 + ["upstream"]
+        assert await cache.get_or_compute(KEY, compute) == ("answer", "cache")
+        assert len(calls) == 1
+
+    asyncio.run(main())
+
+
+def test_fallback_answers_are_not_cached():
+    async def main():
+        cache = AnswerCache()
+
+        async def fallback():
+            return "try later", False
+
+        assert await cache.get_or_compute(KEY, fallback) == ("try later", "upstream")
+        assert cache.get(KEY) is None
+
+    asyncio.run(main())
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    async def main():
+        cache, release = AnswerCache(), asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "answer", True
+
+        leader = asyncio.create_task(cache.get_or_compute(KEY, compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute(KEY, compute))
+        await asyncio.sleep(0)
+        leader.cancel()  # its client disconnected
+        await asyncio.sleep(0)
+        release.set()
+        assert await waiter == ("answer", "coalesced")
+        assert leader.cancelled()
+        assert cache.get(KEY) == "answer"
+
+    asyncio.run(main())
+
+
+def test_computation_is_cancelled_when_every_caller_is_gone():
+    async def main():
+        cache, cancelled = AnswerCache(), asyncio.Event()
+
+        async def compute():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "answer", True
+
+        callers = [asyncio.create_task(cache.get_or_compute(KEY, compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for c in callers:
+            c.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert not cache._inflight
+
+        async def fresh():
+            return "new", True
+
+        assert await cache.get_or_compute(KEY, fresh) == ("new", "upstream")
+
+    asyncio.run(main())
+
+
+def test_errors_reach_every_caller():
+    async def main():
+        cache = AnswerCache()
+
+        async def boom():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*(cache.get_or_compute(KEY, boom) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert not cache._inflight
+
+    asyncio.run(main())
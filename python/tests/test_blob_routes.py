@@ -0,0 +1,79 @@
+"""``POST /blobs``: anonymous uploads are held to a per-client budget."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from server import blob_routes
+from server.blob_routes import UploadBudget
+
+
+def pdf(text: str) -> bytes:
+    import fitz
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), text)
+        return doc.tobytes()
+
+
+@pytest.fixture
+def client(data_dir, monkeypatch):
+    monkeypatch.setattr(blob_routes, "upload_budget", UploadBudget(uploads=2, max_bytes=10 * 2**20))
+    app = FastAPI()
+    app.include_router(blob_routes.router)
+    return TestClient(app)
+
+
+def upload(client, data: bytes, ip: str = "203.0.113.7"):
+    return client.post("/blobs", files={"file": ("a.pdf", data, "application/pdf")},
+                       headers={"X-Forwarded-For": f"10.0.0.1, {ip}"})
+
+
+def test_uploads_within_the_budget(client):
+    data = pdf("one")
+    first = upload(client, data)
+    assert first.status_code == 201
+    sha = first.json()["sha256"]
+    assert client.head(f"/blobs/{sha}").status_code == 200
+    assert upload(client, data).status_code == 200  # already stored
+
+
+def test_uploads_over_the_budget_are_refused(client):
+    assert upload(client, pdf("one")).status_code == 201
+    assert upload(client, pdf("two")).status_code == 201
+
+    r = upload(client, pdf("three"))
+    assert r.status_code == 429
+    assert 1 <= int(r.headers["retry-after"]) <= 3600
+    assert blob_routes.upload_budget.stats == {"charged": 2, "refused": 1}
+
+    # Another client (the last X-Forwarded-For hop, set by Caddy) has its own budget
+    assert upload(client, pdf("three"), ip="198.51.100.9").status_code == 201
+
+
+def test_rejected_uploads_are_not_charged(client):
+    r = upload(client, b"not a pdf at all, just some bytes" * 10)
+    assert r.status_code == 415
+    assert blob_routes.upload_budget.stats["charged"] == 0
+
+
+def test_declared_length_must_fit_the_byte_budget(client, monkeypatch):
+    data = pdf("one")
+    monkeypatch.setattr(blob_routes, "upload_budget", UploadBudget(uploads=10, max_bytes=len(data) + 100))
+    assert upload(client, data).status_code == 201
+    assert upload(client, pdf("two")).status_code == 429  # would go over, though the budget is not spent
+    assert blob_routes.upload_budget.stats == {"charged": 1, "refused": 1}
+
+
+def test_budget_counts_bytes_and_slides():
+    now = [1000.0]
+    budget = UploadBudget(uploads=100, max_bytes=1000, window=60, clock=lambda: now[0])
+    budget.charge("a", 600)
+    assert budget.retry_after("a") is None
+    assert budget.retry_after("a", 400) is None
+    assert budget.retry_after("a", 401) == 60
+    budget.charge("a", 600)
+    assert budget.retry_after("a") == 60
+    now[0] += 30
+    assert budget.retry_after("a") == 30
+    now[0] += 30
+    assert budget.retry_after("a") is None
@@ -0,0 +1,130 @@
+"""Content-addressed form PDFs: hashing without side effects, adoption, eviction."""
+
+import hashlib
+import os
+
+import server.blob_store as blob_module
+from server.blob_store import POINTER_SUFFIX, BlobStore
+
+
+def make_store(tmp_path):
+    return BlobStore(tmp_path / "blobs", tmp_path / "derived")
+
+
+def pointer(pdf):
+    return pdf.with_name("form.pdf" + POINTER_SUFFIX).read_text().split()[0]
+
+
+def form_pdf(tmp_path, data: bytes):
+    pdf = tmp_path / "apps" / "county" / "forms" / "f1" / "form.pdf"
+    pdf.parent.mkdir(parents=True)
+    pdf.write_bytes(data)
+    return pdf
+
+
+def test_hash_of_changes_nothing(tmp_path):
+    store = make_store(tmp_path)
+    pdf = form_pdf(tmp_path, b"%PDF-1.4 out of band")
+
+    assert store.hash_of(pdf) == hashlib.sha256(b"%PDF-1.4 out of band").hexdigest()
+    assert not store.root.exists()
+    assert sorted(p.name for p in pdf.parent.iterdir()) == ["form.pdf"]
+
+
+def test_hash_of_follows_out_of_band_replacement(tmp_path):
+    store = make_store(tmp_path)
+    pdf = form_pdf(tmp_path, b"%PDF-1.4 v1")
+    v1 = store.adopt(pdf)
+    assert store.hash_of(pdf) == v1
+    assert store.resolve(pdf) == store.path(v1)
+
+    tmp = pdf.with_name("new.pdf")
+    tmp.write_bytes(b"%PDF-1.4 v2")
+    os.replace(tmp, pdf)  # the pointer still names v1
+    assert pointer(pdf) == v1
+    assert store.resolve(pdf) == pdf
+    assert store.hash_of(pdf) == hashlib.sha256(b"%PDF-1.4 v2").hexdigest()
+    assert not store.exists(store.hash_of(pdf))
+
+
+def test_adopt_links_the_form(tmp_path):
+    store = make_store(tmp_path)
+    pdf = form_pdf(tmp_path, b"%PDF-1.4 adopt me")
+
+    sha = store.adopt(pdf)
+    assert store.exists(sha)
+    assert not os.path.samefile(pdf, store.path(sha))
+    assert pointer(pdf) == sha
+    assert bytes(store.view(sha)) == b"%PDF-1.4 adopt me"
+
+
+def test_in_place_write_leaves_the_blob_alone(tmp_path):
+    store = make_store(tmp_path)
+    pdf = form_pdf(tmp_path, b"%PDF-1.4 shared")
+    sha = store.adopt(pdf)
+    other = tmp_path / "other.pdf"
+    store.link(sha, other)  # another county with the same PDF
+
+    with open(pdf, "r+b") as f:  # same inode, new bytes
+        f.write(b"%PDF-1.4 edited")
+    assert store.path(sha).read_bytes() == b"%PDF-1.4 shared"
+    assert store.hash_of(pdf) == hashlib.sha256(b"%PDF-1.4 edited").hexdigest()
+    assert store.resolve(pdf) == pdf
+    assert store.hash_of(other) == sha and store.resolve(other) == store.path(sha)
+
+
+def test_legacy_hardlinked_form_is_unshared(tmp_path):
+    store = make_store(tmp_path)
+    pdf = form_pdf(tmp_path, b"%PDF-1.4 legacy")
+    sha = store.put_bytes(b"%PDF-1.4 legacy")
+    pdf.unlink()
+    os.link(store.path(sha), pdf)
+    pdf.with_name("form.pdf" + POINTER_SUFFIX).write_text(sha)  # no stamp
+
+    assert store.hash_of(pdf) == sha  # hashed, not trusted
+    store.link(sha, pdf)
+    assert not os.path.samefile(pdf, store.path(sha))
+    assert store.hash_of(pdf) == sha and store.resolve(pdf) == store.path(sha)
+
+
+def test_hash_memo_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_module, "HASH_MEMO_ENTRIES", 2)
+    store = make_store(tmp_path)
+    pdf = form_pdf(tmp_path, b"%PDF-1.4 0")
+    for i in range(5):
+        pdf.write_bytes(b"%PDF-1.4 " + b"x" * i)
+        store.hash_of(pdf)
+    assert len(store._hashed) == 2
+
+
+def test_hash_of_missing_file_uses_pointer_only_if_stored(tmp_path):
+    store = make_store(tmp_path)
+    pdf = form_pdf(tmp_path, b"%PDF-1.4 gone")
+    sha = store.adopt(pdf)
+    pdf.unlink()
+    assert store.hash_of(pdf) == sha
+
+    store.path(sha).unlink()
+    assert store.hash_of(pdf) is None
+
+
+def test_trim_evicts_least_recently_used_unreferenced_blobs(data_dir):
+    from server.blob_store import blob_store, store_form_pdf
+
+    form = store_form_pdf("county", "f1", b"%PDF-1.4 form" + b"." * 100)
+    old, used, new = (blob_store.put_bytes(b"%PDF-1.4 " + name + b"." * 100) for name in (b"old", b"used", b"new"))
+    for age, sha in enumerate((new, used, old, form)):
+        stamp = 1_000_000 - age * 100
+        os.utime(blob_store.path(sha), (stamp, stamp))
+    blob_store.derived(old, "text.json", lambda: b"[]")
+    blob_store.touch(used)
+
+    sizes = {sha: blob_store.path(sha).stat().st_size for sha in (form, old, used, new)}
+    report = blob_store.trim(max_bytes=sizes[form] + sizes[used] + sizes[new])
+    assert report == {"removed_blobs": 1, "bytes": sizes[form] + sizes[used] + sizes[new]}
+    assert not blob_store.exists(old) and not blob_store.derived_dir(old).exists()
+
+    report = blob_store.trim(max_bytes=1, keep={used})
+    assert report["removed_blobs"] == 1
+    assert not blob_store.exists(new)
+    assert blob_store.exists(used) and blob_store.exists(form)  # kept, and referenced by a form
@@ -0,0 +1,84 @@
+"""``CatalogStore``: versioned county writes, the exported manifest, and edits made to it by hand."""
+
+import json
+
+import pytest
+
+from server.catalog_store import CatalogStore
+
+
+def county(cid, title=None, pdfs=1):
+    return {"id": cid, "title": title or cid.title(),
+            "steps": [{"id": f"s{i}", "type": "pdf"} for i in range(pdfs)] + [{"id": "info", "type": "info"}]}
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return tmp_path / "catalog.db", tmp_path / "manifest.json"
+
+
+def manifest(paths):
+    return json.loads(paths[1].read_text())
+
+
+def test_upsert_delete_and_version(paths):
+    store = CatalogStore(*paths)
+    assert store.version() == 0 and store.count() == 0
+
+    assert store.upsert(county("alpha")) == 1
+    assert store.upsert(county("beta", pdfs=2)) == 2
+    assert store.upsert(county("alpha", "Alpha County")) == 3
+    assert store.count() == 2
+    assert store.get("alpha")["title"] == "Alpha County"
+    assert store.list(fields=["id", "pdfStepCount", "stepCount"]) == [
+        {"id": "alpha", "pdfStepCount": 1, "stepCount": 2}, {"id": "beta", "pdfStepCount": 2, "stepCount": 3}]
+
+    assert store.delete("alpha") and not store.delete("alpha")
+    assert store.version() == 4 and store.count() == 1
+    assert [(c["id"], c["op"]) for c in store.changes_since(2)] == [("alpha", "upsert"), ("alpha", "delete")]
+    with pytest.raises(ValueError):
+        store.upsert({"title": "no id"})
+
+
+def test_every_write_re_exports_the_manifest(paths):
+    store = CatalogStore(*paths)
+    store.upsert(county("alpha"))
+    store.upsert(county("beta"))
+    assert [c["id"] for c in manifest(paths)] == ["alpha", "beta"]
+    store.delete("alpha")
+    assert manifest(paths) == [county("beta")]
+
+
+def test_manifest_imported_once_on_first_open(paths):
+    paths[1].write_text(json.dumps({"counties": [county("alpha"), {"title": "skipped: no id"}]}))
+    store = CatalogStore(*paths)
+    assert [c["id"] for c in store.list()] == ["alpha"]
+    assert CatalogStore(*paths).version() == 1  # not imported again
+
+
+def test_manifest_edited_outside_the_store(paths):
+    store = CatalogStore(*paths)
+    store.upsert(county("alpha"))
+    store.upsert(county("beta"))
+    other = CatalogStore(*paths)  # another worker
+    assert other.snapshot().version == 2
+
+    paths[1].write_text("[]\n")  # scripts/clear-all-counties.mjs
+    assert store.list() == [] and store.count() == 0
+    assert other.snapshot().summaries == ()
+
+    store.upsert(county("gamma"))  # does not bring the cleared counties back
+    assert [c["id"] for c in manifest(paths)] == ["gamma"]
+
+    edited = [county("gamma", "Gamma County"), county("delta")]
+    paths[1].write_text(json.dumps(edited))  # a hand edit
+    assert other.list() == edited
+    version = other.version()
+    assert store.version() == version  # nothing left to import
+
+
+def test_unreadable_manifest_is_not_imported(paths):
+    store = CatalogStore(*paths)
+    store.upsert(county("alpha"))
+    paths[1].write_text("[{")  # half-written by an editor
+    assert [c["id"] for c in store.list()] == ["alpha"]
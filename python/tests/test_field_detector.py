@@ -0,0 +1,26 @@
+"""``detect_fields``: overlay ids are unique even when labels look like suffixed ids."""
+
+import fitz
+
+from overlay import field_detector
+
+
+def ids_for(monkeypatch, labels):
+    monkeypatch.setattr(field_detector, "detect_page_fields",
+                        lambda page, use_widgets=True: [{"label": label, "type": "text"} for label in labels])
+    with fitz.open() as doc:
+        doc.new_page()
+        return [f["id"] for f in field_detector.detect_fields(doc)]
+
+
+def test_repeated_labels_are_numbered(monkeypatch):
+    assert ids_for(monkeypatch, ["Name", "Name", "Date", "Name"]) == ["name", "name_2", "date", "name_3"]
+
+
+def test_suffixed_ids_do_not_collide_with_labels(monkeypatch):
+    assert ids_for(monkeypatch, ["Name", "Name", "Name 2"]) == ["name", "name_2", "name_2_2"]
+    assert ids_for(monkeypatch, ["Name 2", "Name", "Name", "Name"]) == ["name_2", "name", "name_3", "name_4"]
+
+
+def test_empty_labels_fall_back_to_the_type(monkeypatch):
+    assert ids_for(monkeypatch, ["", "", "---"]) == ["text", "text_2", "text_3"]
@@ -0,0 +1,113 @@
+"""Application store against the in-process Firestore fake (``loadtest.fake_firestore``)."""
+
+from types import SimpleNamespace
+
+from loadtest.fake_firestore import FakeBulkWriter, FakeFirestore
+from server.firestore_store import ApplicationStore
+
+DOC = {"id": "alpha", "title": "Alpha County", "steps": []}
+
+
+def seeded(**kwargs):
+    db = FakeFirestore()
+    db.collection("applications").document("alpha").set(DOC)
+    db.stats = dict.fromkeys(db.stats, 0)
+    return db, ApplicationStore(db=db, **kwargs)
+
+
+def test_read_through_cache():
+    db, store = seeded(listen=False)
+
+    assert store.get("alpha") == DOC
+    assert store.get("alpha") == DOC
+    assert store.get("missing") is None
+    assert store.get("missing") is None  # absence is cached too
+    assert db.stats["reads"] == 2
+    assert store.stats["hits"] == 2 and store.stats["misses"] == 2
+
+
+def test_expired_and_evicted_entries_are_read_again():
+    db, store = seeded(listen=False, ttl=0)
+    store.get("alpha")
+    store.get("alpha")
+    assert db.stats["reads"] == 2
+
+    db, store = seeded(listen=False, max_entries=1)
+    store.get("alpha")
+    store.get("missing")  # evicts alpha
+    store.get("alpha")
+    assert db.stats["reads"] == 3
+
+
+def test_listener_primes_and_refreshes_the_cache():
+    db, store = seeded(listen=True)
+
+    assert store.get("alpha") == DOC  # primed by the listener's initial snapshot
+    assert db.stats["reads"] == 0
+
+    # A write from another process reaches the cache without a read
+    db.collection("applications").document("alpha").set({**DOC, "title": "Renamed"})
+    assert store.get("alpha")["title"] == "Renamed"
+    db.collection("applications").document("alpha").delete()
+    assert store.get("alpha") is None
+    assert db.stats["reads"] == 0
+
+    store.close()
+    assert store.cache_stats()["listening"] is False
+
+
+def test_create_application_once():
+    db, store = seeded(listen=False)
+
+    assert store.create_application("beta", {"id": "beta"}, {"text": "hello"})
+    assert db.stats["commits"] == 1  # document and comment together
+    comments = list(db.collection("applications").document("beta").collection("comments").stream())
+    assert [c.to_dict()["text"] for c in comments] == ["hello"]
+
+    commits = db.stats["commits"]
+    assert not store.create_application("beta", {"id": "beta", "title": "again"})
+    assert db.stats["commits"] == commits  # known from the cache
+
+
+def test_create_application_already_exists():
+    db, store = seeded(listen=False)
+
+    # Not cached: the commit's create precondition fails, no read is made first
+    assert not store.create_application("alpha", {"id": "alpha", "title": "Overwritten?"}, {"text": "x"})
+    assert db.stats["reads"] == 0
+    assert store.get("alpha") == DOC
+    assert list(db.collection("applications").document("alpha").collection("comments").stream()) == []
+
+
+def test_save_application_with_subdocuments():
+    db, store = seeded(listen=False)
+    store.get("alpha")
+
+    store.save_application("alpha", {**DOC, "title": "New"}, [("forms/F1", {"n": 1}), ("forms/F2", {"n": 2})])
+    assert db.stats["commits"] == 1
+    assert store.stats["writes"] == 3
+    assert store.get("alpha")["title"] == "New"  # the cached copy was dropped
+    forms = db.collection("applications").document("alpha").collection("forms").stream()
+    assert sorted(f.id for f in forms) == ["F1", "F2"]
+
+
+def test_save_many_with_bulk_writer():
+    db, store = seeded(listen=False)
+    store.get("alpha")
+    docs = {f"county_{i}": {"id": f"county_{i}"} for i in range(45)}
+    docs["alpha"] = {**DOC, "title": "Bulk"}
+
+    assert store.save_many(docs) == 46
+    assert db.stats["commits"] == -(-46 // FakeBulkWriter.batch_size)
+    assert store.get("alpha")["title"] == "Bulk"
+    assert store.get("county_44") == {"id": "county_44"}
+
+
+def test_save_many_without_bulk_writer():
+    db = FakeFirestore()
+    store = ApplicationStore(db=SimpleNamespace(collection=db.collection, batch=db.batch), listen=False)
+    docs = {f"county_{i}": {"id": f"county_{i}"} for i in range(501)}
+
+    assert store.save_many(docs) == 501
+    assert db.stats["commits"] == 2  # Firestore's 500-write limit per batch
+    assert store.stats["commits"] == 2 and store.stats["writes"] == 501
@@ -0,0 +1,73 @@
+"""Job queue: partial results, failures and retries (``server/jobs.py``)."""
+
+import asyncio
+
+from server.jobs import HANDLERS, JobFailed, JobQueue, execute, handler
+
+broken = {"b"}
+
+
+@handler("test_steps")
+async def run_steps(data, progress):
+    """Mark each step of ``data["steps"]`` done unless it is in ``broken``;
+    fail the job only when no step is done, as county ingestion does."""
+    progress.plan(data["steps"])
+    failed = []
+    for name in data["steps"]:
+        if progress.is_done(name):
+            continue
+        if name in broken:
+            failed.append(name)
+            progress.failed(name, "broken")
+        else:
+            progress.done(name, {"ran": name})
+    result = {"ok": not failed, "failed_steps": failed}
+    if failed and len(failed) == len(data["steps"]):
+        raise JobFailed("every step failed", result)
+    return result
+
+
+def run(queue, job_id):
+    return asyncio.run(execute(queue, queue.claim("test", job_id)))
+
+
+def test_partial_failure_succeeds_and_can_be_retried(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db")
+    job_id = queue.enqueue("test_steps", {"steps": ["a", "b"]})
+
+    job = run(queue, job_id)
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"ok": False, "failed_steps": ["b"]}
+    assert job["steps"]["b"]["status"] == "failed"
+
+    broken.clear()
+    try:
+        assert queue.retry(job_id)
+        job = run(queue, job_id)
+    finally:
+        broken.add("b")
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"ok": True, "failed_steps": []}
+    assert job["progress"] == {"done": 2, "total": 2}
+    assert not queue.retry(job_id)  # nothing left to redo
+
+
+def test_job_fails_when_nothing_completed(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db")
+    job_id = queue.enqueue("test_steps", {"steps": ["b"]})
+
+    job = run(queue, job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "every step failed"
+    assert job["result"]["failed_steps"] == ["b"]
+    assert queue.retry(job_id)
+
+
+def test_unknown_kind_fails(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db")
+    job_id = queue.enqueue("no_such_kind", {})
+    assert "no_such_kind" not in HANDLERS
+
+    job = run(queue, job_id)
+    assert job["status"] == "failed"
+    assert "no handler" in job["error"]
@@ -0,0 +1,58 @@
+"""``json_codec``: the orjson and stdlib paths write and read the same documents."""
+
+from decimal import Decimal
+from pathlib import PurePosixPath
+
+import pytest
+
+from server import json_codec
+
+DOC = {"id": "c1", "fields": [{"id": "name", "rect": [1.5, 2, 3, 4.25], "required": True, "hint": None}]}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def codec(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(json_codec, "ORJSON_AVAILABLE", False)
+    return request.param
+
+
+def test_round_trip(codec):
+    body = json_codec.dumps(DOC)
+    assert isinstance(body, bytes) and b" " not in body
+    assert json_codec.loads(body) == DOC
+    assert json_codec.loads(memoryview(body)) == DOC
+    assert json_codec.loads(body.decode()) == DOC
+
+
+def test_indent(codec):
+    body = json_codec.dumps(DOC, indent=True)
+    assert body.startswith(b'{\n  "id": "c1",\n  "fields": [\n    {\n      "id": "name"')
+    assert json_codec.loads(body) == DOC
+
+
+def test_non_str_keys(codec):
+    assert json_codec.loads(json_codec.dumps({1: "a", 2.5: "b", None: "c"})) == {"1": "a", "2.5": "b", "null": "c"}
+
+
+def test_default(codec):
+    doc = {"path": PurePosixPath("data/a.pdf"), "amount": Decimal("1.50")}
+    assert json_codec.loads(json_codec.dumps(doc, default=str)) == {"path": "data/a.pdf", "amount": "1.50"}
+    with pytest.raises(TypeError):
+        json_codec.dumps(doc)
+
+
+def test_big_integers_and_invalid_input(codec):
+    assert json_codec.loads(json_codec.dumps({"n": 2**70})) == {"n": 2**70}
+    for bad in (b"{", b"", b"[1,]"):
+        with pytest.raises(ValueError):
+            json_codec.loads(bad)
+
+
+def test_paths_agree(monkeypatch):
+    pytest.importorskip("orjson")
+    fast = [json_codec.dumps(DOC), json_codec.dumps(DOC, indent=True)]
+    monkeypatch.setattr(json_codec, "ORJSON_AVAILABLE", False)
+    assert [json_codec.dumps(DOC), json_codec.dumps(DOC, indent=True)] == fast
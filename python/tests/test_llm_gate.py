@@ -0,0 +1,169 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from loadtest.fake_openai import FakeConfig, create_app
+from server.llm_gate import UpstreamGate, UpstreamUnavailable, _acquire_within
+
+
+def fake_upstream(**overrides):
+    config = FakeConfig(**{"latency": "fixed:0.05", "token_rate": 1e6, "min_tokens": 1, "max_tokens": 2, **overrides})
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(config)), base_url="http://fake")
+
+    async def complete():
+        r = await client.post("/v1/chat/completions", json={"model": "gpt-4", "messages": [{"role": "user", "content": "hi"}]})
+        r.raise_for_status()  # HTTPStatusError carries .response, like the OpenAI SDK's errors
+        return r.json()["choices"][0]["message"]["content"]
+
+    return config, complete
+
+
+async def outcome(gate: UpstreamGate, fn, **kwargs):
+    try:
+        return await gate.call(fn, **kwargs)
+    except UpstreamUnavailable as e:
+        return e.reason
+    except httpx.HTTPStatusError as e:
+        return e.response.status_code
+
+
+def test_queue_overflow_is_rejected():
+    async def main():
+        config, complete = fake_upstream(latency="fixed:0.2")
+        gate = UpstreamGate(max_inflight=1, max_queue=1, queue_timeout=5)
+        results = await asyncio.gather(*(outcome(gate, complete) for _ in range(3)))
+        assert results.count("queue full") == 1
+        assert sum(isinstance(r, str) and r != "queue full" for r in results) == 2
+        assert config.stats["requests"] == 2
+        assert gate.counters["rejected_queue_full"] == 1
+
+    asyncio.run(main())
+
+
+def test_queue_deadline_expires_without_leaking_the_slot():
+    async def main():
+        config, complete = fake_upstream(latency="fixed:0.3")
+        gate = UpstreamGate(max_inflight=1, max_queue=8, queue_timeout=0.05)
+        first = asyncio.create_task(outcome(gate, complete, timeout=5))
+        await asyncio.sleep(0.01)
+        assert await outcome(gate, complete) == "queue deadline exceeded"
+        assert isinstance(await first, str)
+        assert gate.stats()["inflight"] == 0 and gate._sem._value == 1
+        assert isinstance(await outcome(gate, complete), str)
+
+    asyncio.run(main())
+
+
+def test_permit_granted_to_a_cancelled_waiter_is_given_back():
+    async def main():
+        sem = asyncio.Semaphore(1)
+        await sem.acquire()
+        waiter = asyncio.create_task(_acquire_within(sem, 10))
+        await asyncio.sleep(0)
+        sem.release()
+        await asyncio.sleep(0)  # the acquire completes for the waiter...
+        waiter.cancel()         # ...whose request is cancelled before it resumes
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        assert sem._value == 1
+
+    asyncio.run(main())
+
+
+def test_acquire_times_out_without_taking_the_permit():
+    async def main():
+        sem = asyncio.Semaphore(1)
+        await sem.acquire()
+        assert await _acquire_within(sem, 0.01) is False
+        sem.release()
+        assert sem._value == 1 and await _acquire_within(sem, 0.01) is True
+
+    asyncio.run(main())
+
+
+def test_rate_limit_pauses_admissions_for_retry_after():
+    async def main():
+        config, complete = fake_upstream(rate_limit_rate=1.0, retry_after=0.2)
+        gate = UpstreamGate(max_inflight=2, queue_timeout=1, failure_threshold=10)
+        # One retry after the advertised pause, then the 429 reaches the caller
+        assert await outcome(gate, complete) == 429
+        assert config.stats["requests"] == 2
+        assert gate.stats()["paused_for_seconds"] > 0
+        # A deadline shorter than the pause is rejected without calling upstream
+        assert await outcome(gate, complete, timeout=0.05) == "rate limited"
+        assert config.stats["requests"] == 2
+        config.rate_limit_rate = 0.0
+        await asyncio.sleep(0.2)
+        assert isinstance(await outcome(gate, complete), str)
+        assert gate.counters["rate_limited"] == 2
+
+    asyncio.run(main())
+
+
+def test_callers_paused_by_a_429_do_not_fill_the_queue():
+    async def main():
+        async def slow():
+            await asyncio.sleep(0.1)
+            return "ok"
+
+        gate = UpstreamGate(max_inflight=1, max_queue=1, queue_timeout=5)
+        holder = asyncio.create_task(outcome(gate, slow))
+        await asyncio.sleep(0.01)
+        gate._paused_until = time.monotonic() + 0.2  # the slot frees up during the pause
+        paused = [asyncio.create_task(outcome(gate, slow)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert gate.stats()["waiting"] == 0 and gate.stats()["pausing"] == 3
+
+        results = await asyncio.gather(holder, *paused)
+        # After the pause one caller takes the free slot and one queues: only the third is over
+        assert results.count("ok") == 3 and results.count("queue full") == 1
+
+    asyncio.run(main())
+
+
+def test_breaker_opens_then_admits_a_single_half_open_probe():
+    async def main():
+        config, complete = fake_upstream(error_rate=1.0)
+        gate = UpstreamGate(max_inflight=4, failure_threshold=2, open_seconds=0.1)
+        assert [await outcome(gate, complete) for _ in range(2)] == [500, 500]
+        assert gate.state == UpstreamGate.OPEN
+        assert await outcome(gate, complete) == "circuit open"
+
+        await asyncio.sleep(0.1)
+        assert gate.state == UpstreamGate.HALF_OPEN
+        config.error_rate = 0.0
+        probe, other = await asyncio.gather(outcome(gate, complete), outcome(gate, complete))
+        assert other == "circuit open" and probe not in ("circuit open", 500)
+        assert gate.state == UpstreamGate.CLOSED
+
+    asyncio.run(main())
+
+
+def test_failed_probe_reopens_the_breaker():
+    async def main():
+        config, complete = fake_upstream(error_rate=1.0)
+        gate = UpstreamGate(failure_threshold=1, open_seconds=0.05)
+        assert await outcome(gate, complete) == 500
+        await asyncio.sleep(0.05)
+        assert await outcome(gate, complete) == 500
+        assert gate.state == UpstreamGate.OPEN
+
+    asyncio.run(main())
+
+
+def test_client_errors_do_not_count_against_the_upstream():
+    async def main():
+        gate = UpstreamGate(failure_threshold=1)
+
+        async def bad_request():
+            raise httpx.HTTPStatusError("bad", request=httpx.Request("POST", "http://fake"),
+                                        response=httpx.Response(400))
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await gate.call(bad_request)
+        assert gate.state == UpstreamGate.CLOSED
+
+    asyncio.run(main())
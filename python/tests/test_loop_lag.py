@@ -0,0 +1,74 @@
+"""Concurrent fills through ``aio.run_cpu`` leave the event loop responsive."""
+
+import asyncio
+
+import pytest
+
+from overlay.fill_overlay import fill_pdf_overlay_bytes
+from server import aio
+from server.loop_monitor import LoopMonitor
+
+THRESHOLD = 0.1  # LOOP_LAG_THRESHOLD_MS default
+
+
+@pytest.fixture(scope="module")
+def job():
+    import fitz
+    fields = []
+    with fitz.open() as doc:
+        for p in range(6):
+            doc.new_page().insert_text((72, 72), f"page {p} " * 20)
+            fields += [{"id": f"f{p}_{i}", "label": f"Field {i}", "type": "text", "page": p,
+                        "rect": [72, 100 + i * 20, 300, 116 + i * 20]} for i in range(30)]
+        pdf = doc.tobytes()
+    return pdf, {"fields": fields}, {f["id"]: f"Sample value {f['id']}" for f in fields}
+
+
+async def monitored(work):
+    monitor = LoopMonitor(interval=0.01, threshold=THRESHOLD)
+    monitor.start()
+    try:
+        await work()
+        await asyncio.sleep(0.05)  # let the heartbeat report the last interval
+    finally:
+        await monitor.stop()
+    return monitor
+
+
+def test_concurrent_fills_do_not_stall_the_loop(job):
+    pdf, overlay, answers = job
+
+    async def main():
+        await aio.run_cpu(fill_pdf_overlay_bytes, pdf, overlay, answers)  # start the workers
+        filled = []
+
+        async def fills():
+            filled.extend(await asyncio.gather(*(aio.run_cpu(fill_pdf_overlay_bytes, pdf, overlay, answers)
+                                                  for _ in range(8))))
+
+        monitor = await monitored(fills)
+        return monitor, filled
+
+    try:
+        monitor, filled = asyncio.run(main())
+    finally:
+        aio.shutdown()
+    assert len(filled) == 8 and all(out.startswith(b"%PDF") for out in filled)
+    assert monitor.stats["stalls"] == 0, monitor.info()["recent"]
+
+
+def test_a_fill_on_the_loop_is_caught(job):
+    pdf, overlay, answers = job
+
+    async def main():
+        async def fill_inline():
+            await asyncio.sleep(0.03)
+            fill_pdf_overlay_bytes(pdf, overlay, answers)
+            fill_pdf_overlay_bytes(pdf, overlay, answers)
+
+        return await monitored(fill_inline)
+
+    monitor = asyncio.run(main())
+    assert monitor.stats["stalls"] >= 1
+    assert monitor.stats["max_lag_ms"] >= THRESHOLD * 1000
+    assert any("fill_inline" in frame for stall in monitor.stalls for frame in stall["where"])
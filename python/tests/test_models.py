@@ -0,0 +1,35 @@
+"""Every template shipped under ``data/applications`` loads into the fill models."""
+
+import pytest
+
+from overlay.models import AcroFormDefinition, Overlay
+from server import json_codec
+from server.paths import APPS
+
+TEMPLATES = sorted(APPS.glob("*/forms/*/overlay.json")) + sorted(APPS.glob("*/forms/*/acroform-definition.json"))
+
+
+def test_templates_are_shipped():
+    assert TEMPLATES
+
+
+@pytest.mark.parametrize("path", TEMPLATES, ids=lambda p: str(p.relative_to(APPS)))
+def test_template_loads(path):
+    data = json_codec.loads(path.read_bytes())
+    model = (Overlay if path.name == "overlay.json" else AcroFormDefinition).from_dict(data, path.name)
+    assert len(model.fields) == len(data.get("fields", []))
+    assert len({f.id for f in model.fields}) == len(model.fields)
+    for field in model.fields:
+        assert field.rect is None or (field.rect[0] <= field.rect[2] and field.rect[1] <= field.rect[3])
+
+
+def test_invalid_fields_are_rejected():
+    for data, message in [
+        ({"fields": [{"label": "no id"}]}, "id"),
+        ({"fields": [{"id": "a", "rect": [0, 0, 1]}]}, "rect"),
+        ({"fields": [{"id": "a", "page": -1}]}, "page"),
+        ({"fields": [{"id": "a", "align": "justify"}]}, "align"),
+        ([], "JSON object"),
+    ]:
+        with pytest.raises(ValueError, match=message):
+            Overlay.from_dict(data)
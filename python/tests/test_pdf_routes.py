@@ -0,0 +1,37 @@
+"""``/extract-pdf-content``: download failures and extraction failures are reported apart."""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from server import aio, pdf_routes
+
+
+def client(monkeypatch, fetch):
+    monkeypatch.setattr(aio, "fetch", fetch)
+    app = FastAPI()
+    app.include_router(pdf_routes.router)
+    return TestClient(app)
+
+
+def extract(client):
+    r = client.post("/extract-pdf-content", json={"pdf_url": "https://county.example/a.pdf"})
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_oversized_download(monkeypatch):
+    async def fetch(url, **kwargs):
+        raise ValueError(f"response from {url} exceeds 10 bytes")
+
+    assert extract(client(monkeypatch, fetch))["error"].startswith("Failed to download PDF:")
+
+
+def test_extraction_error_is_not_a_download_error(monkeypatch):
+    async def fetch(url, **kwargs):
+        return b"%PDF-1.4", None
+
+    def broken(pdf_bytes):
+        raise ValueError("bad xref")
+
+    monkeypatch.setattr(pdf_routes, "_extract_text", broken)
+    assert extract(client(monkeypatch, fetch))["error"] == "PDF extraction failed: bad xref"
@@ -0,0 +1,48 @@
+"""Mapper page previews: cached per (PDF, page, dpi), for a fixed set of resolutions."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from server.apps_routes import PREVIEW_DPIS, router as apps_router
+from server.blob_store import blob_store, store_form_pdf
+
+
+@pytest.fixture
+def client(data_dir):
+    import fitz
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), "preview")
+        pdf = doc.tobytes()
+    sha = store_form_pdf("county", "f1", pdf)
+    app = FastAPI()
+    app.include_router(apps_router, prefix="/apps")
+    return TestClient(app), sha
+
+
+def cached(sha):
+    directory = blob_store.derived_dir(sha)
+    return sorted(p.name for p in directory.glob("page-*.png")) if directory.exists() else []
+
+
+def test_preview_at_allowed_dpis(client):
+    client, sha = client
+    for dpi in PREVIEW_DPIS:
+        r = client.get(f"/apps/county/forms/f1/preview-page?page=0&dpi={dpi}")
+        assert r.status_code == 200
+        assert r.content.startswith(b"\x89PNG")
+    assert cached(sha) == sorted(f"page-0@{dpi}.png" for dpi in PREVIEW_DPIS)
+
+
+@pytest.mark.parametrize("dpi", [145, 1, 0, -72, 100000])
+def test_other_dpis_are_rejected_and_not_cached(client, dpi):
+    client, sha = client
+    r = client.get(f"/apps/county/forms/f1/preview-page?page=0&dpi={dpi}")
+    assert r.status_code == 400
+    assert cached(sha) == []
+
+
+def test_invalid_page_is_not_cached(client):
+    client, sha = client
+    assert client.get("/apps/county/forms/f1/preview-page?page=3").status_code == 400
+    assert cached(sha) == []
@@ -0,0 +1,47 @@
+"""Request profiling: token checks and the ``/admin/profiles`` routes."""
+
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from server import profiling
+from server.admin_routes import router as admin_router
+
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", TOKEN)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    (tmp_path / "p1.json").write_text(json.dumps({"meta": {"id": "p1", "route": "/fill"}, "wall": {"a;b": 3}, "cpu": {}}))
+    app = FastAPI()
+    app.include_router(admin_router)
+    app.add_middleware(profiling.ProfilingMiddleware)
+    return TestClient(app)
+
+
+def test_profiles_require_the_token(client):
+    assert client.get("/admin/profiles").status_code == 403
+    assert client.get("/admin/profiles", headers={"X-Profile": "wrong"}).status_code == 403
+    assert client.get("/admin/profiles/p1").status_code == 403
+    assert client.get("/admin/profiles/p1?format=folded").status_code == 403
+
+
+def test_profiles_with_the_token(client):
+    r = client.get("/admin/profiles", headers={"X-Profile": TOKEN})
+    assert r.status_code == 200
+    assert [p["id"] for p in r.json()["profiles"]] == ["p1"]
+    assert "x-profile-id" not in r.headers  # the token is a credential here, not a profiling request
+
+    r = client.get(f"/admin/profiles/p1?format=folded&profile={TOKEN}")
+    assert r.status_code == 200
+    assert r.text == "a;b 3\n"
+
+
+def test_profiles_closed_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+    assert client.get("/admin/profiles", headers={"X-Profile": ""}).status_code == 403
+    assert client.get("/admin/profiles?profile=").status_code == 403
@@ -0,0 +1,132 @@
+"""Incremental re-sync against an in-process PDF host (``httpx.MockTransport``)."""
+
+import asyncio
+import hashlib
+import json
+
+import httpx
+
+import server.blob_store as blob_module
+from server import resync
+from server.blob_store import blob_store
+
+HOST = "https://county.example"
+
+
+def pdf(text: str) -> bytes:
+    import fitz
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), text)
+        return doc.tobytes()
+
+
+class Host:
+    """County PDFs by path, served with ETags; counts 200s and 304s."""
+
+    def __init__(self, docs):
+        self.docs = dict(docs)
+        self.hits = {200: 0, 304: 0}
+
+    def etag(self, path):
+        return f'"{hashlib.sha256(self.docs[path]).hexdigest()[:16]}"'
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        etag = self.etag(request.url.path)
+        if request.headers.get("if-none-match") == etag:
+            self.hits[304] += 1
+            return httpx.Response(304, headers={"ETag": etag})
+        self.hits[200] += 1
+        return httpx.Response(200, content=self.docs[request.url.path], headers={"ETag": etag})
+
+
+def county(*forms):
+    return {"id": "test_county", "title": "Test County",
+            "steps": [{"id": f"s_{f}", "type": "pdf", "formId": f, "title": f, "pdfUrl": f"{HOST}/{f}.pdf"}
+                      for f in forms]}
+
+
+def run(host, counties, **kwargs):
+    return asyncio.run(resync.resync(counties, transport=httpx.MockTransport(host), retries=0, **kwargs))
+
+
+def statuses(report):
+    return {c["formId"]: c for c in report["changes"]}
+
+
+def meta(apps, form):
+    return json.loads((apps / "test_county" / "forms" / form / "meta.json").read_text())
+
+
+def test_first_sync_then_not_modified(data_dir):
+    host = Host({"/a.pdf": pdf("a v1")})
+    report = run(host, [county("a")])
+    assert report["counts"] == {"new": 1}
+    assert statuses(report)["a"]["templates"] == "regenerated"
+    assert meta(data_dir, "a")["etag"] == host.etag("/a.pdf")
+
+    synced_at = meta(data_dir, "a")["syncedAt"]
+    report = run(host, [county("a")])
+    assert report["counts"] == {"not_modified": 1}
+    assert report["bytes_downloaded"] == 0
+    assert host.hits == {200: 1, 304: 1}
+    assert meta(data_dir, "a")["syncedAt"] > synced_at
+
+
+def test_changed_and_unchanged(data_dir):
+    host = Host({"/a.pdf": pdf("a v1"), "/b.pdf": pdf("b v1")})
+    run(host, [county("a", "b")])
+    old_b = hashlib.sha256(host.docs["/b.pdf"]).hexdigest()
+    for form in ("a", "b"):  # validators lost: only the content can tell
+        m = meta(data_dir, form)
+        del m["etag"]
+        (data_dir / "test_county" / "forms" / form / "meta.json").write_text(json.dumps(m))
+
+    host.docs["/b.pdf"] = pdf("b v2")
+    report = run(host, [county("a", "b")])
+    assert report["counts"] == {"unchanged": 1, "changed": 1}
+    change = statuses(report)["b"]
+    assert change["status"] == "changed"
+    assert change["sha256"] == hashlib.sha256(host.docs["/b.pdf"]).hexdigest()
+    assert change["old_sha256"] == old_b
+    assert blob_module.form_pdf_hash("test_county", "b") == change["sha256"]
+    assert meta(data_dir, "a")["etag"] == host.etag("/a.pdf")
+
+
+def test_dry_run_writes_nothing(data_dir):
+    host = Host({"/a.pdf": pdf("a v1")})
+    report = run(host, [county("a")], dry_run=True)
+    assert report["counts"] == {"new": 1}
+    assert not data_dir.exists()
+
+
+def test_edited_templates_are_kept(data_dir):
+    host = Host({"/a.pdf": pdf("a v1"), "/b.pdf": pdf("b v1")})
+    run(host, [county("a", "b")])
+    form = data_dir / "test_county" / "forms" / "a"
+    overlay = json.loads((form / "overlay.json").read_text())
+    overlay["fields"] = [{"id": "name", "label": "Name", "page": 0, "type": "text", "rect": [10, 10, 100, 30]}]
+    (form / "overlay.json").write_text(json.dumps(overlay))
+
+    host.docs["/a.pdf"] = pdf("a v2")
+    host.docs["/b.pdf"] = pdf("b v2")
+    changes = statuses(run(host, [county("a", "b")]))
+    assert changes["a"]["templates"] == "kept"
+    assert changes["b"]["templates"] == "regenerated"
+    assert json.loads((form / "overlay.json").read_text())["fields"] == overlay["fields"]
+    assert meta(data_dir, "a")["sha256"] == changes["a"]["sha256"]
+
+
+def test_old_blob_released_unless_shared(data_dir):
+    shared = pdf("shared v1")
+    host = Host({"/a.pdf": shared, "/b.pdf": shared})
+    run(host, [county("a", "b")])
+    old = hashlib.sha256(shared).hexdigest()
+
+    host.docs["/a.pdf"] = pdf("a v2")
+    run(host, [county("a")])
+    assert blob_store.exists(old)  # b still uses it
+
+    host.docs["/b.pdf"] = pdf("b v2")
+    run(host, [county("b")])
+    assert not blob_store.exists(old)
+    assert old not in blob_store.referenced()
@@ -0,0 +1,71 @@
+"""``SharedCache``: mappings dropped when another process bumps the epoch, and bounded LRU."""
+
+from server.shared_cache import SharedCache, atomic_write
+
+
+def files(tmp_path, **contents):
+    paths = {}
+    for name, data in contents.items():
+        paths[name] = tmp_path / name
+        paths[name].write_bytes(data)
+    return paths
+
+
+def cached(cache):
+    return [key.rsplit("/", 1)[-1] for key in cache._maps]
+
+
+def test_epoch_bump_drops_mapped_views(tmp_path):
+    epoch = tmp_path / ".epoch"
+    reader, writer = SharedCache(epoch), SharedCache(epoch)  # two worker processes
+    path = files(tmp_path, a=b"old contents")["a"]
+    old = reader.view(path)
+    assert bytes(old) == b"old contents"
+
+    atomic_write(path, b"new contents")
+    assert reader.view(path) is old  # still the mapping of the old file
+    writer.invalidate()
+    assert reader.epoch == writer.epoch == 1
+
+    new = reader.view(path)
+    assert bytes(new) == b"new contents"
+    assert bytes(old) == b"old contents"  # views handed out stay valid
+    assert reader.stats["maps"] == 2 and reader.info()["entries"] == 1
+
+    path.unlink()
+    writer.invalidate()
+    assert reader.view(path) is None
+
+
+def test_get_computes_once(tmp_path):
+    cache = SharedCache(tmp_path / ".epoch")
+    calls = []
+    compute = lambda: calls.append(1) or b"derived"
+    path = tmp_path / "d" / "text.json"
+    assert bytes(cache.get(path, compute)) == b"derived"
+    assert bytes(cache.get(path, compute)) == b"derived"
+    assert calls == [1] and cache.stats["misses"] == 1 and cache.stats["hits"] == 1
+
+
+def test_eviction_by_entries_is_least_recently_used(tmp_path):
+    cache = SharedCache(tmp_path / ".epoch", max_entries=2)
+    p = files(tmp_path, a=b"a", b=b"b", c=b"c")
+    cache.view(p["a"])
+    cache.view(p["b"])
+    cache.view(p["a"])  # a is now the most recent
+    cache.view(p["c"])
+    assert cached(cache) == ["a", "c"]
+    assert cache.stats["evictions"] == 1
+
+
+def test_eviction_by_bytes(tmp_path):
+    cache = SharedCache(tmp_path / ".epoch", max_bytes=25)
+    p = files(tmp_path, a=b"1" * 10, b=b"2" * 10, c=b"3" * 10, big=b"4" * 26)
+    for name in ("a", "b", "c"):
+        cache.view(p[name])
+    assert cached(cache) == ["b", "c"]
+    assert cache.info()["mapped_bytes"] == 20
+
+    assert bytes(cache.view(p["big"])) == b"4" * 26  # served, but larger than the cache
+    assert cached(cache) == ["b", "c"]
+    assert cache.view(p["big"]) is not None and cache.stats["maps"] == 5
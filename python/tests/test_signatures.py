@@ -0,0 +1,70 @@
+"""Signature parts: checked while they are read, and placed from a per-thread cache."""
+
+import hashlib
+import io
+import threading
+
+import pytest
+
+from overlay.signature_utils import SignatureImage, image_kind, png_size, signature_xobject
+from server.uploads import UploadRejected, read_signature
+
+
+def png(width=40, height=20) -> bytes:
+    import fitz
+    return fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False).tobytes("png")
+
+
+def rejected(data: bytes, **limits) -> UploadRejected:
+    with pytest.raises(UploadRejected) as e:
+        read_signature(io.BytesIO(data), **limits)
+    return e.value
+
+
+def test_png_header():
+    data = png(40, 20)
+    assert image_kind(data[:8]) == "png"
+    assert image_kind(b"\xff\xd8\xff\xe0" + b"\0" * 4) == "jpeg"
+    assert image_kind(b"GIF89a\0\0") is None
+    assert png_size(data[:24]) == (40, 20)
+    assert png_size(data[:23]) is None
+    assert png_size(data[:12] + b"IDAT" + data[16:24]) is None
+
+
+def test_valid_signature():
+    data = png()
+    sig = read_signature(io.BytesIO(data))
+    assert sig == SignatureImage(hashlib.sha256(data).hexdigest(), data)
+
+
+def test_oversize():
+    data = png()
+    assert rejected(data, max_bytes=len(data) - 1).status == 413
+
+
+def test_too_many_pixels():
+    e = rejected(png(100, 50), max_pixels=4999)
+    assert e.status == 413 and "100x50" in str(e)
+
+
+def test_wrong_type():
+    assert rejected(b"GIF89a" + b"\0" * 100).status == 415
+
+
+def test_truncated_png():
+    data = png()
+    assert rejected(data[:20]).status == 400  # a PNG signature but no complete IHDR
+    assert rejected(data[:12] + b"IDAT" + data[16:]).status == 400
+    assert rejected(b"").status == 400
+
+
+def test_placed_image_cache_is_per_thread():
+    sig = SignatureImage.from_bytes(png())
+    docs = [signature_xobject(sig), signature_xobject(sig)]
+    assert docs[0] is docs[1]
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(signature_xobject(sig)))
+    thread.start()
+    thread.join()
+    assert other[0] is not docs[0] and other[0].page_count == 1
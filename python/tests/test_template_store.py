@@ -0,0 +1,135 @@
+"""``TemplateStore``: versioned saves, If-Match, and snapshots that follow the file."""
+
+import json
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from server import apps_routes
+from server.template_store import TemplateConflict, TemplateStore
+
+
+def overlay(*ids):
+    return {"fields": [{"id": i, "label": i.title(), "page": 0, "type": "text", "rect": [10, 10, 100, 30]}
+                       for i in ids]}
+
+
+@pytest.fixture
+def store(data_dir):
+    return TemplateStore()
+
+
+def test_saves_bump_the_version(store):
+    first = store.save("county", "f1", "overlay", overlay("name"))
+    second = store.save("county", "f1", "overlay", overlay("name", "phone"), if_match=first.etag)
+    assert (first.version, second.version) == (1, 2)
+    assert first.etag != second.etag and second.etag.startswith('"2-')
+    assert store.get("county", "f1", "overlay") is second
+    assert second.data["version"] == 2 and second.fields == 2
+    assert first.fields == 1  # an old snapshot is never modified
+
+
+def test_stale_if_match_is_a_conflict(store):
+    first = store.save("county", "f1", "overlay", overlay("name"))
+    store.save("county", "f1", "overlay", overlay("name", "phone"), if_match=first.etag)
+    with pytest.raises(TemplateConflict) as e:
+        store.save("county", "f1", "overlay", overlay("email"), if_match=first.etag)
+    assert e.value.current.version == 2
+    assert store.get("county", "f1", "overlay").fields == 2
+    assert store.stats["conflicts"] == 1
+
+
+def test_star_matches_only_an_existing_template(store):
+    with pytest.raises(TemplateConflict) as e:
+        store.save("county", "f1", "overlay", overlay("name"), if_match="*")
+    assert e.value.current is None
+    store.save("county", "f1", "overlay", overlay("name"))
+    assert store.save("county", "f1", "overlay", overlay("phone"), if_match="*").version == 2
+
+
+def test_out_of_band_rewrite_is_reread(store):
+    store.save("county", "f1", "overlay", overlay("name"))
+    assert store.get("county", "f1", "overlay").fields == 1
+
+    path = store.path("county", "f1", "overlay")
+    tmp = path.with_name("edit.json")
+    tmp.write_text(json.dumps(overlay("name", "phone", "email")))
+    os.replace(tmp, path)  # a hand edit: new inode, no version
+    snap = store.get("county", "f1", "overlay")
+    assert snap.fields == 3 and snap.version == 0
+    assert store.get("county", "f1", "overlay") is snap
+    assert store.stats["loads"] == 1
+
+
+def test_unversioned_file_gets_version_one(store):
+    path = store.path("county", "f1", "overlay")
+    path.parent.mkdir(parents=True)
+    path.write_text(json.dumps(overlay("name")))  # as ingestion used to write it
+    snap = store.get("county", "f1", "overlay")
+    assert snap.version == 0 and snap.etag.startswith('"0-')
+    assert store.save("county", "f1", "overlay", overlay("name"), if_match=snap.etag).version == 1
+
+
+def test_delete_with_stale_if_match(store):
+    first = store.save("county", "f1", "overlay", overlay("name"))
+    second = store.save("county", "f1", "overlay", overlay("phone"))
+    with pytest.raises(TemplateConflict):
+        store.delete("county", "f1", "overlay", if_match=first.etag)
+    assert store.get("county", "f1", "overlay") is not None
+    assert store.delete("county", "f1", "overlay", if_match=second.etag)
+    assert store.get("county", "f1", "overlay") is None
+    assert not store.delete("county", "f1", "overlay")
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    monkeypatch.setattr(apps_routes, "template_store", store)
+    app = FastAPI()
+    app.include_router(apps_routes.router, prefix="/apps")
+    return TestClient(app)
+
+
+def save(client, doc, if_match=None):
+    headers = {"If-Match": if_match} if if_match else {}
+    return client.post("/apps/county/forms/f1/template", data={"overlay_json": json.dumps(doc)}, headers=headers)
+
+
+def test_two_editors_with_the_same_etag(client):
+    etag = save(client, overlay("name")).headers["etag"]
+    r = client.get("/apps/county/forms/f1/template")
+    assert r.headers["etag"] == etag
+    assert client.get("/apps/county/forms/f1/template", headers={"If-None-Match": etag}).status_code == 304
+
+    first = save(client, overlay("name", "phone"), if_match=etag)
+    assert first.status_code == 200 and first.json()["version"] == 2
+    second = save(client, overlay("name", "email"), if_match=etag)
+    assert second.status_code == 412
+    assert second.headers["etag"] == first.headers["etag"]  # the version to reload
+
+
+def test_if_match_can_be_required(client, monkeypatch):
+    monkeypatch.setattr(apps_routes, "TEMPLATE_REQUIRE_IF_MATCH", True)
+    assert save(client, overlay("name")).status_code == 428
+    assert client.get("/apps/county/forms/f1/template").json() == {"fields": []}
+
+
+def test_fill_uses_a_template_the_form_index_has_not_seen(client, store, monkeypatch):
+    import fitz
+    from server import aio
+    from server.blob_store import store_form_pdf
+    from server.form_index import FormIndex
+
+    monkeypatch.setattr(aio, "PDF_CPU_WORKERS", 0)
+    with fitz.open() as doc:
+        doc.new_page()
+        store_form_pdf("county", "f1", doc.tobytes())
+    index = FormIndex(watch="off")
+    index.rebuild()
+    monkeypatch.setattr(apps_routes, "form_index", index)
+    store.save("county", "f1", "overlay", overlay("name"))  # by another worker: this index is stale
+    assert not index.has("county", "f1", "overlay")
+
+    r = client.post("/apps/county/forms/f1/fill", data={"answers_json": json.dumps({"name": "Ada"})})
+    assert r.status_code == 200 and r.content.startswith(b"%PDF")
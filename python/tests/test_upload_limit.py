@@ -0,0 +1,75 @@
+"""``UploadLimitMiddleware``: declared and streamed bodies over the cap get a 413."""
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from server.uploads import _FORM_OVERHEAD, UploadLimitMiddleware
+
+MAX = 1000
+BOUNDARY = "x-boundary"
+MULTIPART = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+
+def multipart(size: int) -> bytes:
+    return (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode() + b"%" * size + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def make_client():
+    app = FastAPI()
+    seen = []
+
+    @app.post("/up")
+    async def up(request: Request):
+        form = await request.form()
+        seen.append(len(await form["file"].read()))
+        return {"bytes": seen[-1]}
+
+    app.add_middleware(UploadLimitMiddleware, max_bytes=MAX)
+    return TestClient(app), seen
+
+
+def chunks(body: bytes, size: int = 64 * 1024):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+def test_within_the_cap():
+    client, seen = make_client()
+    r = client.post("/up", content=multipart(MAX), headers=MULTIPART)
+    assert r.status_code == 200 and r.json() == {"bytes": MAX}
+
+
+def test_declared_length_over_the_cap():
+    client, seen = make_client()
+    r = client.post("/up", content=multipart(MAX + _FORM_OVERHEAD + 1), headers=MULTIPART)
+    assert r.status_code == 413
+    assert r.json() == {"detail": f"upload exceeds {MAX} bytes"}
+    assert seen == []
+
+
+def test_streamed_body_over_the_cap():
+    client, seen = make_client()
+    # A generator body is sent chunked, with no Content-Length to check up front
+    r = client.post("/up", content=chunks(multipart(MAX + _FORM_OVERHEAD + 1)), headers=MULTIPART)
+    assert "content-length" not in r.request.headers
+    assert r.status_code == 413
+    assert seen == []
+
+
+def test_understated_length_is_caught_while_streaming():
+    client, seen = make_client()
+    body = multipart(MAX + _FORM_OVERHEAD + 1)
+    r = client.post("/up", content=chunks(body), headers={**MULTIPART, "content-length": "100"})
+    assert r.status_code == 413
+    assert seen == []
+
+
+def test_413_carries_cors_headers():
+    from server.main import app
+
+    origin = "http://localhost:5173"
+    r = TestClient(app).post("/blobs", content=chunks(multipart(60 * 1024 * 1024)),
+                             headers={**MULTIPART, "origin": origin})
+    assert r.status_code == 413
+    assert r.headers["access-control-allow-origin"] == origin
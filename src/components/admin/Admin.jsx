@@ -214,7 +214,7 @@ export default function Admin() {
         console.log('Response ok:', response.ok);
         if (response.ok) {
           const result = await response.json();
-          console.log('Success result:', result);
+          console.log('Queued job:', result.job_id, result.status_url);
           successCount++;
         } else {
           const errorText = await response.text();
@@ -226,7 +226,7 @@ export default function Admin() {
       }
     }
     setBulkStatus(
-      `Import complete: ${successCount} successful, ${errorCount} failed`
+      `Import queued: ${successCount} queued for processing, ${errorCount} failed`
     );
     setIsProcessing(false);
     setBulkFiles([]);
@@ -141,7 +141,16 @@ export function InterviewView({ app, form, application, step }) {
     }
 
     const fd = new FormData();
-    fd.append("answers_json", JSON.stringify(values));
+    const answers = {};
+    for (const [id, v] of Object.entries(values)) {
+      if (typeof v === "string" && v.startsWith("data:image/")) {
+        // Signatures go as binary parts, not base64 inside answers_json
+        fd.append(`signature:${id}`, await (await fetch(v)).blob(), `${id}.png`);
+      } else {
+        answers[id] = v;
+      }
+    }
+    fd.append("answers_json", JSON.stringify(answers));
     const r = await fetch(`${API}/api/apps/${app}/forms/${form}/fill`, {
       method: "POST",
       body: fd,
@@ -61,6 +61,7 @@ export default function Mapper() {
   const [autoSaveTimeout, setAutoSaveTimeout] = useState(null);
 
   const canvasRef = useRef(null);
+  const templateEtagRef = useRef(null);
   const pdfCanvasRef = useRef(null);
   const fileInputRef = useRef(null);
 
@@ -207,12 +208,19 @@ export default function Mapper() {
       const fd = new FormData();
       fd.append("overlay_json", JSON.stringify(overlayToSave));
 
+      // If-Match: refuse to overwrite a version saved by someone else meanwhile
       const r = await fetch(`${API}/api/apps/${normalizedApp}/forms/${normalizedForm}/template`, {
         method: "POST",
         body: fd,
+        headers: templateEtagRef.current ? { "If-Match": templateEtagRef.current } : {},
       });
 
+      if (r.status === 412) {
+        alert("This template was changed by someone else. Reload the page to get the latest version.");
+        throw new Error("Save conflict");
+      }
       if (!r.ok) throw new Error(`Save failed: ${r.status}`);
+      templateEtagRef.current = r.headers.get("ETag");
 
       setSaveStatus(SAVE_STATUS.SAVED);
       if (autoSaveTimeout) {
@@ -297,6 +305,7 @@ export default function Mapper() {
   useEffect(() => {
     (async () => {
       const res = await fetch(`${API}/api/apps/${normalizedApp}/forms/${normalizedForm}/template`);
+      templateEtagRef.current = res.headers.get("ETag");
       const tpl = await res.json();
       const fields = Array.isArray(tpl?.fields)
         ? tpl.fields.map((f) => ({ ...f, rect: rectPtToPx(f.rect) }))